@@ -1,9 +1,10 @@
 import fastapi as fa
 
-from .v1 import chat_router, messages_router
+from .v1 import chat_router, messages_router, metrics_router
 
 
 api_router = fa.APIRouter()
 
 api_router.include_router(chat_router, prefix="/chats", tags=["chats"])
 api_router.include_router(messages_router, prefix="/messages", tags=["messages"])
+api_router.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
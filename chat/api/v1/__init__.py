@@ -1,8 +1,10 @@
 from .chats import api_router as chat_router
 from .messages import api_router as messages_router
+from .metrics import api_router as metrics_router
 
 
 __all__ = (
     'chat_router',
     'messages_router',
+    'metrics_router',
 )
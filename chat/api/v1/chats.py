@@ -1,21 +1,30 @@
-from typing import Annotated
+from typing import Annotated, AsyncIterator
 
 import fastapi as fa
+import orjson
 from api.consts import USER_ID_HTTP_HEADER
 from api.deps import get_db
-from crud import ChatCRUD
-from fastapi.responses import ORJSONResponse
+from cache import chat_list_cache
+from crud import ChatCRUD, MessageCRUD
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pagination import ChatParticipantsParams, decode_participant_cursor
+from realtime import publish_chat_members_added, publish_chat_members_removed, publish_chat_updated
 from schemas import (
+    ChatParticipantsPage,
     ChatResponseItem,
     CreateChatRequestSchema,
     GetChatsResponseItem,
+    GetFullChatResponse,
     UpdateChatRequestSchema,
 )
+from settings import SETTINGS
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 api_router = fa.APIRouter()
 
+NDJSON_MEDIA_TYPE: str = "application/x-ndjson"
+
 
 @api_router.get(
     "",
@@ -35,20 +44,40 @@ async def get_chats(
         user_id: Annotated[int | None, fa.Header(alias=USER_ID_HTTP_HEADER)] = None,
         db: AsyncSession = fa.Depends(get_db),
 ):
-    res: list[ChatResponseItem] | None = await ChatCRUD.get_chats(user_id, db)
-    if res is None:
-        raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
-    return GetChatsResponseItem(chats=res)
+    """Чаты пользователя, сначала с последней активностью.
+
+    Тело ответа кодируется orjson напрямую из словарей `ChatCRUD.get_chats`: готовый Response
+    не проходит повторную проверку по response_model, схема нужна только для документации.
+    """
+    if not SETTINGS.CHAT_LIST_CACHE_ENABLED:
+        res: list[dict] | None = await ChatCRUD.get_chats(user_id, db)
+        if res is None:
+            raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return ORJSONResponse(content={"chats": res})
+
+    # готовое тело ответа из кеша (формат GetChatsResponseItem)
+    body: bytes | None = chat_list_cache.get(user_id)
+    if body is None:
+        seq: int = chat_list_cache.seq
+        res = await ChatCRUD.get_chats(user_id, db)
+        if res is None:
+            raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+        body = chat_list_cache.set(user_id, res, seq)
+    return fa.Response(content=body, media_type="application/json")
 
 
 @api_router.get(
     "/{chat_id}",
     response_class=ORJSONResponse,
+    response_model=GetFullChatResponse,
     status_code=fa.status.HTTP_200_OK,
     responses={
         fa.status.HTTP_200_OK: {
             "description": "Ok",
         },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad request",
+        },
         fa.status.HTTP_401_UNAUTHORIZED: {
             "description": "Could not validate credentials",
         },
@@ -60,25 +89,118 @@ async def get_chats(
 async def get_chat_by_id(
         chat_id: Annotated[int, fa.Path()],
         user_id: Annotated[int | None, fa.Header(alias=USER_ID_HTTP_HEADER)] = None,
+        include_participants: Annotated[
+            bool,
+            fa.Query(description="Also return all participants (use GET /chats/{chat_id}/participants for big chats)"),
+        ] = False,
         db: AsyncSession = fa.Depends(get_db),
 ):
-    full_chat = await ChatCRUD.get_chat_by_id(chat_id, db)
-    if full_chat is None:
+    # членство проверяется в том же запросе, что и загрузка чата
+    res: tuple[dict, bool] | None = await ChatCRUD.get_chat_by_id(
+        chat_id=chat_id,
+        participant_id=user_id,
+        db=db,
+        include_participants=include_participants,
+    )
+    if res is None:
         raise fa.HTTPException(status_code=fa.status.HTTP_404_NOT_FOUND)
+    full_chat, is_user_member_of_chat = res
+    if not is_user_member_of_chat:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail="You don't have permission to read this chat")
+    return ORJSONResponse(content={"chat": full_chat})
 
-    participant_objects = getattr(full_chat.get("chat"), "participants")
 
-    # check user is member of the chat
-    is_user_member_of_chat: bool = False
-    for member in participant_objects:
-        if getattr(member, "participant_id") == user_id:
-            is_user_member_of_chat = True
-            break
+@api_router.get(
+    "/{chat_id}/participants",
+    response_class=ORJSONResponse,
+    response_model=ChatParticipantsPage,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad request",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def get_chat_participants(
+        chat_id: Annotated[int, fa.Path()],
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        params: ChatParticipantsParams = fa.Depends(),
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Участники чата по возрастанию participant_id, постранично по курсору (только для участников чата)."""
+    try:
+        after: int | None = decode_participant_cursor(params.cursor) if params.cursor is not None else None
+    except ValueError:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    page: dict | None = await ChatCRUD.get_chat_participants(
+        db=db,
+        chat_id=chat_id,
+        participant_id=user_id,
+        size=params.size,
+        after=after,
+    )
+    if page is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail="You don't have permission to read this chat")
+    return ORJSONResponse(content=page)
+
 
+@api_router.get(
+    "/{chat_id}/export",
+    response_class=StreamingResponse,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok. NDJSON: one `MessageResponseItem` per line, from old to new",
+            "content": {NDJSON_MEDIA_TYPE: {}},
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad request",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def export_chat_messages(
+        chat_id: Annotated[int, fa.Path()],
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        include_archive: Annotated[bool, fa.Query(description="Also export archived messages")] = False,
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Выгрузить всю историю чата потоком NDJSON (только для участников чата).
+
+    Сообщения читаются серверным курсором и отправляются по мере чтения, память не зависит
+    от размера истории. Сессия get_db закрывается только после отправки ответа.
+    """
+    is_user_member_of_chat: bool = await ChatCRUD.check_user_in_chat(db=db, chat_id=chat_id, participant_id=user_id)
     if not is_user_member_of_chat:
         raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
                                detail="You don't have permission to read this chat")
-    return full_chat
+
+    async def export_lines() -> AsyncIterator[bytes]:
+        async for messages in MessageCRUD.stream_chat_messages(
+                db=db,
+                chat_id=chat_id,
+                batch_size=SETTINGS.CHAT_EXPORT_BATCH_SIZE,
+                include_archive=include_archive,
+        ):
+            # одна запись в сокет на пачку строк
+            yield b"".join(orjson.dumps(message, option=orjson.OPT_APPEND_NEWLINE) for message in messages)
+
+    return StreamingResponse(
+        export_lines(),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="chat-{chat_id}.ndjson"'},
+    )
 
 
 @api_router.post(
@@ -108,6 +230,7 @@ async def create_chat(chat: CreateChatRequestSchema,
 
     if not res:
         raise fa.HTTPException(fa.status.HTTP_400_BAD_REQUEST)
+    await publish_chat_members_added(res.id, chat.participants)
     return res
 
 
@@ -134,6 +257,7 @@ async def update_chat(
     res = await ChatCRUD.update_chat(user_id=user_id, chat_id=chat_id, chat=chat, db=db)
     if not res:
         raise fa.HTTPException(fa.status.HTTP_400_BAD_REQUEST)
+    await publish_chat_updated(chat_id)
     return res
 
 
@@ -157,5 +281,6 @@ async def make_chat_unavailable(chat_id: int,
                                 db: AsyncSession = fa.Depends(get_db)):
     changed_row_count: int = await ChatCRUD.change_participant_status_in_status(db, chat_id, user_id, False)
     if changed_row_count == 0:
-        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST(),
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
                                detail="Нет указанного чата или он уже удален")
+    await publish_chat_members_removed(chat_id, [user_id])
@@ -1,25 +1,106 @@
-from collections import defaultdict
-from typing import Annotated
+from typing import Annotated, Literal
 
 import fastapi as fa
+import orjson
+import pydantic as pd
 from api.consts import USER_ID_HTTP_HEADER
 from api.deps import get_db
-from crud import ChatCRUD, MessageCRUD
+from crud import ChatCRUD, MessageCRUD, message_writer
+from db.db import MyDatabase
 from fastapi.responses import ORJSONResponse
 from fastapi_pagination import Page
-from pagination import MessagePaginationParams
+from log import get_logger
+from pagination import (
+    MessageArchiveParams,
+    MessageCursorParams,
+    MessagePaginationParams,
+    MessageSearchParams,
+    decode_message_cursor,
+    decode_search_cursor,
+)
+from realtime import (
+    ACK,
+    Frame,
+    publish_chat_members_added,
+    publish_chat_read,
+    publish_chat_updated,
+    publish_message_created,
+    websocket_manager,
+)
 from schemas import (
     ChatResponseItem,
     CreateMessageRequestSchema,
+    CreateMessagesBatchRequestSchema,
+    DeleteMessageCommand,
+    EditMessageCommand,
+    MessageBatchResultItem,
+    MessageCursorPage,
+    MessageReadersResponseItem,
     MessageResponseItem,
+    MessagesBatchResponseItem,
+    MessageSearchPage,
+    ReadMessagesRequestSchema,
+    ReadMessagesResponseItem,
+    SendMessageCommand,
     UpdateMessageRequestSchema,
+    WebsocketAck,
+    WebsocketCommandFrame,
 )
+from settings import SETTINGS
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+logger = get_logger(__name__)
+
 api_router = fa.APIRouter()
 
 
+@api_router.get(
+    "/search",
+    response_class=ORJSONResponse,
+    response_model=MessageSearchPage,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad request",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def search_messages(
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        params: MessageSearchParams = fa.Depends(),
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Полнотекстовый поиск по сообщениям чатов пользователя (удаленные сообщения не ищутся).
+
+    Результаты упорядочены по релевантности. Следующая страница запрашивается с cursor=next_cursor.
+    Маршрут объявлен до /{chat_id}, иначе search будет принят за id чата.
+    """
+    try:
+        after = decode_search_cursor(params.cursor) if params.cursor is not None else None
+    except ValueError:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    page: MessageSearchPage | None = await MessageCRUD.search_messages(
+        db=db,
+        participant_id=user_id,
+        query=params.q,
+        size=params.size,
+        chat_id=params.chat_id,
+        after=after,
+    )
+    if page is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return page
+
+
 @api_router.get(
     "/{chat_id}",
     response_class=ORJSONResponse,
@@ -27,7 +108,7 @@ api_router = fa.APIRouter()
     status_code=fa.status.HTTP_200_OK,
     responses={
         fa.status.HTTP_200_OK: {
-            "description": "Ok",
+            "description": "Ok. In cursor mode the body is `MessageCursorPage`",
         },
         fa.status.HTTP_401_UNAUTHORIZED: {
             "description": "Could not validate credentials",
@@ -42,18 +123,119 @@ async def get_chat_messages(
         user_id: Annotated[int | None, fa.Header(alias=USER_ID_HTTP_HEADER)] = None,
         db: AsyncSession = fa.Depends(get_db),
         params: MessagePaginationParams = fa.Depends(),  # noqa
+        cursor_params: MessageCursorParams = fa.Depends(),
 ):
-    """Получить сообщения чата постранично (есть пагинация)."""
-    # проверить, что юзер состоит в чате
-    is_user_in_chat: bool = await ChatCRUD.check_user_in_chat(db=db, participant_id=user_id, chat_id=chat_id)
+    """Получить сообщения чата постранично (есть пагинация).
 
-    # сразу же получаем сообщения
-    chat_messages = await MessageCRUD.get_chat_messages(db=db, chat_id=chat_id)
+    По умолчанию используется пагинация page/size. with_total=exact считает все сообщения чата,
+    approx берет total из счетчика сообщений чата (дешево, но может немного расходиться),
+    false не считает total и pages - для бесконечной прокрутки.
+    Если указан mode=cursor или один из курсоров before/after, то используется keyset-пагинация:
+    в ответе приходят курсоры prev_cursor/next_cursor для соседних страниц.
+    """
+    if cursor_params.is_cursor_mode:
+        return await get_chat_messages_by_cursor(chat_id, user_id, params.size, cursor_params, db)
 
+    # членство, количество сообщений и страница - одним запросом
+    page: dict | Literal[False] | None = await MessageCRUD.get_chat_messages(
+        db=db,
+        chat_id=chat_id,
+        participant_id=user_id,
+        page=params.page,
+        size=params.size,
+        with_total=params.with_total,
+    )
+    if page is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
     # Если не состоит - то ошибка
+    if page is False:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST)
+    return ORJSONResponse(content=page)
+
+
+async def get_chat_messages_by_cursor(
+        chat_id: int,
+        user_id: int | None,
+        size: int,
+        cursor_params: MessageCursorParams,
+        db: AsyncSession,
+) -> ORJSONResponse:
+    if cursor_params.before is not None and cursor_params.after is not None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail="Only one of `before` and `after` can be specified")
+    try:
+        before = decode_message_cursor(cursor_params.before) if cursor_params.before is not None else None
+        after = decode_message_cursor(cursor_params.after) if cursor_params.after is not None else None
+    except ValueError:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    is_user_in_chat: bool = await ChatCRUD.check_user_in_chat(db=db, participant_id=user_id, chat_id=chat_id)
     if not is_user_in_chat:
         raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST)
-    return chat_messages
+
+    page: MessageCursorPage | None = await MessageCRUD.get_chat_messages_by_cursor(
+        chat_id=chat_id,
+        size=size,
+        db=db,
+        before=before,
+        after=after,
+    )
+    if page is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+    # ответ в формате курсорной страницы, а не Page из response_model
+    return ORJSONResponse(content=page.dict())
+
+
+@api_router.get(
+    "/{chat_id}/archive",
+    response_class=ORJSONResponse,
+    response_model=MessageCursorPage,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad request",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def get_archived_chat_messages(
+        chat_id: Annotated[int, fa.Path()],
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        params: MessageArchiveParams = fa.Depends(),
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Получить архивные сообщения чата по курсору (см. commands/archive_messages.py).
+
+    Архив не секционирован и читается медленнее основной истории; курсоры - как у GET /messages/{chat_id}.
+    """
+    if params.before is not None and params.after is not None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail="Only one of `before` and `after` can be specified")
+    try:
+        before = decode_message_cursor(params.before) if params.before is not None else None
+        after = decode_message_cursor(params.after) if params.after is not None else None
+    except ValueError:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    is_user_in_chat: bool = await ChatCRUD.check_user_in_chat(db=db, participant_id=user_id, chat_id=chat_id)
+    if not is_user_in_chat:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST)
+
+    page: MessageCursorPage | None = await MessageCRUD.get_archived_chat_messages_by_cursor(
+        chat_id=chat_id,
+        size=params.size,
+        db=db,
+        before=before,
+        after=after,
+    )
+    if page is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return page
 
 
 @api_router.patch(
@@ -80,6 +262,7 @@ async def update_message(
     updated_msg: MessageResponseItem | None = await MessageCRUD.update_message(user_id, message_id, message.text, db)
     if updated_msg is None:
         raise fa.HTTPException(fa.status.HTTP_400_BAD_REQUEST)
+    await publish_chat_updated(updated_msg.chat_id)
     return updated_msg
 
 
@@ -113,20 +296,172 @@ async def add_message(message: CreateMessageRequestSchema,
         if chat is None:
             raise fa.HTTPException(status_code=fa.status.HTTP_500_INTERNAL_SERVER_ERROR,
                                    detail="Не удалось создать приватный чат")
+        await publish_chat_members_added(chat.id, [user_id, message.dest_id])
+    elif not await ChatCRUD.check_user_in_chat(db=db, participant_id=user_id, chat_id=message.chat_id):
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail="You are not a member of this chat")
     chat_id: int = message.chat_id or chat.id
 
     # Добавляем сообщение в чат
-    new_msg: MessageResponseItem | None = await MessageCRUD.add_message_to_chat(
-        db=db,
-        author_id=user_id,
-        chat_id=chat_id,
-        message=message,
-    )
+    new_msg: MessageResponseItem | None
+    if message_writer.is_running:
+        # сообщение записывается в общей транзакции с другими сообщениями в соединении писателя.
+        # Соединение запроса (его держит проверка членства или создание чата) возвращаем в пул,
+        # иначе ждущие писателя запросы могут занять весь пул, и писателю не достанется соединения
+        await db.commit()
+        try:
+            new_msg = await message_writer.add_message(author_id=user_id, chat_id=chat_id, text=message.text)
+        except DBAPIError:
+            new_msg = None
+    else:
+        new_msg = await MessageCRUD.add_message_to_chat(
+            db=db,
+            author_id=user_id,
+            chat_id=chat_id,
+            message=message,
+        )
     if new_msg is None:
         raise fa.HTTPException(fa.status.HTTP_400_BAD_REQUEST)
+
+    # доставляем сообщение онлайн-участникам чата во всех процессах
+    await publish_message_created(new_msg)
     return new_msg
 
 
+@api_router.post(
+    "/batch",
+    response_class=ORJSONResponse,
+    response_model=MessagesBatchResponseItem,
+    status_code=fa.status.HTTP_201_CREATED,
+    responses={
+        fa.status.HTTP_201_CREATED: {
+            "description": "Ok (результат по каждому сообщению в items)",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Too many messages",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def add_messages_batch(batch: CreateMessagesBatchRequestSchema,
+                             user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+                             db: AsyncSession = fa.Depends(get_db)):
+    """Добавить несколько сообщений в существующие чаты (возможно, разные) одним запросом.
+
+    Сообщения, которые нельзя отправить (нет chat_id или пользователь не состоит в чате),
+    не создаются и возвращаются с ошибкой в error. Остальные сообщения создаются вместе
+    в одной транзакции: либо все, либо (при ошибке базы) ни одного - тогда ответ 500.
+    """
+    if len(batch.messages) > SETTINGS.CHAT_MESSAGES_BATCH_MAX_SIZE:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST,
+                               detail=f"Не больше {SETTINGS.CHAT_MESSAGES_BATCH_MAX_SIZE} сообщений за запрос")
+
+    chat_ids: list[int] = list({message.chat_id for message in batch.messages if message.chat_id is not None})
+    # членство во всех чатах пачки проверяется одним запросом
+    user_chat_ids: set[int] = await ChatCRUD.get_user_chat_ids_among(db, user_id, chat_ids) if chat_ids else set()
+
+    results: list[MessageBatchResultItem] = []
+    valid_results: list[MessageBatchResultItem] = []
+    for index, message in enumerate(batch.messages):
+        result = MessageBatchResultItem(index=index, message=None, error=None)
+        if message.chat_id is None:
+            # приватные чаты в пачке не создаются
+            result.error = "chat_id is required"
+        elif message.chat_id not in user_chat_ids:
+            result.error = "You are not a member of this chat"
+        else:
+            valid_results.append(result)
+        results.append(result)
+
+    if valid_results:
+        new_msgs: list[MessageResponseItem] | None = await MessageCRUD.add_messages(
+            db=db,
+            author_id=user_id,
+            messages=[batch.messages[result.index] for result in valid_results],
+        )
+        if new_msgs is None:
+            raise fa.HTTPException(fa.status.HTTP_500_INTERNAL_SERVER_ERROR)
+        for result, new_msg in zip(valid_results, new_msgs):
+            result.message = new_msg
+            await publish_message_created(new_msg)
+
+    return MessagesBatchResponseItem(
+        created=len(valid_results),
+        failed=len(results) - len(valid_results),
+        items=results,
+    )
+
+
+@api_router.post(
+    "/{chat_id}/read",
+    response_class=ORJSONResponse,
+    response_model=ReadMessagesResponseItem,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad chat id",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def mark_messages_read(
+        chat_id: Annotated[int, fa.Path()],
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        read: ReadMessagesRequestSchema | None = None,
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Отметить сообщения чата прочитанными (все или до read.message_id включительно).
+
+    Отметка о прочтении участника чата сдвигается одним UPDATE.
+    """
+    unread_count: int | None = await MessageCRUD.mark_messages_read(
+        db=db,
+        chat_id=chat_id,
+        participant_id=user_id,
+        message_id=read.message_id if read is not None else None,
+    )
+    if unread_count is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Нет указанного чата")
+    await publish_chat_read(chat_id, user_id, unread_count)
+    return ReadMessagesResponseItem(chat_id=chat_id, unread_count=unread_count)
+
+
+@api_router.get(
+    "/{message_id}/readers",
+    response_class=ORJSONResponse,
+    response_model=MessageReadersResponseItem,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+        fa.status.HTTP_400_BAD_REQUEST: {
+            "description": "Bad message id",
+        },
+        fa.status.HTTP_401_UNAUTHORIZED: {
+            "description": "Could not validate credentials",
+        },
+    },
+)
+async def get_message_readers(
+        message_id: Annotated[int, fa.Path()],
+        user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
+        db: AsyncSession = fa.Depends(get_db),
+):
+    """Получить id пользователей, прочитавших сообщение."""
+    readers: list[int] | None = await MessageCRUD.get_message_readers(db, message_id, user_id)
+    if readers is None:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Нет указанного сообщения")
+    return MessageReadersResponseItem(message_id=message_id, participant_ids=readers)
+
+
 @api_router.delete(
     "/{message_id}",
     status_code=fa.status.HTTP_204_NO_CONTENT,
@@ -145,27 +480,11 @@ async def add_message(message: CreateMessageRequestSchema,
 async def make_message_unavailable(message_id: int,
                                    user_id: Annotated[int, fa.Header(alias=USER_ID_HTTP_HEADER)],
                                    db: AsyncSession = fa.Depends(get_db)):
-    deleted_row: int = await MessageCRUD.delete_message(db, message_id, user_id)
-    if deleted_row == 0:
-        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST(), detail="Нет указанного сообщения")
-
-
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[int, fa.WebSocket | None] = defaultdict()
-
-    async def connect(self, user_id: int, websocket: fa.WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-
-    def disconnect(self, user_id: int):
-        self.active_connections[user_id] = None
-
-    async def send_personal_message(self, message: str, websocket: fa.WebSocket):
-        await websocket.send_text(message)
-
-
-websocket_manager = ConnectionManager()
+    deleted_chat_ids: list[int] = await MessageCRUD.delete_message(db, message_id, user_id)
+    if not deleted_chat_ids:
+        raise fa.HTTPException(status_code=fa.status.HTTP_400_BAD_REQUEST, detail="Нет указанного сообщения")
+    for chat_id in deleted_chat_ids:
+        await publish_chat_updated(chat_id)
 
 
 @api_router.websocket("/ws")
@@ -173,16 +492,87 @@ async def websocket_endpoint(
         websocket: fa.WebSocket,
         x_user_identity: Annotated[int | None, fa.Header()] = None,
 ):
+    """Websocket для доставки новых сообщений чатов пользователя и приема его команд.
+
+    Клиент может отправлять команды send, edit, delete и mark_read (см. WebsocketCommandFrame)
+    с собственным client_id. Результат каждой команды приходит событием ack с тем же client_id.
+    Команды выполняются по очереди в одной сессии базы на все время соединения.
+    """
     if x_user_identity is None:
         return
 
-    await websocket_manager.connect(x_user_identity, websocket)
+    MyDatabase.init()
+    async with MyDatabase.async_session() as db:
+        chat_ids: list[int] = await ChatCRUD.get_user_chat_ids(db, x_user_identity)
+        await db.commit()
+
+        connection = await websocket_manager.connect(x_user_identity, websocket, chat_ids)
+        try:
+            while True:
+                raw_command: str = await websocket.receive_text()
+                ack: WebsocketAck = await handle_websocket_command(raw_command, x_user_identity, db)
+                websocket_manager.send_personal_message(Frame.from_event(ACK, ack.dict()), connection)
+        except fa.WebSocketDisconnect:
+            pass
+        finally:
+            await websocket_manager.disconnect(connection)
+
+
+async def handle_websocket_command(raw_command: str, user_id: int, db: AsyncSession) -> WebsocketAck:
+    """Выполнить команду клиента теми же обработчиками, что и HTTP-методы."""
+    try:
+        command = WebsocketCommandFrame.parse_obj(orjson.loads(raw_command)).__root__
+    except (ValueError, TypeError) as e:
+        return WebsocketAck(client_id=get_client_id(raw_command), ok=False, data=None, error=f"Invalid command: {e}")
+
+    try:
+        data: pd.BaseModel | None
+        if isinstance(command, SendMessageCommand):
+            data = await add_message(
+                message=CreateMessageRequestSchema(chat_id=command.chat_id, dest_id=command.dest_id, text=command.text),
+                user_id=user_id,
+                db=db,
+            )
+        elif isinstance(command, EditMessageCommand):
+            data = await update_message(
+                message_id=command.message_id,
+                message=UpdateMessageRequestSchema(text=command.text),
+                user_id=user_id,
+                db=db,
+            )
+        elif isinstance(command, DeleteMessageCommand):
+            data = await make_message_unavailable(message_id=command.message_id, user_id=user_id, db=db)
+        else:
+            data = await mark_messages_read(
+                chat_id=command.chat_id,
+                user_id=user_id,
+                read=ReadMessagesRequestSchema(message_id=command.message_id),
+                db=db,
+            )
+    except fa.HTTPException as e:
+        await db.rollback()
+        return WebsocketAck(client_id=command.client_id, ok=False, data=None, error=str(e.detail))
+    except pd.ValidationError as e:
+        await db.rollback()
+        return WebsocketAck(client_id=command.client_id, ok=False, data=None, error=f"Invalid command: {e}")
+    except SQLAlchemyError as e:
+        logger.error(f"Failed to handle websocket command {command.type}: {e}")
+        await db.rollback()
+        return WebsocketAck(client_id=command.client_id, ok=False, data=None, error="Internal error")
+    # завершаем транзакцию чтения, чтобы соединение с базой вернулось в пул до следующей команды
+    await db.commit()
+    return WebsocketAck(
+        client_id=command.client_id,
+        ok=True,
+        data=data.dict() if data is not None else None,
+        error=None,
+    )
+
 
+def get_client_id(raw_command: str) -> str | None:
+    """Достать client_id из кадра, который не удалось разобрать как команду."""
     try:
-        while True:
-            data = await websocket.receive_text()
-            await websocket_manager.send_personal_message(f"You wrote: {data}", websocket)
-            await websocket_manager.broadcast(f"Client #{x_user_identity} says: {data}")
-    except fa.WebSocketDisconnect:
-        websocket_manager.disconnect(websocket)
-        await websocket_manager.broadcast(f"Client #{x_user_identity} left the chat")
+        client_id = orjson.loads(raw_command).get("client_id")
+    except (ValueError, AttributeError):
+        return None
+    return client_id if isinstance(client_id, str) else None
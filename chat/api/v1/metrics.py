@@ -0,0 +1,43 @@
+import fastapi as fa
+from cache import chat_list_cache, membership_cache
+from fastapi.responses import ORJSONResponse
+from realtime import websocket_manager
+from schemas import CacheMetricsResponseItem, WebsocketMetricsResponseItem
+
+
+api_router = fa.APIRouter()
+
+
+@api_router.get(
+    "/ws",
+    response_class=ORJSONResponse,
+    response_model=WebsocketMetricsResponseItem,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+    },
+)
+async def get_websocket_metrics():
+    """Состояние очередей отправки websocket-соединений текущего процесса."""
+    return websocket_manager.metrics()
+
+
+@api_router.get(
+    "/cache",
+    response_class=ORJSONResponse,
+    response_model=CacheMetricsResponseItem,
+    status_code=fa.status.HTTP_200_OK,
+    responses={
+        fa.status.HTTP_200_OK: {
+            "description": "Ok",
+        },
+    },
+)
+async def get_cache_metrics():
+    """Размер и статистика попаданий кешей текущего процесса."""
+    return {
+        "membership": membership_cache.metrics(),
+        "chat_list": chat_list_cache.metrics(),
+    }
@@ -0,0 +1,127 @@
+"""Measure the CPU cost of fanning a new message out to many websocket recipients.
+
+Registers `--recipients` in-memory websocket connections in one chat and
+broadcasts `--messages` messages to them in three ways:
+
+* ``per-connection`` - every recipient serializes the message on its own
+  (``message.dict()`` + orjson for each connection);
+* ``encode-once/text`` - one `Frame` shared by all recipients, sent as text;
+* ``encode-once/binary`` - one `Frame` shared by all recipients, its orjson
+  buffer is sent as is (``CHAT_WS_BINARY_FRAMES``).
+
+The fake sockets encode text frames to bytes the way an ASGI server does,
+so the numbers include the whole in-process send path except the network.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.broadcast_encoding --recipients 1000 --messages 200
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from enums import OverflowPolicies
+from realtime import ConnectionManager, Frame
+from realtime.connection import ClientConnection
+from schemas import MessageResponseItem
+
+
+CHAT_ID: int = 1
+
+
+class NullWebSocket:
+    """Websocket, который только кодирует кадр, как это делает ASGI-сервер."""
+
+    sent_bytes: int = 0
+
+    async def send_text(self, data: str):
+        NullWebSocket.sent_bytes += len(data.encode())
+
+    async def send_bytes(self, data: bytes):
+        NullWebSocket.sent_bytes += len(data)
+
+
+def make_manager(recipients: int, binary_frames: bool) -> ConnectionManager:
+    manager = ConnectionManager()
+    for user_id in range(1, recipients + 1):
+        connection = ClientConnection(
+            user_id=user_id,
+            websocket=NullWebSocket(),  # type: ignore
+            queue_size=0,
+            overflow_policy=OverflowPolicies.DROP_OLDEST,
+            metrics=manager.connection_metrics,
+            binary_frames=binary_frames,
+        )
+        connection.start()
+        manager.active_connections[user_id].add(connection)
+        manager.chat_members[CHAT_ID].add(user_id)
+        manager.user_chats[user_id].add(CHAT_ID)
+    return manager
+
+
+async def drain(manager: ConnectionManager):
+    while manager.metrics()["queued_frames"]:
+        await asyncio.sleep(0)
+
+
+async def broadcast_per_connection(manager: ConnectionManager, message: MessageResponseItem):
+    for user_id in manager.chat_members[CHAT_ID]:
+        for connection in manager.active_connections[user_id]:
+            connection.send(Frame.from_message(message))
+
+
+async def broadcast_encode_once(manager: ConnectionManager, message: MessageResponseItem):
+    await manager.broadcast_message(message)
+
+
+async def run(strategy, binary_frames: bool, messages: list[MessageResponseItem], recipients: int) -> float:
+    manager = make_manager(recipients, binary_frames)
+    started: float = time.process_time()
+    for message in messages:
+        await strategy(manager, message)
+        await drain(manager)
+    elapsed: float = time.process_time() - started
+    for connections in manager.active_connections.values():
+        for connection in connections:
+            await connection.close()
+    return elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    messages: list[MessageResponseItem] = [
+        MessageResponseItem(
+            id=i,
+            dt_created=datetime.now(timezone.utc),
+            dt_updated=None,
+            text="x" * args.text_length,
+            is_available=True,
+            author_id=1,
+            chat_id=CHAT_ID,
+        )
+        for i in range(args.messages)
+    ]
+    frames: int = args.messages * args.recipients
+    print(f"{args.messages} messages x {args.recipients} recipients ({args.text_length} chars of text)")
+    baseline: float | None = None
+    for name, strategy, binary_frames in (
+        ("per-connection", broadcast_per_connection, False),
+        ("encode-once/text", broadcast_encode_once, False),
+        ("encode-once/binary", broadcast_encode_once, True),
+    ):
+        elapsed: float = asyncio.run(run(strategy, binary_frames, messages, args.recipients))
+        baseline = baseline or elapsed
+        print(f"  {name:<20} {elapsed:.3f}s CPU, {elapsed / frames * 1e6:.2f} us/frame, "
+              f"{baseline / elapsed:.2f}x")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=1000, help="Number of online recipients")
+    parser.add_argument("--messages", type=int, default=200, help="Number of broadcast messages")
+    parser.add_argument("--text-length", type=int, default=200, help="Length of message text")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
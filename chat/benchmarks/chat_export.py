@@ -0,0 +1,165 @@
+"""Measure GET /chats/{chat_id}/export throughput and memory.
+
+Seeds a small and a large chat (`--messages` / 10 and `--messages`
+messages spread over the last 90 days, i.e. several partitions) inside a
+rolled-back transaction and streams their NDJSON export through the ASGI
+app. The response body is counted and dropped, so only the server side is
+measured:
+
+- rows/s and MB/s of the large export;
+- peak Python memory (tracemalloc) of both exports: with a server-side
+  cursor it does not grow with the size of the history;
+- for comparison, rows/s of paging through GET /messages/{chat_id} with
+  page/size (100 rows and a COUNT(*) per page) at the start and at the end
+  of the history.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.chat_export --messages 1000000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import httpx
+import sqlalchemy as sa
+from api.consts import USER_ID_HTTP_HEADER
+from api.deps import get_db
+from db.db import MyDatabase
+from main import app
+
+
+BENCHMARK_USER_ID: int = 1_900_000_000
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            VALUES ('benchmark-small', false), ('benchmark-large', false)
+            RETURNING id, name
+        )
+        SELECT id, name FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available)
+        SELECT id, :user_id, true FROM benchmark_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'message ' || g || ' ' || md5(g::text), true, :user_id, c.id,
+               now() - g * interval '90 days' / :messages
+        FROM benchmark_chats c, generate_series(1, :messages) g
+        WHERE c.name = 'benchmark-large' OR g <= :messages / 10
+        """
+    ),
+    sa.text("ANALYZE messages"),
+)
+
+
+async def export(chat_id: int) -> tuple[int, int, float]:
+    """Выгрузить чат через ASGI-приложение, не накапливая тело ответа. Возвращает (строки, байты, секунды)."""
+    scope: dict = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/chats/{chat_id}/export",
+        "raw_path": f"/chats/{chat_id}/export".encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(USER_ID_HTTP_HEADER.lower().encode(), str(BENCHMARK_USER_ID).encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    counters: dict = {"status": None, "rows": 0, "bytes": 0}
+    request_sent = asyncio.Event()
+    disconnected = asyncio.Event()
+
+    async def receive() -> dict:
+        if not request_sent.is_set():
+            request_sent.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # клиент не отключается, пока ответ не отправлен целиком
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict):
+        if message["type"] == "http.response.start":
+            counters["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body: bytes = message.get("body", b"")
+            counters["rows"] += body.count(b"\n")
+            counters["bytes"] += len(body)
+
+    started: float = time.perf_counter()
+    await app(scope, receive, send)
+    disconnected.set()
+    elapsed: float = time.perf_counter() - started
+    assert counters["status"] == 200, counters
+    return counters["rows"], counters["bytes"], elapsed
+
+
+async def page_rows_per_second(client: httpx.AsyncClient, chat_id: int, first_page: int, pages: int) -> float:
+    headers: dict = {USER_ID_HTTP_HEADER: str(BENCHMARK_USER_ID)}
+    rows: int = 0
+    started: float = time.perf_counter()
+    for page in range(first_page, first_page + pages):
+        response = await client.get(f"/messages/{chat_id}", params={"page": page, "size": 100}, headers=headers)
+        assert response.status_code == 200, response.text
+        rows += len(response.json()["items"])
+    return rows / (time.perf_counter() - started)
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with MyDatabase.rollback_session() as db:
+        started: float = time.perf_counter()
+        params: dict = {"messages": args.messages, "user_id": BENCHMARK_USER_ID}
+        for stmt in seed_statements:
+            await db.execute(stmt, params)
+        chats: dict[str, int] = dict(
+            (await db.execute(sa.text("SELECT name, id FROM benchmark_chats"))).all()
+        )
+        print(f"Seeded {args.messages + args.messages // 10} messages in {time.perf_counter() - started:.1f}s")
+
+        async def get_benchmark_db():
+            yield db
+
+        app.dependency_overrides[get_db] = get_benchmark_db
+
+        rows, size, elapsed = await export(chats["benchmark-large"])
+        print(f"export: {rows} rows, {size / 2 ** 20:.1f} MB in {elapsed:.2f}s: "
+              f"{rows / elapsed:.0f} rows/s, {size / 2 ** 20 / elapsed:.1f} MB/s")
+
+        for name in ("benchmark-small", "benchmark-large"):
+            tracemalloc.start()
+            rows, size, elapsed = await export(chats[name])
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  peak memory exporting {rows:>8} rows: {peak / 2 ** 20:.1f} MB")
+
+        transport = httpx.ASGITransport(app=app)  # type: ignore
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            last_page: int = args.messages // 100 - args.pages + 1
+            for label, first_page in (("first", 1), ("last", last_page)):
+                rate: float = await page_rows_per_second(client, chats["benchmark-large"], first_page, args.pages)
+                print(f"page/size=100, {label} {args.pages} pages: {rate:.0f} rows/s")
+        app.dependency_overrides.clear()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000, help="Number of messages in the large chat")
+    parser.add_argument("--pages", type=int, default=20, help="Number of pages of the page/size comparison")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
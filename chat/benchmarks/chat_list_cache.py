@@ -0,0 +1,128 @@
+"""Compare GET /chats throughput with and without the per-user chat list cache.
+
+Seeds a user with `--chats` chats (each with a last message and unread
+messages) inside a rolled-back transaction, then calls the real endpoint
+through the ASGI app `--requests` times with `CHAT_LIST_CACHE_ENABLED`
+off and on. Every `--write-every` requests a new message is applied to the
+cache, as the event bus does, so the cached run also pays for incremental
+updates.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.chat_list_cache --chats 200 --requests 2000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+import sqlalchemy as sa
+from api.consts import USER_ID_HTTP_HEADER
+from api.deps import get_db
+from cache import chat_list_cache
+from db.db import MyDatabase
+from main import app
+from settings import SETTINGS
+
+
+BENCHMARK_USER_ID: int = 1_600_000_000
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            SELECT 'benchmark-' || g, false FROM generate_series(1, :chats) g
+            RETURNING id
+        )
+        SELECT id FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available, unread_count)
+        SELECT id, :user_id, true, 3 FROM benchmark_chats
+        UNION ALL
+        SELECT id, :user_id + 1, true, 0 FROM benchmark_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'message ' || g, true, :user_id + 1, c.id, now() - g * interval '1 minute'
+        FROM benchmark_chats c, generate_series(1, 3) g
+        """
+    ),
+    sa.text(
+        """
+        UPDATE chats SET last_message_id = m.id, last_message_at = m.dt_created
+        FROM (
+            SELECT DISTINCT ON (chat_id) id, chat_id, dt_created
+            FROM messages
+            WHERE chat_id IN (SELECT id FROM benchmark_chats)
+            ORDER BY chat_id, dt_created DESC, id DESC
+        ) m
+        WHERE chats.id = m.chat_id
+        """
+    ),
+)
+
+
+async def run(client: httpx.AsyncClient, chat_ids: list[int], args: argparse.Namespace) -> float:
+    headers: dict = {USER_ID_HTTP_HEADER: str(BENCHMARK_USER_ID)}
+    started: float = time.perf_counter()
+    for i in range(args.requests):
+        if args.write_every and i % args.write_every == 0:
+            chat_list_cache.apply_message({
+                "id": 2 ** 31 - args.requests + i,
+                "dt_created": datetime.now(timezone.utc).isoformat(),
+                "dt_updated": None,
+                "text": f"new message {i}",
+                "is_available": True,
+                "author_id": BENCHMARK_USER_ID + 1,
+                "chat_id": chat_ids[i % len(chat_ids)],
+            })
+        response = await client.get("/chats", headers=headers)
+        assert response.status_code == 200, response.text
+    return time.perf_counter() - started
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with MyDatabase.rollback_session() as db:
+        params: dict = {"chats": args.chats, "user_id": BENCHMARK_USER_ID}
+        for stmt in seed_statements:
+            await db.execute(stmt, params)
+        chat_ids: list[int] = list((await db.execute(sa.text("SELECT id FROM benchmark_chats"))).scalars())
+
+        async def get_benchmark_db():
+            yield db
+
+        app.dependency_overrides[get_db] = get_benchmark_db
+        transport = httpx.ASGITransport(app=app)  # type: ignore
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            print(f"GET /chats for a user with {args.chats} chats, {args.requests} requests")
+            baseline: float | None = None
+            for enabled in (False, True):
+                SETTINGS.CHAT_LIST_CACHE_ENABLED = enabled
+                chat_list_cache.clear()
+                elapsed: float = await run(client, chat_ids, args)
+                baseline = baseline or elapsed
+                print(f"  cache {'on ' if enabled else 'off'}: {args.requests / elapsed:8.0f} req/s, "
+                      f"{elapsed / args.requests * 1000:.2f} ms/request, {baseline / elapsed:.1f}x")
+            print(f"  cache stats: {chat_list_cache.metrics()}")
+        app.dependency_overrides.clear()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="Number of chats of the user")
+    parser.add_argument("--requests", type=int, default=2000, help="Number of GET /chats requests")
+    parser.add_argument("--write-every", type=int, default=10,
+                        help="Apply a new message event every N requests (0 - never)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
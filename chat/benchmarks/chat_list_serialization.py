@@ -0,0 +1,186 @@
+"""Compare the GET /chats serialization paths on a long chat list.
+
+Seeds a user with `--chats` chats (each with a last message) inside a
+rolled-back transaction and builds the response body `--requests` times:
+
+- legacy: the query loads the last message as an ORM entity, every row goes
+  through `ChatResponseItem.parse_obj` and `row2dict` (str() of every
+  value), then FastAPI validates and encodes the result against
+  `response_model`, as the endpoint did before;
+- fast: `ChatCRUD.get_chats` maps Core rows straight to dicts that orjson
+  encodes in one call (`ORJSONResponse`).
+
+Both bodies are checked to decode to the same JSON. The SQL time alone is
+measured too, so the Python share of a request is visible. Finally the real
+endpoint is called through the ASGI app with the chat list cache off.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.chat_list_serialization --chats 1000 --requests 200
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import orjson
+import sqlalchemy as sa
+from api.consts import USER_ID_HTTP_HEADER
+from api.deps import get_db
+from crud import ChatCRUD
+from crud.chats import chat_returning, chat_returning_keys
+from db.db import MyDatabase
+from fastapi.responses import ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from main import app
+from models import Chat, ChatParticipant, Message
+from schemas import ChatResponseItem, GetChatsResponseItem, MessageResponseItem
+from schemas.chats.response import NEW_MESSAGE_COUNT
+from settings import SETTINGS
+from utils import row2dict
+
+
+BENCHMARK_USER_ID: int = 2_000_000_000
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            SELECT 'benchmark-' || g, false FROM generate_series(1, :chats) g
+            RETURNING id
+        )
+        SELECT id FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available, unread_count)
+        SELECT id, :user_id, true, 3 FROM benchmark_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'last message of chat ' || c.id, true, :user_id + 1, c.id, now() - c.id * interval '1 second'
+        FROM benchmark_chats c
+        """
+    ),
+    sa.text(
+        """
+        UPDATE chats SET last_message_id = m.id, last_message_at = m.dt_created
+        FROM messages m
+        WHERE m.chat_id = chats.id AND chats.id IN (SELECT id FROM benchmark_chats)
+        """
+    ),
+)
+
+# ответ схемой response_model, как его проверяет и кодирует FastAPI
+response_field = create_response_field(name="Response_get_chats", type_=GetChatsResponseItem)
+
+
+def legacy_select_stmt(participant_id: int) -> sa.Select:
+    """Запрос списка чатов до быстрого пути: последнее сообщение загружается ORM-сущностью."""
+    return (
+        sa.select(*chat_returning, ChatParticipant.unread_count.label(NEW_MESSAGE_COUNT), Message)
+        .join(
+            ChatParticipant,
+            sa.and_(
+                ChatParticipant.chat_id == Chat.id,
+                ChatParticipant.participant_id == participant_id,
+                ChatParticipant.is_available == True,  # noqa
+            ),
+        )
+        .outerjoin(Message, sa.and_(Message.id == Chat.last_message_id, Message.dt_created == Chat.last_message_at))
+        .order_by(Chat.last_message_at.desc().nulls_last(), Chat.dt_created.desc())
+    )
+
+
+async def legacy_body(db) -> bytes:
+    res = (await db.execute(legacy_select_stmt(BENCHMARK_USER_ID))).all()
+    chats: list[ChatResponseItem] = []
+    for row in res:
+        chat_response_item: ChatResponseItem = ChatResponseItem.parse_obj(dict(zip(chat_returning_keys, row)))
+        chat_response_item.new_message_count = row[-2]
+        chat_response_item.last_message = MessageResponseItem.parse_obj(row2dict(row[-1])) if row[-1] else None
+        chats.append(chat_response_item)
+    content = await serialize_response(
+        field=response_field,
+        response_content=GetChatsResponseItem(chats=chats),
+        is_coroutine=True,
+    )
+    return ORJSONResponse(content=content).body
+
+
+async def fast_body(db) -> bytes:
+    return ORJSONResponse(content={"chats": await ChatCRUD.get_chats(BENCHMARK_USER_ID, db)}).body
+
+
+async def sql_only(db, select_stmt: sa.Select) -> None:
+    (await db.execute(select_stmt)).all()
+
+
+async def measure(requests: int, build) -> float:
+    """Среднее время одного вызова, миллисекунды."""
+    await build()
+    started: float = time.perf_counter()
+    for _ in range(requests):
+        await build()
+    return (time.perf_counter() - started) / requests * 1000
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with MyDatabase.rollback_session() as db:
+        params: dict = {"chats": args.chats, "user_id": BENCHMARK_USER_ID}
+        for stmt in seed_statements:
+            await db.execute(stmt, params)
+        await db.execute(sa.text("ANALYZE chats, chat_participants"))
+
+        legacy: bytes = await legacy_body(db)
+        fast: bytes = await fast_body(db)
+        assert orjson.loads(legacy) == orjson.loads(fast), "bodies differ"
+        print(f"GET /chats body for {args.chats} chats: {len(fast)} bytes, identical JSON on both paths")
+
+        fast_select_stmt: sa.Select = legacy_select_stmt(BENCHMARK_USER_ID) \
+            .with_only_columns(*chat_returning, ChatParticipant.unread_count, *Message.__table__.c)
+        results: dict = {}
+        for name, build, select_stmt in (
+                ("legacy", lambda: legacy_body(db), legacy_select_stmt(BENCHMARK_USER_ID)),
+                ("fast", lambda: fast_body(db), fast_select_stmt),
+        ):
+            total_ms: float = await measure(args.requests, build)
+            sql_ms: float = await measure(args.requests, lambda: sql_only(db, select_stmt))
+            results[name] = total_ms
+            print(f"  {name:<6} {total_ms:7.2f} ms/request: SQL and fetch {sql_ms:6.2f} ms, "
+                  f"Python {total_ms - sql_ms:6.2f} ms")
+        print(f"  fast path is {results['legacy'] / results['fast']:.1f}x faster")
+
+        async def get_benchmark_db():
+            yield db
+
+        app.dependency_overrides[get_db] = get_benchmark_db
+        SETTINGS.CHAT_LIST_CACHE_ENABLED = False
+        transport = httpx.ASGITransport(app=app)  # type: ignore
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            headers: dict = {USER_ID_HTTP_HEADER: str(BENCHMARK_USER_ID)}
+            started: float = time.perf_counter()
+            for _ in range(args.requests):
+                response = await client.get("/chats", headers=headers)
+                assert response.status_code == 200, response.text
+            elapsed: float = time.perf_counter() - started
+        print(f"  endpoint, cache off: {args.requests / elapsed:.0f} req/s, "
+              f"{elapsed / args.requests * 1000:.2f} ms/request")
+        app.dependency_overrides.clear()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=1000, help="Number of chats of the user")
+    parser.add_argument("--requests", type=int, default=200, help="Number of response bodies built on every path")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
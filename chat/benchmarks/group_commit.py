@@ -0,0 +1,136 @@
+"""Compare per-message commits with the group-commit writer.
+
+`--senders` concurrent senders post `--messages` messages in total to
+`--chats` chats of `--members` members through POST /messages (the ASGI app,
+with its `get_db` sessions and membership check). The baseline commits every
+message in its own transaction, then the app's `message_writer` is run with
+every flush interval from `--intervals`. For each run the throughput and the
+p50/p99 latency of a single send are printed.
+
+The membership cache is off unless `--membership-cache` is given, so every
+request reads the membership from the database and holds a pooled
+connection while its message waits for the writer. With more senders than
+pooled connections this checks that requests do not starve the writer.
+
+Messages are committed for real (the writer uses its own sessions), so the
+benchmark creates its own chats and deletes everything it wrote at the end.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.group_commit --senders 100 --messages 5000 --intervals 1,5,20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+import sqlalchemy as sa
+from api.consts import USER_ID_HTTP_HEADER
+from crud import ChatCRUD, message_writer
+from db.db import MyDatabase
+from main import app
+from settings import SETTINGS
+
+
+BENCHMARK_USER_ID: int = 1_700_000_000
+
+delete_statements: tuple = (
+    sa.text("DELETE FROM messages_participants WHERE chat_id = ANY(:chat_ids)"),
+    sa.text("UPDATE chats SET last_message_id = NULL, last_message_at = NULL WHERE id = ANY(:chat_ids)"),
+    sa.text("DELETE FROM messages WHERE chat_id = ANY(:chat_ids)"),
+    sa.text("DELETE FROM chat_participants WHERE chat_id = ANY(:chat_ids)"),
+    sa.text("DELETE FROM chats WHERE id = ANY(:chat_ids)"),
+)
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def run(client: httpx.AsyncClient, chat_ids: list[int], args: argparse.Namespace) -> tuple[float, list[float]]:
+    latencies: list[float] = []
+    per_sender: int = args.messages // args.senders
+
+    async def sender(n: int):
+        headers: dict = {USER_ID_HTTP_HEADER: str(BENCHMARK_USER_ID + n % args.members)}
+        for i in range(per_sender):
+            chat_id: int = chat_ids[(n + i) % len(chat_ids)]
+            started: float = time.perf_counter()
+            response = await client.post("/messages", json={"chat_id": chat_id, "text": f"message {n}-{i}"},
+                                         headers=headers)
+            assert response.status_code == 201, response.text
+            latencies.append(time.perf_counter() - started)
+
+    started: float = time.perf_counter()
+    # при ошибке одного отправителя остальные отменяются
+    async with asyncio.TaskGroup() as group:
+        for n in range(args.senders):
+            group.create_task(sender(n))
+    return time.perf_counter() - started, latencies
+
+
+def report(name: str, elapsed: float, latencies: list[float]):
+    latencies_ms: list[float] = [latency * 1000 for latency in latencies]
+    print(f"  {name:<22} {len(latencies) / elapsed:8.0f} msg/s, "
+          f"p50 {percentile(latencies_ms, 50):6.2f} ms, p99 {percentile(latencies_ms, 99):7.2f} ms")
+
+
+async def main(args: argparse.Namespace) -> None:
+    SETTINGS.CHAT_MEMBERSHIP_CACHE_ENABLED = args.membership_cache
+    MyDatabase.init()
+    chat_ids: list[int] = []
+    try:
+        async with MyDatabase.async_session() as db:
+            for _ in range(args.chats):
+                chat = await ChatCRUD.create_chat(
+                    db=db,
+                    participant_ids=list(range(BENCHMARK_USER_ID, BENCHMARK_USER_ID + args.members)),
+                    is_private=False,
+                    chat_name="group-commit-benchmark",
+                )
+                chat_ids.append(chat.id)
+
+        print(f"{args.messages} messages from {args.senders} concurrent senders "
+              f"to {args.chats} chats of {args.members} members, "
+              f"membership cache {'on' if args.membership_cache else 'off'}")
+        transport = httpx.ASGITransport(app=app)  # type: ignore
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            report("commit per message", *(await run(client, chat_ids, args)))
+
+            message_writer.max_batch = args.max_batch
+            for interval in args.intervals:
+                message_writer.interval = interval / 1000
+                flushes, flushed_messages = message_writer.flushes, message_writer.flushed_messages
+                await message_writer.start()
+                elapsed, latencies = await run(client, chat_ids, args)
+                await message_writer.stop()
+                flushes = message_writer.flushes - flushes
+                flushed_messages = message_writer.flushed_messages - flushed_messages
+                report(f"group commit {interval:g} ms", elapsed, latencies)
+                print(f"  {'':<22} {flushes} transactions, "
+                      f"{flushed_messages / max(flushes, 1):.1f} messages per transaction")
+    finally:
+        await message_writer.stop()
+        async with MyDatabase.async_session() as db:
+            for stmt in delete_statements:
+                await db.execute(stmt, {"chat_ids": chat_ids})
+            await db.commit()
+        await MyDatabase.finish()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--senders", type=int, default=100, help="Number of concurrent senders")
+    parser.add_argument("--messages", type=int, default=5000, help="Total number of messages")
+    parser.add_argument("--chats", type=int, default=20, help="Number of chats")
+    parser.add_argument("--members", type=int, default=5, help="Members of every chat")
+    parser.add_argument("--intervals", type=lambda v: [float(i) for i in v.split(",")], default=[1, 5, 20],
+                        help="Comma-separated flush intervals of the writer, ms")
+    parser.add_argument("--max-batch", type=int, default=200, help="Maximal number of messages in a transaction")
+    parser.add_argument("--membership-cache", action="store_true", help="Check membership through the process cache")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
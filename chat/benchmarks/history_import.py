@@ -0,0 +1,194 @@
+"""Measure the throughput of the COPY-based history import.
+
+Generates `--chats` chats of `--members` members and `--messages` messages
+(with a read status per member, as ROWS mode stores them) in NDJSON or CSV
+files, then loads them with `ingest.HistoryImporter` inside a transaction
+that is rolled back at the end:
+
+- rows/s of parsing the files alone (no database);
+- rows/s of COPY per table, of the integrity checks and of the recomputing
+  of last messages and unread counters;
+- for comparison, messages/s of the API write path (the insert CTE of
+  POST /messages/batch, `--baseline-messages` messages in batches of
+  CHAT_MESSAGES_BATCH_MAX_SIZE) into the same chats.
+
+Messages are dated within the current month, so no partition is created.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.history_import --messages 500000 --format ndjson
+"""
+import argparse
+import asyncio
+import csv
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import orjson
+import sqlalchemy as sa
+from crud.messages import insert_messages
+from db.db import MyDatabase
+from ingest import (
+    IMPORT_TABLES,
+    HistoryImporter,
+    chat_participants_import,
+    chats_import,
+    messages_import,
+    read_records,
+    read_statuses_import,
+)
+from settings import SETTINGS
+
+
+BENCHMARK_USER_ID: int = 1_800_000_000
+
+
+def write_file(path: Path, rows, columns: tuple[str, ...]) -> None:
+    if path.suffix == ".csv":
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(["" if row.get(column) is None else row[column] for column in columns])
+    else:
+        with path.open("wb") as f:
+            for row in rows:
+                f.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+
+
+def generate_files(directory: Path, args: argparse.Namespace, first_chat_id: int, first_message_id: int) -> dict:
+    now: datetime = datetime.now(timezone.utc)
+    month_start: datetime = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    step: timedelta = (now - month_start) / (args.messages + 1)
+    chat_ids: range = range(first_chat_id, first_chat_id + args.chats)
+    members: range = range(BENCHMARK_USER_ID, BENCHMARK_USER_ID + args.members)
+
+    def messages():
+        for n in range(args.messages):
+            yield {
+                "id": first_message_id + n,
+                "dt_created": (month_start + step * (n + 1)).isoformat(),
+                "dt_updated": None,
+                "text": f"imported message {n}",
+                "is_available": True,
+                "author_id": members[n % len(members)],
+                "chat_id": chat_ids[n % len(chat_ids)],
+            }
+
+    def read_statuses():
+        for n in range(args.messages):
+            author_id: int = members[n % len(members)]
+            for participant_id in members:
+                yield {
+                    "message_id": first_message_id + n,
+                    "participant_id": participant_id,
+                    "chat_id": chat_ids[n % len(chat_ids)],
+                    "is_read": participant_id == author_id,
+                }
+
+    contents: dict = {
+        chats_import.name: (
+            {"id": chat_id, "dt_created": month_start.isoformat(), "name": f"imported {chat_id}", "is_private": False}
+            for chat_id in chat_ids
+        ),
+        chat_participants_import.name: (
+            {"chat_id": chat_id, "participant_id": participant_id, "is_available": True}
+            for chat_id in chat_ids for participant_id in members
+        ),
+        messages_import.name: messages(),
+        read_statuses_import.name: read_statuses(),
+    }
+    paths: dict = {}
+    for table in IMPORT_TABLES:
+        paths[table.name] = directory / f"{table.name}.{args.format}"
+        write_file(paths[table.name], contents[table.name], table.column_names)
+    return paths
+
+
+async def main(args: argparse.Namespace) -> None:
+    MyDatabase.init()
+    async with MyDatabase.engine.connect() as conn:
+        last_chat_id, last_message_id = (await conn.execute(sa.text(
+            "SELECT (SELECT max(id) FROM chats), (SELECT last_value FROM messages_id_seq)"
+        ))).one()
+
+    with tempfile.TemporaryDirectory() as directory:
+        started: float = time.perf_counter()
+        first_chat_id: int = (last_chat_id or 0) + 1_000_000
+        paths: dict = generate_files(Path(directory), args, first_chat_id, last_message_id + 10_000_000)
+        print(f"Generated {args.format} files in {time.perf_counter() - started:.1f}s")
+
+        for table in IMPORT_TABLES:
+            started = time.perf_counter()
+            rows: int = sum(len(records) for records in read_records(paths[table.name], table, args.batch_size))
+            elapsed: float = time.perf_counter() - started
+            print(f"  parse {table.name:<24} {rows:>9} rows, {rows / elapsed:>9.0f} rows/s")
+
+        async with MyDatabase.engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                importer = HistoryImporter(conn, batch_size=args.batch_size)
+                await importer.lock()
+                total_started: float = time.perf_counter()
+                for table in IMPORT_TABLES:
+                    started = time.perf_counter()
+                    rows = await importer.copy(table, paths[table.name])
+                    elapsed = time.perf_counter() - started
+                    print(f"  COPY  {table.name:<24} {rows:>9} rows, {rows / elapsed:>9.0f} rows/s")
+                copy_elapsed: float = time.perf_counter() - total_started
+
+                started = time.perf_counter()
+                violations: list = await importer.check_integrity()
+                print(f"  integrity checks: {time.perf_counter() - started:.2f}s, violations: {len(violations)}")
+                started = time.perf_counter()
+                await importer.rebuild_chat_state()
+                print(f"  last messages and unread counters: {time.perf_counter() - started:.2f}s")
+                total_rows: int = sum(importer.rows.values())
+                print(f"import: {total_rows} rows in {time.perf_counter() - total_started:.1f}s, "
+                      f"{args.messages / copy_elapsed:.0f} messages/s with read statuses")
+
+                # API-путь: вставка CTE пачками, как POST /messages/batch
+                chat_ids: list[int] = list((await conn.execute(
+                    sa.text("SELECT id FROM chats WHERE id BETWEEN :lo AND :hi"),
+                    dict(zip(("lo", "hi"), importer.scopes[(chats_import.name, "id")])),
+                )).scalars())
+                batch_size: int = SETTINGS.CHAT_MESSAGES_BATCH_MAX_SIZE
+                started = time.perf_counter()
+                for offset in range(0, args.baseline_messages, batch_size):
+                    values: list[dict] = [
+                        {
+                            "text": f"api message {n}",
+                            "author_id": BENCHMARK_USER_ID,
+                            "chat_id": chat_ids[n % len(chat_ids)],
+                        }
+                        for n in range(offset, min(offset + batch_size, args.baseline_messages))
+                    ]
+                    await insert_messages(conn, values)
+                elapsed = time.perf_counter() - started
+                print(f"API insert path: {args.baseline_messages} messages in {elapsed:.1f}s, "
+                      f"{args.baseline_messages / elapsed:.0f} messages/s with read statuses")
+            finally:
+                await trans.rollback()
+    await MyDatabase.finish()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=1000, help="Number of chats")
+    parser.add_argument("--members", type=int, default=5, help="Members of every chat")
+    parser.add_argument("--messages", type=int, default=500_000, help="Number of messages")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson", help="Format of generated files")
+    parser.add_argument("--batch-size", type=int, default=SETTINGS.CHAT_IMPORT_BATCH_SIZE, help="Rows in one COPY")
+    parser.add_argument(
+        "--baseline-messages",
+        type=int,
+        default=20_000,
+        help="Messages written through the API insert path for comparison",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,145 @@
+"""Compare the latency of GET /messages/{chat_id} in page/size mode.
+
+Seeds a chat with `--messages` messages and `--members` members inside a
+rolled-back transaction, then fetches pages `--requests` times on two paths:
+
+- before: `ChatCRUD.check_user_in_chat` (membership cache off), then
+  fastapi-pagination `paginate`, which runs COUNT(*) and the page query:
+  three sequential round trips, and the messages are read even when the
+  caller is not a member of the chat;
+- after: `MessageCRUD.get_chat_messages`, one statement for membership,
+  total and page, where non-members never reach the messages.
+
+Reports p50/p99 of a member reading the first and a deep page with every
+`with_total` mode (exact COUNT(*), approx from the chat message counter, false),
+and of a non-member being rejected.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.message_page_round_trips --messages 50000 --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Literal
+
+import sqlalchemy as sa
+from crud import ChatCRUD, MessageCRUD
+from db.db import MyDatabase
+from enums import TotalModes
+from fastapi_pagination import Params
+from fastapi_pagination.ext.sqlalchemy import paginate
+from models import Message
+from settings import SETTINGS
+
+
+BENCHMARK_USER_ID: int = 2_100_000_000
+NON_MEMBER_ID: int = BENCHMARK_USER_ID - 1
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chat ON COMMIT DROP AS
+        WITH new_chat AS (
+            INSERT INTO chats (name, is_private) VALUES ('benchmark', false) RETURNING id
+        )
+        SELECT id FROM new_chat
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available)
+        SELECT c.id, :user_id + g, true FROM benchmark_chat c, generate_series(0, :members - 1) g
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'message ' || g, true, :user_id + g % :members, c.id,
+               now() - (:messages - g) * interval '10 milliseconds'
+        FROM benchmark_chat c, generate_series(1, :messages) g
+        """
+    ),
+    sa.text("UPDATE chats SET message_count = :messages WHERE id IN (SELECT id FROM benchmark_chat)"),
+)
+
+
+async def before(db, chat_id: int, user_id: int, page: int, size: int, with_total: TotalModes) -> bool:
+    """Путь до объединения запросов (with_total не поддерживался: COUNT выполнялся всегда)."""
+    is_user_in_chat: bool = await ChatCRUD.check_user_in_chat(db=db, participant_id=user_id, chat_id=chat_id)
+    select_stmt = sa.select(Message) \
+        .where(sa.and_(Message.chat_id == chat_id, Message.is_available == True)) \
+        .order_by(Message.dt_created)  # noqa
+    await paginate(db, select_stmt, params=Params(page=page, size=size))
+    return is_user_in_chat
+
+
+async def after(db, chat_id: int, user_id: int, page: int, size: int, with_total: TotalModes) -> bool:
+    res: dict | Literal[False] | None = await MessageCRUD.get_chat_messages(
+        db, chat_id, user_id, page, size, with_total,
+    )
+    assert res is not None
+    return res is not False
+
+
+async def measure(requests: int, call) -> list[float]:
+    """Время каждого вызова, миллисекунды."""
+    await call()
+    timings: list[float] = []
+    for _ in range(requests):
+        started: float = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def percentiles(timings: list[float]) -> tuple[float, float]:
+    cuts: list[float] = statistics.quantiles(timings, n=100, method="inclusive")
+    return cuts[49], cuts[98]
+
+
+async def main(args: argparse.Namespace) -> None:
+    SETTINGS.CHAT_MEMBERSHIP_CACHE_ENABLED = False
+    async with MyDatabase.rollback_session() as db:
+        params: dict = {"messages": args.messages, "members": args.members, "user_id": BENCHMARK_USER_ID}
+        for stmt in seed_statements:
+            await db.execute(stmt, params)
+        await db.execute(sa.text("ANALYZE chat_participants, messages"))
+        chat_id: int = (await db.execute(sa.text("SELECT id FROM benchmark_chat"))).scalar_one()
+
+        deep_page: int = max(args.messages // args.size // 2, 1)
+        cases: tuple = (
+            *(
+                (f"member, page {page}, {with_total.value}", BENCHMARK_USER_ID, page, with_total)
+                for page in (1, deep_page)
+                for with_total in TotalModes
+            ),
+            ("non-member", NON_MEMBER_ID, 1, TotalModes.EXACT),
+        )
+        print(f"Chat of {args.messages} messages, {args.members} members, page size {args.size}, "
+              f"{args.requests} requests per case")
+        print(f"  {'case':<28} {'before p50':>11} {'p99':>8} {'after p50':>11} {'p99':>8}")
+        for name, user_id, page, with_total in cases:
+            results: list = []
+            for path in (before, after):
+                is_member: bool = await path(db, chat_id, user_id, page, args.size, with_total)
+                assert is_member == (user_id != NON_MEMBER_ID)
+                results.extend(percentiles(await measure(
+                    args.requests,
+                    lambda: path(db, chat_id, user_id, page, args.size, with_total),  # noqa: B023
+                )))
+            print(f"  {name:<28} {results[0]:8.2f} ms {results[1]:5.2f} ms {results[2]:8.2f} ms {results[3]:5.2f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50_000, help="Messages in the chat")
+    parser.add_argument("--members", type=int, default=20, help="Members of the chat")
+    parser.add_argument("--size", type=int, default=15, help="Page size")
+    parser.add_argument("--requests", type=int, default=500, help="Pages fetched on every path for every case")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,143 @@
+"""Measure latency of the full-text message search on a large seeded table.
+
+Seeds `--messages` messages (random words from a `--vocabulary`-word
+dictionary) in `--chats` chats, the benchmark user is a member of every
+`--member-every`-th chat. Everything runs in a rolled-back transaction.
+Then `MessageCRUD.search_messages` is called for a frequent word, a rare
+word and a phrase; the first page and `--pages` next pages (keyset cursor)
+are timed.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.message_search --messages 2000000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy as sa
+from crud import MessageCRUD
+from db.db import MyDatabase
+from pagination import decode_search_cursor
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+BENCHMARK_USER_ID: int = 1_800_000_000
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            SELECT 'search-' || g, false FROM generate_series(1, :chats) g
+            RETURNING id
+        )
+        SELECT id, row_number() OVER (ORDER BY id) AS n FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available)
+        SELECT id, :user_id, true FROM benchmark_chats WHERE n % :member_every = 0
+        """
+    ),
+    # слова словаря встречаются с убывающей частотой (примерно по закону Ципфа)
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT
+            (
+                SELECT string_agg('w' || floor(:vocabulary ^ random())::int, ' ')
+                FROM generate_series(1, 6 + g % 10)
+                WHERE g > 0
+            ),
+            g % 50 <> 0,
+            :user_id,
+            (SELECT id FROM benchmark_chats WHERE n = 1 + g % :chats),
+            now() - g * interval '1 second'
+        FROM generate_series(1, :messages) g
+        """
+    ),
+    # переносим записи из pending list в GIN-индекс, как это сделал бы autovacuum
+    sa.text("SELECT gin_clean_pending_list('ix__messages__text_search')"),
+    sa.text("ANALYZE chats, chat_participants, messages"),
+)
+
+QUERIES: dict[str, str] = {
+    "frequent word": "w1",
+    "rare word": "w5000",
+    "phrase": '"w1 w2"',
+    "words with exclusion": "w3 w7 -w1",
+}
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+async def search_pages(db: AsyncSession, query: str, args: argparse.Namespace) -> tuple[list[float], int]:
+    timings: list[float] = []
+    found: int = 0
+    after: tuple[float, int] | None = None
+    for _ in range(args.pages + 1):
+        started: float = time.perf_counter()
+        page = await MessageCRUD.search_messages(
+            db=db,
+            participant_id=BENCHMARK_USER_ID,
+            query=query,
+            size=args.size,
+            after=after,
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+        found += len(page.items)
+        if page.next_cursor is None:
+            break
+        after = decode_search_cursor(page.next_cursor)
+    return timings, found
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with MyDatabase.rollback_session() as db:
+        started: float = time.perf_counter()
+        params: dict = {
+            "chats": args.chats,
+            "messages": args.messages,
+            "member_every": args.member_every,
+            "vocabulary": args.vocabulary,
+            "user_id": BENCHMARK_USER_ID,
+        }
+        for stmt in seed_statements:
+            await db.execute(stmt, params)
+        print(f"Seeded {args.messages} messages in {args.chats} chats in {time.perf_counter() - started:.0f}s, "
+              f"user is a member of {args.chats // args.member_every} chats")
+
+        for name, query in QUERIES.items():
+            first_pages: list[float] = []
+            next_pages: list[float] = []
+            found: int = 0
+            for _ in range(args.repeat):
+                timings, found = await search_pages(db, query, args)
+                first_pages.append(timings[0])
+                next_pages.extend(timings[1:])
+            line: str = f"  {name:<22} {query!r:<14} first page p50 {percentile(first_pages, 50):7.2f} ms"
+            if next_pages:
+                line += f", next pages p50 {percentile(next_pages, 50):7.2f} ms"
+            print(f"{line} ({found} results on {1 + len(next_pages) // args.repeat} pages)")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2_000_000, help="Number of seeded messages")
+    parser.add_argument("--chats", type=int, default=10_000, help="Number of seeded chats")
+    parser.add_argument("--member-every", type=int, default=20, help="User is a member of every N-th chat")
+    parser.add_argument("--vocabulary", type=int, default=20_000, help="Number of distinct words")
+    parser.add_argument("--size", type=int, default=20, help="Page size")
+    parser.add_argument("--pages", type=int, default=5, help="Number of next pages to fetch by cursor")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repetitions of every query")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,97 @@
+"""Measure end-to-end delivery latency of the LISTEN/NOTIFY event bus.
+
+Starts `--workers` subscriber processes, each with its own `PostgresPubSub`
+connection (as every uvicorn worker has), and publishes `--events` events
+from the main process. Every subscriber reports the time between publishing
+and handling each event.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.pubsub_latency --workers 4 --events 1000
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import statistics
+import time
+
+import orjson
+from realtime import PostgresPubSub
+from settings import SETTINGS
+
+
+BENCHMARK_CHANNEL: str = f"{SETTINGS.CHAT_PUBSUB_CHANNEL}_benchmark"
+
+
+def run_subscriber(events: int, ready, results) -> None:
+    async def subscribe() -> list[float]:
+        latencies: list[float] = []
+        done = asyncio.Event()
+
+        async def handler(payload: str):
+            latencies.append(time.time() - orjson.loads(payload)["sent_at"])
+            if len(latencies) == events:
+                done.set()
+
+        pubsub = PostgresPubSub(SETTINGS.get_direct_database_uri(), BENCHMARK_CHANNEL)
+        await pubsub.start(handler)
+        ready.release()
+        await done.wait()
+        await pubsub.stop()
+        return latencies
+
+    results.put(asyncio.run(subscribe()))
+
+
+async def publish(args: argparse.Namespace) -> float:
+    pubsub = PostgresPubSub(SETTINGS.get_direct_database_uri(), BENCHMARK_CHANNEL)
+
+    async def ignore(payload: str):
+        pass
+
+    await pubsub.start(ignore)
+    started: float = time.perf_counter()
+    for i in range(args.events):
+        await pubsub.publish(orjson.dumps({"type": "benchmark", "seq": i, "sent_at": time.time()}).decode())
+        if args.interval:
+            await asyncio.sleep(args.interval / 1000)
+    elapsed: float = time.perf_counter() - started
+    await pubsub.stop()
+    return elapsed
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+
+def main(args: argparse.Namespace) -> None:
+    ctx = mp.get_context("spawn")
+    ready = ctx.Semaphore(0)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=run_subscriber, args=(args.events, ready, results)) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    for _ in workers:
+        ready.acquire()
+
+    elapsed: float = asyncio.run(publish(args))
+    latencies: list[float] = [latency * 1000 for _ in workers for latency in results.get()]
+    for worker in workers:
+        worker.join()
+
+    print(f"{args.events} events to {args.workers} workers, published in {elapsed:.2f}s "
+          f"({args.events / elapsed:.0f} events/s)")
+    print(f"  latency p50: {percentile(latencies, 50):.2f} ms, p99: {percentile(latencies, 99):.2f} ms, "
+          f"max: {max(latencies):.2f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Number of subscriber processes")
+    parser.add_argument("--events", type=int, default=1000, help="Number of published events")
+    parser.add_argument("--interval", type=float, default=1, help="Pause between events, ms")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
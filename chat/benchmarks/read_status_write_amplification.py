@@ -0,0 +1,87 @@
+"""Compare write amplification of read status modes (ROWS vs WATERMARK).
+
+For every mode a chat with `--members` participants is created and
+`--messages` messages are sent through `MessageCRUD.add_message_to_chat`,
+then every member marks the chat read. Rows written per table are taken
+from `pg_stat_xact_user_tables`. Everything runs in a rolled-back
+transaction.
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.read_status_write_amplification --members 500 --messages 200
+"""
+import argparse
+import asyncio
+import time
+
+import sqlalchemy as sa
+from crud import ChatCRUD, MessageCRUD
+from db.db import MyDatabase
+from enums import ReadStatusModes
+from schemas import CreateMessageRequestSchema
+from settings import SETTINGS
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+BENCHMARK_USER_ID: int = 1_500_000_000
+
+select_written_rows = sa.text(
+    """
+    SELECT relname, n_tup_ins + n_tup_upd + n_tup_del AS written
+    FROM pg_stat_xact_user_tables
+    WHERE relname IN ('chats', 'chat_participants', 'messages', 'messages_participants')
+    ORDER BY relname
+    """
+)
+
+
+async def run_mode(mode: ReadStatusModes, args: argparse.Namespace) -> None:
+    SETTINGS.CHAT_READ_STATUS_MODE = mode
+    participant_ids: list[int] = list(range(BENCHMARK_USER_ID, BENCHMARK_USER_ID + args.members))
+
+    db: AsyncSession
+    async with MyDatabase.rollback_session() as db:
+        chat = await ChatCRUD.create_chat(db=db, participant_ids=participant_ids, is_private=False)
+        baseline: dict[str, int] = dict((await db.execute(select_written_rows)).all())
+
+        started: float = time.perf_counter()
+        for i in range(args.messages):
+            await MessageCRUD.add_message_to_chat(
+                db=db,
+                author_id=participant_ids[i % args.members],
+                chat_id=chat.id,
+                message=CreateMessageRequestSchema(chat_id=chat.id, text=f"message {i}"),
+            )
+        send_elapsed: float = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for participant_id in participant_ids:
+            await MessageCRUD.mark_messages_read(db=db, chat_id=chat.id, participant_id=participant_id)
+        read_elapsed: float = time.perf_counter() - started
+
+        written: dict[str, int] = dict((await db.execute(select_written_rows)).all())
+
+    total: int = sum(written[table] - baseline.get(table, 0) for table in written)
+    print(f"{mode.value}: {args.messages} messages x {args.members} members")
+    print(f"  send: {send_elapsed / args.messages * 1000:.2f} ms/message, "
+          f"mark read: {read_elapsed / args.members * 1000:.2f} ms/member")
+    for table, rows in written.items():
+        print(f"  {table:24} {rows - baseline.get(table, 0):>10} rows written")
+    print(f"  {'total':24} {total:>10} rows written, {total / args.messages:.1f} per message")
+
+
+async def main(args: argparse.Namespace) -> None:
+    for mode in ReadStatusModes:
+        await run_mode(mode, args)
+    await MyDatabase.finish()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=500, help="Number of chat members")
+    parser.add_argument("--messages", type=int, default=200, help="Number of sent messages")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,227 @@
+"""Isolate the statement build and compile overhead of the hot CRUD queries.
+
+For every hot statement (chat list, chat members, message page, cursor page,
+message insert) the benchmark measures, in microseconds per request:
+
+- build: constructing the SQLAlchemy statement, as every request did before
+  statements were built once at import;
+- cache key: generating the compiled-cache key of a freshly built statement;
+- compile: compiling it to SQL, which is what a miss of the compiled cache costs;
+- prebuilt key: generating the key of the statement built at import, which
+  SQLAlchemy does on every execution but with memoized parts reused.
+
+Then the statements are executed `--requests` times against a small dataset
+seeded in a rolled-back transaction, and the p50 latency is printed for:
+
+- rebuilt: a new statement per request, default caches;
+- prebuilt: the statement built at import, default caches;
+- no query cache: prebuilt, `CHAT_POSTGRES_QUERY_CACHE_SIZE=0`;
+- no prepared cache: prebuilt, `CHAT_POSTGRES_STATEMENT_CACHE_SIZE=0`
+  (every execution prepares the statement again, as behind PgBouncer).
+
+Usage (from the `chat` directory):
+
+    python -m benchmarks.statement_overhead --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import sqlalchemy as sa
+from crud.chats import GET_CHATS_STMTS, build_get_chats_stmt, select_chat_member_ids_stmt
+from crud.messages import (
+    CHAT_MESSAGES_PAGE_STMTS,
+    INSERT_MESSAGES_STMTS,
+    MESSAGES_CURSOR_PAGE_STMTS,
+    build_chat_messages_page_stmt,
+    build_insert_messages_stmt,
+    build_messages_cursor_page_stmt,
+    insert_messages_params,
+)
+from db.db import MyDatabase
+from enums import TotalModes
+from models import ChatParticipant, Message
+from settings import SETTINGS
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+
+BENCHMARK_USER_ID: int = 1_900_000_000
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE benchmark_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            SELECT 'benchmark-' || g, false FROM generate_series(1, :chats) g
+            RETURNING id
+        )
+        SELECT id FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available)
+        SELECT c.id, :user_id + g, true FROM benchmark_chats c, generate_series(0, :members - 1) g
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'message ' || g, true, :user_id + g % :members, c.id, now() - g * interval '1 second'
+        FROM benchmark_chats c, generate_series(1, :messages) g
+        """
+    ),
+    sa.text(
+        """
+        UPDATE chats SET last_message_id = m.id, last_message_at = m.dt_created, message_count = :messages
+        FROM messages m
+        WHERE m.chat_id = chats.id AND m.dt_created = (SELECT max(dt_created) FROM messages WHERE chat_id = chats.id)
+            AND chats.id IN (SELECT id FROM benchmark_chats)
+        """
+    ),
+)
+
+
+def get_cases(chat_id: int, cursor: tuple) -> list[tuple]:
+    """(название, построение запроса, запрос из импорта, параметры)."""
+    mode = SETTINGS.CHAT_READ_STATUS_MODE
+    return [
+        (
+            "chat list",
+            lambda: build_get_chats_stmt(mode),
+            GET_CHATS_STMTS[mode],
+            {"participant_id": BENCHMARK_USER_ID},
+        ),
+        (
+            "chat members",
+            lambda: sa.select(ChatParticipant.participant_id).where(ChatParticipant.chat_id == sa.bindparam("chat_id")),
+            select_chat_member_ids_stmt,
+            {"chat_id": chat_id},
+        ),
+        (
+            "message page, exact",
+            lambda: build_chat_messages_page_stmt(TotalModes.EXACT),
+            CHAT_MESSAGES_PAGE_STMTS[TotalModes.EXACT],
+            {"chat_id": chat_id, "participant_id": BENCHMARK_USER_ID, "limit": 15, "offset": 15},
+        ),
+        (
+            "message page, no total",
+            lambda: build_chat_messages_page_stmt(TotalModes.FALSE),
+            CHAT_MESSAGES_PAGE_STMTS[TotalModes.FALSE],
+            {"chat_id": chat_id, "participant_id": BENCHMARK_USER_ID, "limit": 15, "offset": 15},
+        ),
+        (
+            "cursor page, before",
+            lambda: build_messages_cursor_page_stmt(Message, "before"),
+            MESSAGES_CURSOR_PAGE_STMTS[(Message, "before")],
+            {"chat_id": chat_id, "limit": 16, "cursor_dt_created": cursor[0], "cursor_id": cursor[1]},
+        ),
+        (
+            "message insert",
+            lambda: build_insert_messages_stmt(mode),
+            INSERT_MESSAGES_STMTS[mode],
+            insert_messages_params([{"text": "benchmark", "author_id": BENCHMARK_USER_ID, "chat_id": chat_id}]),
+        ),
+    ]
+
+
+def measure_python(requests: int, call) -> float:
+    """Среднее время вызова, микросекунды."""
+    started: float = time.perf_counter()
+    for _ in range(requests):
+        call()
+    return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def measure_execute(requests: int, call) -> float:
+    """p50 времени вызова, микросекунды."""
+    await call()
+    timings: list[float] = []
+    for _ in range(requests):
+        started: float = time.perf_counter()
+        await call()
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return statistics.median(timings)
+
+
+async def run_engine(name: str, options: dict, args: argparse.Namespace, rebuild: bool, results: dict) -> None:
+    engine = create_async_engine(SETTINGS.get_async_database_uri(), **options)
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            params: dict = {
+                "chats": args.chats,
+                "members": args.members,
+                "messages": args.messages,
+                "user_id": BENCHMARK_USER_ID,
+            }
+            for stmt in seed_statements:
+                await conn.execute(stmt, params)
+            chat_id: int = (await conn.execute(sa.text("SELECT min(id) FROM benchmark_chats"))).scalar_one()
+            cursor: tuple = (await conn.execute(
+                sa.select(Message.dt_created, Message.id).where(Message.chat_id == chat_id).limit(1)
+            )).one()
+            db = AsyncSession(bind=conn)
+            for case, build, prebuilt, stmt_params in get_cases(chat_id, tuple(cursor)):
+                if rebuild:
+                    async def call():
+                        await db.execute(build(), stmt_params)  # noqa: B023
+                else:
+                    async def call():
+                        await db.execute(prebuilt, stmt_params)  # noqa: B023
+                results.setdefault(case, {})[name] = await measure_execute(args.requests, call)
+        finally:
+            await trans.rollback()
+    await engine.dispose()
+
+
+async def main(args: argparse.Namespace) -> None:
+    MyDatabase.init()
+    dialect = MyDatabase.engine.dialect
+    print(f"Python overhead per request, microseconds (mean of {args.requests})")
+    print(f"  {'statement':<24} {'build':>8} {'cache key':>10} {'compile':>9} {'prebuilt key':>13}")
+    for case, build, prebuilt, _ in get_cases(1, (None, 1)):
+        build_us: float = measure_python(args.requests, build)
+        key_us: float = measure_python(args.requests, lambda: build()._generate_cache_key()) - build_us  # noqa: B023
+        compile_us: float = measure_python(
+            args.requests // 10 or 1,
+            lambda: build().compile(dialect=dialect),  # noqa: B023
+        ) - build_us
+        prebuilt_key_us: float = measure_python(args.requests, prebuilt._generate_cache_key)
+        print(f"  {case:<24} {build_us:8.1f} {key_us:10.1f} {compile_us:9.1f} {prebuilt_key_us:13.1f}")
+    await MyDatabase.finish()
+
+    default_options: dict = MyDatabase.engine_options()
+    runs: tuple = (
+        ("rebuilt", default_options, True),
+        ("prebuilt", default_options, False),
+        ("no query cache", {**default_options, "query_cache_size": 0}, False),
+        ("no prepared cache", {
+            **default_options,
+            "connect_args": {"prepared_statement_cache_size": 0, "statement_cache_size": 0},
+        }, False),
+    )
+    results: dict = {}
+    for name, options, rebuild in runs:
+        await run_engine(name, options, args, rebuild, results)
+
+    print(f"Execution p50, microseconds ({args.requests} requests, {args.chats} chats "
+          f"of {args.messages} messages)")
+    print(f"  {'statement':<24}" + "".join(f" {name:>18}" for name, _, _ in runs))
+    for case, timings in results.items():
+        print(f"  {case:<24}" + "".join(f" {timings[name]:18.0f}" for name, _, _ in runs))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=20, help="Chats of the user")
+    parser.add_argument("--members", type=int, default=5, help="Members of every chat")
+    parser.add_argument("--messages", type=int, default=200, help="Messages of every chat")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per statement and configuration")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
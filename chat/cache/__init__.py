@@ -0,0 +1,13 @@
+from .chat_list import ChatListCache, chat_list_cache
+from .membership import invalidate_chat_members, membership_cache
+from .ttl_lru import CacheStats, TTLLRUCache
+
+
+__all__ = (
+    "CacheStats",
+    "TTLLRUCache",
+    "ChatListCache",
+    "membership_cache",
+    "invalidate_chat_members",
+    "chat_list_cache",
+)
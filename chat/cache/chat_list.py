@@ -0,0 +1,251 @@
+import time
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime
+from typing import Iterable
+
+import orjson
+from settings import SETTINGS
+
+from .ttl_lru import CacheStats
+
+
+# Оценка накладных расходов на хранение одного чата в кеше, байты
+CHAT_ENTRY_OVERHEAD: int = 256
+# Сколько последних изменений помнит кеш для проверки значений, загруженных из базы
+RECENT_CHANGES_SIZE: int = 4096
+
+
+class CachedChat:
+    """Элемент списка чатов пользователя вместе с его сериализованным видом."""
+
+    __slots__ = ("item", "sort_key", "payload")
+
+    def __init__(self, item: dict):
+        self.item: dict = item
+        self.sort_key: tuple = ()
+        self.payload: bytes = b""
+        self.refresh()
+
+    def refresh(self):
+        last_message: dict | None = self.item["last_message"]
+        last_message_at: datetime | None = _as_datetime(last_message["dt_created"]) if last_message else None
+        # порядок как в ChatCRUD.get_chats: последняя активность desc nulls last, затем dt_created desc
+        self.sort_key = (
+            last_message_at is not None,
+            last_message_at.timestamp() if last_message_at else 0.0,
+            _as_datetime(self.item["dt_created"]).timestamp(),
+        )
+        self.payload = orjson.dumps(self.item)
+
+
+class UserChatList:
+    """Кешированный список чатов пользователя."""
+
+    __slots__ = ("chats", "body", "expires_at", "size")
+
+    def __init__(self, chats: dict[int, CachedChat], expires_at: float):
+        self.chats: dict[int, CachedChat] = chats
+        self.body: bytes | None = None
+        self.expires_at: float = expires_at
+        self.size: int = 0
+        self.update_size()
+
+    def update_size(self):
+        self.size = sum(len(chat.payload) + CHAT_ENTRY_OVERHEAD for chat in self.chats.values()) \
+            + (len(self.body) if self.body else 0)
+
+    def render(self) -> bytes:
+        """Тело ответа GET /chats, собирается из готовых элементов только после изменений."""
+        if self.body is None:
+            chats: list[CachedChat] = sorted(self.chats.values(), key=lambda chat: chat.sort_key, reverse=True)
+            self.body = b'{"chats":[' + b",".join(chat.payload for chat in chats) + b"]}"
+        return self.body
+
+
+class ChatListCache:
+    """Кеш ответов GET /chats по пользователям.
+
+    Новые сообщения и прочтения применяются к закешированным спискам точечно
+    (см. `apply_message`, `apply_read`), остальные изменения чата сбрасывают
+    списки его участников. Память ограничена `max_bytes`: при превышении
+    вытесняются списки пользователей, которые дольше всех не запрашивали чаты.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.size: int = 0
+        self.seq: int = 0
+        self._users: OrderedDict[int, UserChatList] = OrderedDict()
+        self._chat_users: defaultdict[int, set[int]] = defaultdict(set)
+        # последние изменения: (seq, chat_id, id пользователей или None - все участники чата)
+        self._recent: deque[tuple[int, int | None, frozenset[int] | None]] = deque(maxlen=RECENT_CHANGES_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def metrics(self) -> dict:
+        """Снимок размера и статистики кеша."""
+        return {
+            "users": len(self._users),
+            "size_bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+    def get(self, user_id: int) -> bytes | None:
+        chat_list: UserChatList | None = self._users.get(user_id)
+        if chat_list is None or chat_list.expires_at < time.monotonic():
+            if chat_list is not None:
+                self._remove(user_id)
+            self.stats.misses += 1
+            return None
+        self._users.move_to_end(user_id)
+        self.stats.hits += 1
+        body: bytes = chat_list.render()
+        self._resize(user_id, chat_list)
+        return body
+
+    def set(self, user_id: int, chats: Iterable[dict], seq: int) -> bytes:
+        """Сохранить список чатов пользователя, загруженный из базы, и вернуть тело ответа.
+
+        chats - элементы в формате ChatResponseItem (см. `ChatCRUD.get_chats`), кеш владеет ими
+        и изменяет их при обновлениях.
+
+        seq - значение `self.seq` до начала загрузки: если с тех пор изменился
+        один из чатов пользователя, то список не сохраняется (но ответ все равно отдается).
+        """
+        chat_list = UserChatList(
+            chats={chat["id"]: CachedChat(chat) for chat in chats},
+            expires_at=time.monotonic() + self.ttl,
+        )
+        body: bytes = chat_list.render()
+        chat_list.update_size()
+        if self._is_changed_since(seq, user_id, chat_list.chats):
+            return body
+
+        self._remove(user_id)
+        self._users[user_id] = chat_list
+        for chat_id in chat_list.chats:
+            self._chat_users[chat_id].add(user_id)
+        self.size += chat_list.size
+        self._evict()
+        return body
+
+    def apply_message(self, message: dict):
+        """Учесть новое сообщение в списках участников его чата."""
+        chat_id: int = message["chat_id"]
+        self._record_change(chat_id, None)
+        message_key: tuple = (_as_datetime(message["dt_created"]), message["id"])
+        for user_id in tuple(self._chat_users.get(chat_id, ())):
+            chat_list: UserChatList = self._users[user_id]
+            chat: CachedChat = chat_list.chats[chat_id]
+            last_message: dict | None = chat.item["last_message"]
+            # последним становится только более новое сообщение, как в build_insert_messages_stmt
+            if last_message is not None and message_key <= (
+                    _as_datetime(last_message["dt_created"]), last_message["id"]):
+                if message["id"] == last_message["id"]:
+                    # сообщение уже есть в списке, загруженном из базы после его вставки
+                    continue
+                # dt_created - время начала транзакции: более старое сообщение могло закоммититься
+                # после загрузки списка, а могло и попасть в него. Счетчик непрочитанных
+                # по спискам не восстановить, поэтому они перечитываются из базы
+                self.invalidate_chat(chat_id)
+                return
+            chat.item["last_message"] = message
+            if message["author_id"] != user_id and chat.item["new_message_count"] is not None:
+                chat.item["new_message_count"] += 1
+            self._update_chat(user_id, chat_list, chat)
+
+    def apply_read(self, chat_id: int, participant_id: int, unread_count: int):
+        """Учесть прочтение сообщений чата участником."""
+        self._record_change(chat_id, frozenset((participant_id,)))
+        chat_list: UserChatList | None = self._users.get(participant_id)
+        if chat_list is None or chat_id not in chat_list.chats:
+            return
+        chat: CachedChat = chat_list.chats[chat_id]
+        chat.item["new_message_count"] = unread_count
+        self._update_chat(participant_id, chat_list, chat)
+
+    def invalidate_chat(self, chat_id: int):
+        """Сбросить списки всех пользователей, у которых есть чат chat_id."""
+        self._record_change(chat_id, None)
+        for user_id in tuple(self._chat_users.get(chat_id, ())):
+            self._remove(user_id)
+            self.stats.invalidations += 1
+
+    def invalidate_users(self, user_ids: Iterable[int]):
+        user_ids = frozenset(user_ids)
+        self._record_change(None, user_ids)
+        for user_id in user_ids:
+            if user_id in self._users:
+                self._remove(user_id)
+                self.stats.invalidations += 1
+
+    def clear(self):
+        self._record_change(None, None)
+        self._users.clear()
+        self._chat_users.clear()
+        self.size = 0
+
+    def _update_chat(self, user_id: int, chat_list: UserChatList, chat: CachedChat):
+        chat.refresh()
+        chat_list.body = None
+        self._resize(user_id, chat_list)
+
+    def _resize(self, user_id: int, chat_list: UserChatList):
+        old_size: int = chat_list.size
+        chat_list.update_size()
+        self.size += chat_list.size - old_size
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._users:
+            self._remove(next(iter(self._users)))
+            self.stats.evictions += 1
+
+    def _remove(self, user_id: int):
+        chat_list: UserChatList | None = self._users.pop(user_id, None)
+        if chat_list is None:
+            return
+        self.size -= chat_list.size
+        for chat_id in chat_list.chats:
+            users: set[int] | None = self._chat_users.get(chat_id)
+            if users is None:
+                continue
+            users.discard(user_id)
+            if not users:
+                del self._chat_users[chat_id]
+
+    def _record_change(self, chat_id: int | None, user_ids: frozenset[int] | None):
+        self.seq += 1
+        self._recent.append((self.seq, chat_id, user_ids))
+
+    def _is_changed_since(self, seq: int, user_id: int, chats: dict[int, CachedChat]) -> bool:
+        if seq == self.seq:
+            return False
+        if not self._recent or self._recent[0][0] > seq + 1:
+            # изменения после seq уже вытеснены из журнала - проверить нельзя
+            return True
+        for change_seq, chat_id, user_ids in reversed(self._recent):
+            if change_seq <= seq:
+                break
+            if user_ids is not None:
+                if user_id in user_ids:
+                    return True
+            elif chat_id is None or chat_id in chats:
+                return True
+        return False
+
+
+def _as_datetime(value: datetime | str) -> datetime:
+    # в событиях шины даты уже сериализованы в iso-формат
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+chat_list_cache: ChatListCache = ChatListCache(
+    max_bytes=SETTINGS.CHAT_LIST_CACHE_MAX_BYTES,
+    ttl=SETTINGS.CHAT_LIST_CACHE_TTL,
+)
@@ -0,0 +1,16 @@
+from settings import SETTINGS
+
+from .ttl_lru import TTLLRUCache
+
+
+# id участников чата по id чата.
+# Короткий TTL ограничивает время, в течение которого процесс может не знать
+# об изменении состава чата, если событие шины до него не дошло.
+membership_cache: TTLLRUCache[frozenset[int]] = TTLLRUCache(
+    maxsize=SETTINGS.CHAT_MEMBERSHIP_CACHE_SIZE,
+    ttl=SETTINGS.CHAT_MEMBERSHIP_CACHE_TTL,
+)
+
+
+def invalidate_chat_members(chat_id: int):
+    membership_cache.invalidate(chat_id)
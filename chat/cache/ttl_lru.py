@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+
+V = TypeVar("V")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    def as_dict(self) -> dict:
+        lookups: int = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class TTLLRUCache(Generic[V]):
+    """LRU-кеш процесса с ограниченным временем жизни записей.
+
+    Каждая инвалидация увеличивает поколение кеша: значение, загруженное из базы
+    до инвалидации, не попадет в кеш (см. `generation` и `set`).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self.generation: int = 0
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def metrics(self) -> dict:
+        """Снимок размера и статистики кеша."""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            **self.stats.as_dict(),
+        }
+
+    def get(self, key: Hashable) -> V | None:
+        item: tuple[float, V] | None = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: V, generation: int | None = None):
+        """Сохранить значение.
+
+        generation - поколение кеша на момент начала загрузки значения;
+        если с тех пор была инвалидация, то значение могло устареть и не сохраняется.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self.generation += 1
+        self.stats.invalidations += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
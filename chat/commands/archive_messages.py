@@ -0,0 +1,191 @@
+"""Move deleted and old messages into the archive tables.
+
+Soft-deleted messages (and, with `--older-than-days`, messages older than
+that) are moved from `messages`/`messages_participants` into
+`messages_archive`/`messages_participants_archive`. Archived history stays
+readable through GET /messages/{chat_id}/archive.
+
+The job is gentle on locks: every batch is one short transaction that skips
+rows locked by concurrent writers (FOR UPDATE SKIP LOCKED) and gives up on a
+lock after `--lock-timeout`; `--pause` spaces batches out. The last message
+of a chat is never archived. Every batch notifies the running API processes
+(chat.updated) about chats whose unread counters changed.
+
+Deleted rows leave dead tuples behind; the report shows the bytes of moved
+rows (space that VACUUM makes reusable) and table sizes before and after.
+With `--vacuum` the hot tables are vacuumed at the end.
+
+Usage (from the `chat` directory):
+
+    python -m commands.archive_messages [--older-than-days 365] [--batch-size 500] [--vacuum]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable
+
+import sqlalchemy as sa
+from crud import MessageArchiveCRUD
+from db.db import MyDatabase
+from log import get_logger
+from models import Message, MessagesToParticipants
+from realtime import CHAT_UPDATED, encode_event
+from settings import SETTINGS
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+logger = get_logger(__name__)
+
+# Чатов в одной странице обхода при переносе старых сообщений
+CHAT_PAGE_SIZE: int = 1000
+
+
+class ArchiveStats:
+    def __init__(self):
+        self.batches: int = 0
+        self.messages: int = 0
+        self.read_statuses: int = 0
+        self.message_bytes: int = 0
+        self.read_status_bytes: int = 0
+        self.failed_batches: int = 0
+
+    def add(self, batch: dict):
+        self.batches += 1
+        self.messages += batch["messages"]
+        self.read_statuses += batch["read_statuses"]
+        self.message_bytes += batch["message_bytes"]
+        self.read_status_bytes += batch["read_status_bytes"]
+
+
+async def run_batches(
+        args: argparse.Namespace,
+        stats: ArchiveStats,
+        archive_batch: Callable[[AsyncConnection], Awaitable[dict]],
+) -> None:
+    """Переносить пачки, пока очередная пачка не окажется неполной."""
+    while args.max_batches is None or stats.batches < args.max_batches:
+        try:
+            async with MyDatabase.engine.begin() as conn:
+                await conn.execute(sa.text(f"SET LOCAL lock_timeout = '{args.lock_timeout}s'"))
+                batch: dict = await archive_batch(conn)
+                if SETTINGS.CHAT_PUBSUB_ENABLED:
+                    # уведомления доставляются только после фиксации транзакции
+                    for chat_id in batch["chat_ids"] or ():
+                        await conn.execute(
+                            sa.select(sa.func.pg_notify(
+                                SETTINGS.CHAT_PUBSUB_CHANNEL,
+                                encode_event(CHAT_UPDATED, {"chat_id": chat_id}),
+                            ))
+                        )
+        except DBAPIError as e:
+            # например, lock_timeout: пачка откатилась целиком, попробуем позже
+            stats.failed_batches += 1
+            logger.error(f"Archive batch failed: {e.orig}")
+            if stats.failed_batches > args.max_errors:
+                raise
+            await asyncio.sleep(max(args.pause, 1.0))
+            continue
+        stats.add(batch)
+        if batch["messages"] < args.batch_size:
+            return
+        if args.pause:
+            await asyncio.sleep(args.pause)
+
+
+async def main(args: argparse.Namespace) -> None:
+    MyDatabase.init()
+    stats = ArchiveStats()
+    started_at: float = time.monotonic()
+
+    async with MyDatabase.engine.connect() as conn:
+        sizes_before: dict[str, int] = await MessageArchiveCRUD.get_table_sizes(conn)
+
+    await run_batches(
+        args,
+        stats,
+        lambda conn: MessageArchiveCRUD.archive_deleted_messages(conn, batch_size=args.batch_size),
+    )
+    print(f"Deleted messages archived: {stats.messages}")
+
+    if args.older_than_days is not None:
+        older_than: datetime = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+        deleted_messages: int = stats.messages
+        last_chat_id: int = 0
+        while True:
+            async with MyDatabase.engine.connect() as conn:
+                chat_ids: list[int] = await MessageArchiveCRUD.get_chat_ids_with_old_messages(
+                    conn,
+                    older_than=older_than,
+                    after_id=last_chat_id,
+                    limit=CHAT_PAGE_SIZE,
+                )
+            if not chat_ids:
+                break
+            for chat_id in chat_ids:
+                await run_batches(
+                    args,
+                    stats,
+                    lambda conn: MessageArchiveCRUD.archive_old_messages(
+                        conn,
+                        chat_id=chat_id,
+                        older_than=older_than,
+                        batch_size=args.batch_size,
+                    ),
+                )
+            last_chat_id = chat_ids[-1]
+        print(f"Messages older than {older_than.isoformat()} archived: {stats.messages - deleted_messages}")
+
+    if args.vacuum:
+        # VACUUM нельзя выполнить в транзакции
+        async with MyDatabase.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for table_name in (Message.__tablename__, MessagesToParticipants.__tablename__):
+                await conn.execute(sa.text(f"VACUUM (ANALYZE) {table_name}"))
+
+    async with MyDatabase.engine.connect() as conn:
+        sizes_after: dict[str, int] = await MessageArchiveCRUD.get_table_sizes(conn)
+    await MyDatabase.finish()
+
+    elapsed: float = time.monotonic() - started_at
+    print(
+        f"Moved {stats.messages} messages and {stats.read_statuses} read statuses "
+        f"in {stats.batches} batches, {elapsed:.1f}s ({stats.messages / elapsed if elapsed else 0:.0f} messages/s)"
+    )
+    print(
+        f"Reclaimable after VACUUM: {stats.message_bytes + stats.read_status_bytes} bytes "
+        f"({stats.message_bytes} in messages, {stats.read_status_bytes} in read statuses)"
+        + ("" if args.vacuum else ", run with --vacuum to reclaim now")
+    )
+    if stats.failed_batches:
+        print(f"Failed batches (retried): {stats.failed_batches}")
+    print(f"{'table':32} {'before':>14} {'after':>14}")
+    for table_name, size in sizes_before.items():
+        print(f"{table_name:32} {size:>14} {sizes_after[table_name]:>14}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=SETTINGS.CHAT_MESSAGES_ARCHIVE_AFTER_DAYS,
+        help="Also archive messages older than this many days",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=SETTINGS.CHAT_MESSAGES_ARCHIVE_BATCH_SIZE,
+        help="Messages moved in one transaction",
+    )
+    parser.add_argument("--pause", type=float, default=0.0, help="Pause between batches, seconds")
+    parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches")
+    parser.add_argument("--max-errors", type=int, default=10, help="Give up after this many failed batches")
+    parser.add_argument("--lock-timeout", type=float, default=2.0, help="Lock timeout of every batch, seconds")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot tables at the end")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
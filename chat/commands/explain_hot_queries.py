@@ -0,0 +1,211 @@
+"""Check that the hot CRUD queries use index scans.
+
+The check seeds a synthetic dataset inside a transaction, runs the real
+`ChatCRUD`/`MessageCRUD` read methods, captures the SQL they emit and runs
+EXPLAIN on every statement. The transaction is rolled back at the end, so
+nothing is left in the database.
+
+Usage (from the `chat` directory):
+
+    python -m commands.explain_hot_queries --chats 1000 --messages 100 --members 5
+"""
+import argparse
+import asyncio
+import sys
+
+import orjson
+import sqlalchemy as sa
+from crud import ChatCRUD, MessageCRUD
+from crud.partitions import parse_month_partition_name
+from db.db import MyDatabase
+from enums import TotalModes
+from models.message import MESSAGES_DEFAULT_PARTITION_NAME
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+
+# таблицы, последовательное сканирование которых считается ошибкой
+HOT_TABLES: tuple = (
+    "messages",
+    "chat_participants",
+    "messages_participants",
+)
+
+SEED_USER_ID: int = 1_000_000_000
+
+
+def is_hot_table(relation_name: str) -> bool:
+    # секции messages сканируются под своими именами
+    return relation_name in HOT_TABLES \
+        or relation_name == MESSAGES_DEFAULT_PARTITION_NAME \
+        or parse_month_partition_name(relation_name) is not None
+
+
+seed_statements: tuple = (
+    sa.text(
+        """
+        CREATE TEMPORARY TABLE explain_chats ON COMMIT DROP AS
+        WITH new_chats AS (
+            INSERT INTO chats (name, is_private)
+            SELECT 'explain-' || g, false FROM generate_series(1, :chats) g
+            RETURNING id
+        )
+        SELECT id FROM new_chats
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO chat_participants (chat_id, participant_id, is_available)
+        SELECT c.id, :user_id + (c.id + k * 7919) % (:chats * 2), true
+        FROM explain_chats c, generate_series(1, :members - 1) k
+        UNION
+        SELECT c.id, :user_id, true FROM explain_chats c WHERE c.id % 10 = 0
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages (text, is_available, author_id, chat_id, dt_created)
+        SELECT 'message ' || g, g % 50 <> 0, :user_id, c.id, now() - g * interval '8 hours'
+        FROM explain_chats c, generate_series(1, :messages) g
+        """
+    ),
+    sa.text(
+        """
+        UPDATE chats c
+        SET last_message_id = m.id, last_message_at = m.dt_created
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, dt_created
+            FROM messages
+            WHERE is_available AND chat_id IN (SELECT id FROM explain_chats)
+            ORDER BY chat_id, dt_created DESC, id DESC
+        ) m
+        WHERE m.chat_id = c.id
+        """
+    ),
+    sa.text(
+        """
+        INSERT INTO messages_participants (message_id, participant_id, chat_id, is_read)
+        SELECT m.id, cp.participant_id, m.chat_id, m.id % 5 <> 0
+        FROM messages m
+        JOIN explain_chats c ON c.id = m.chat_id
+        JOIN chat_participants cp ON cp.chat_id = m.chat_id
+        """
+    ),
+    sa.text("ANALYZE chats, chat_participants, messages, messages_participants"),
+)
+
+
+def iter_plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from iter_plan_nodes(child)
+
+
+async def explain(conn: AsyncConnection, statement: str, parameters) -> list[dict]:
+    res = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+    plan = res.scalar_one()
+    if isinstance(plan, str):
+        plan = orjson.loads(plan)
+    return list(iter_plan_nodes(plan[0]["Plan"]))
+
+
+async def main(args: argparse.Namespace) -> int:
+    MyDatabase.init()
+    captured: list[tuple[str, object]] = []
+
+    def capture_statement(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    event.listen(MyDatabase.engine.sync_engine, "before_cursor_execute", capture_statement)
+
+    failed: bool = False
+    async with MyDatabase.engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            if args.seed:
+                seed_params = {
+                    "chats": args.chats,
+                    "messages": args.messages,
+                    "members": args.members,
+                    "user_id": SEED_USER_ID,
+                }
+                for stmt in seed_statements:
+                    await conn.execute(stmt, seed_params)
+            chat_id: int | None = (await conn.execute(
+                sa.text("SELECT max(chat_id) FROM chat_participants WHERE participant_id = :user_id"),
+                {"user_id": args.user_id or SEED_USER_ID},
+            )).scalar()
+            if chat_id is None:
+                print("Nothing to explain: the user has no chats, run with --seed")
+                return 1
+
+            user_id: int = args.user_id or SEED_USER_ID
+            db = AsyncSession(bind=conn)
+            first_page = await MessageCRUD.get_chat_messages_by_cursor(chat_id=chat_id, size=args.size, db=db)
+            deep_cursor = first_page.items[0] if first_page and first_page.items else None
+            queries: dict = {
+                "ChatCRUD.get_chats": ChatCRUD.get_chats(user_id, db),
+                "ChatCRUD.check_user_in_chat": ChatCRUD.check_user_in_chat(
+                    db=db, chat_id=chat_id, participant_id=user_id,
+                ),
+                "ChatCRUD.get_chat_by_id": ChatCRUD.get_chat_by_id(
+                    chat_id=chat_id, participant_id=user_id, db=db,
+                ),
+                "ChatCRUD.get_chat_participants": ChatCRUD.get_chat_participants(
+                    db=db, chat_id=chat_id, participant_id=user_id, size=args.size,
+                ),
+                # COUNT(*) всех сообщений чата - это всегда чтение всей истории, поэтому total из счетчика
+                "MessageCRUD.get_chat_messages": MessageCRUD.get_chat_messages(
+                    db=db, chat_id=chat_id, participant_id=user_id, page=1, size=args.size,
+                    with_total=TotalModes.APPROX,
+                ),
+                "MessageCRUD.get_chat_messages_by_cursor": MessageCRUD.get_chat_messages_by_cursor(
+                    chat_id=chat_id,
+                    size=args.size,
+                    db=db,
+                    before=(deep_cursor.dt_created, deep_cursor.id) if deep_cursor else None,
+                ),
+            }
+
+            for name, coro in queries.items():
+                captured.clear()
+                await coro
+                for statement, parameters in captured:
+                    nodes: list[dict] = await explain(conn, statement, parameters)
+                    scans = [
+                        node["Node Type"]
+                        + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+                        + (f" using {node['Index Name']}" if "Index Name" in node else "")
+                        + (f" (partitions removed: {node['Subplans Removed']})" if "Subplans Removed" in node else "")
+                        for node in nodes
+                        if "Relation Name" in node or "Index Name" in node or "Subplans Removed" in node
+                    ]
+                    seq_scans = [
+                        node["Relation Name"] for node in nodes
+                        if node["Node Type"] == "Seq Scan" and is_hot_table(node.get("Relation Name", ""))
+                    ]
+                    failed = failed or bool(seq_scans)
+                    print(f"{'FAIL' if seq_scans else 'OK':4} {name}")
+                    for scan in scans:
+                        print(f"       {scan}")
+        finally:
+            await trans.rollback()
+
+    await MyDatabase.finish()
+    return 1 if failed else 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-seed", dest="seed", action="store_false", help="Use existing data instead of seeding")
+    parser.add_argument("--user-id", type=int, default=None, help="Explain queries for this user (with --no-seed)")
+    parser.add_argument("--chats", type=int, default=1000, help="Number of seeded chats")
+    parser.add_argument("--messages", type=int, default=100, help="Number of seeded messages per chat")
+    parser.add_argument("--members", type=int, default=5, help="Number of seeded members per chat")
+    parser.add_argument("--size", type=int, default=15, help="Page size")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
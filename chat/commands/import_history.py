@@ -0,0 +1,183 @@
+"""Bulk import chats, participants, messages and read state from files.
+
+Meant for migrating history from another chat system: rows are loaded with
+COPY (asyncpg `copy_records_to_table`) straight into the existing tables,
+orders of magnitude faster than going through POST /chats and
+POST /messages. Every file is NDJSON (`.ndjson`/`.jsonl`, one object per
+line) or CSV with a header (`.csv`); fields are named after table columns:
+
+    chats            id, dt_created, dt_updated, name, admin_id, is_private
+    participants     chat_id, participant_id, is_available, last_read_message_id
+    messages         id, dt_created, dt_updated, text, is_available, author_id, chat_id
+    read statuses    message_id, participant_id, chat_id, is_read
+
+Ids are kept as they are. Dates are ISO 8601, UTC if no offset is given.
+Read state is either read statuses (ROWS mode) or `last_read_message_id`
+of participants (WATERMARK mode).
+
+Steps:
+1. the messages file is read once to find its months; missing monthly
+   partitions are created, each in its own short transaction;
+2. all files are copied in ONE transaction (chats first: foreign keys are
+   checked by COPY), with a progress line per table;
+3. set-based integrity checks run over the ranges of imported keys
+   (messages of unknown chats, duplicate message ids, read statuses of
+   unknown messages or non-participants, read marks of unknown messages);
+   any violation rolls the whole import back;
+4. last messages and message counters of chats and unread counters are
+   recomputed, id sequences are moved past the imported ids, and the
+   transaction is committed;
+5. the tables are analyzed.
+
+Running API processes show the imported chats to users with a cached chat
+list after CHAT_LIST_CACHE_TTL.
+
+Usage (from the `chat` directory):
+
+    python -m commands.import_history --chats chats.ndjson --participants participants.csv \\
+        --messages messages.ndjson [--read-statuses read_statuses.ndjson] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import asyncpg
+import sqlalchemy as sa
+from crud import MessagePartitionCRUD
+from crud.partitions import month_partition_name
+from db.db import MyDatabase
+from ingest import (
+    HistoryImporter,
+    ImportFormatError,
+    IntegrityViolation,
+    chat_participants_import,
+    chats_import,
+    get_message_months,
+    messages_import,
+    read_statuses_import,
+)
+from settings import SETTINGS
+
+
+# Не чаще раза в столько секунд печатается строка прогресса
+PROGRESS_INTERVAL: float = 1.0
+
+
+class ProgressPrinter:
+    def __init__(self):
+        self.printed_at: float = 0.0
+
+    def __call__(self, table_name: str, rows: int, elapsed: float):
+        now: float = time.monotonic()
+        if now - self.printed_at >= PROGRESS_INTERVAL:
+            self.printed_at = now
+            print(f"  {table_name}: {rows} rows, {rows / elapsed if elapsed else 0:.0f} rows/s", flush=True)
+
+
+async def create_message_partitions(months: set[date], lock_timeout: float) -> None:
+    async with MyDatabase.engine.connect() as conn:
+        partitions: dict[date, str] = await MessagePartitionCRUD.get_month_partitions(conn)
+    for month in sorted(months.difference(partitions)):
+        async with MyDatabase.engine.begin() as conn:
+            await conn.execute(sa.text(f"SET LOCAL lock_timeout = '{lock_timeout}s'"))
+            moved: int = await MessagePartitionCRUD.create_month_partition(conn, month)
+        print(
+            f"Created {month_partition_name(month)}"
+            + (f", moved {moved} rows from the default partition" if moved else "")
+        )
+
+
+async def main(args: argparse.Namespace) -> int:
+    files: list = [
+        (table, path)
+        for table, path in (
+            (chats_import, args.chats),
+            (chat_participants_import, args.participants),
+            (messages_import, args.messages),
+            (read_statuses_import, args.read_statuses),
+        )
+        if path is not None
+    ]
+    MyDatabase.init()
+    started_at: float = time.monotonic()
+
+    try:
+        if args.messages is not None:
+            months: set[date] = get_message_months(args.messages, args.batch_size)
+            print(f"Messages span {len(months)} months, checked in {time.monotonic() - started_at:.1f}s")
+            await create_message_partitions(months, args.lock_timeout)
+
+        async with MyDatabase.engine.connect() as conn:
+            trans = await conn.begin()
+            importer = HistoryImporter(conn, batch_size=args.batch_size, on_progress=ProgressPrinter())
+            await importer.lock()
+            for table, path in files:
+                table_started_at: float = time.monotonic()
+                rows: int = await importer.copy(table, path)
+                elapsed: float = time.monotonic() - table_started_at
+                print(f"{table.name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+            checks_started_at: float = time.monotonic()
+            violations: list[IntegrityViolation] = await importer.check_integrity()
+            print(f"Integrity checked in {time.monotonic() - checks_started_at:.1f}s")
+            if violations:
+                await trans.rollback()
+                for violation in violations:
+                    print(f"  {violation}")
+                print("Import rolled back")
+                return 1
+
+            chats, participants = await importer.rebuild_chat_state()
+            print(f"Recomputed last messages of {chats} chats and unread counters of {participants} participants")
+            if args.dry_run:
+                await trans.rollback()
+                print("Dry run, import rolled back")
+                return 0
+            sequences: dict[str, int] = await importer.fix_sequences()
+            for table_name, value in sequences.items():
+                print(f"Sequence of {table_name}.id set to {value}")
+            await trans.commit()
+
+        # статистика по новым строкам нужна планировщику сразу, не дожидаясь autovacuum
+        async with MyDatabase.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for table, _ in files:
+                await conn.execute(sa.text(f"ANALYZE {table.name}"))
+    except (ImportFormatError, asyncpg.PostgresError) as e:
+        # ошибки COPY (например, нарушение первичного или внешнего ключа) приходят напрямую от asyncpg
+        print(f"Import failed: {e}")
+        return 1
+    finally:
+        await MyDatabase.finish()
+
+    total_rows: int = sum(importer.rows.values())
+    elapsed = time.monotonic() - started_at
+    print(f"Imported {total_rows} rows in {elapsed:.1f}s ({total_rows / elapsed:.0f} rows/s)")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=Path, default=None, help="File of chats")
+    parser.add_argument("--participants", type=Path, default=None, help="File of chat participants")
+    parser.add_argument("--messages", type=Path, default=None, help="File of messages")
+    parser.add_argument("--read-statuses", type=Path, default=None, help="File of read statuses (ROWS mode)")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=SETTINGS.CHAT_IMPORT_BATCH_SIZE,
+        help="Rows sent in one COPY",
+    )
+    parser.add_argument("--lock-timeout", type=float, default=5.0, help="Lock timeout of partition DDL, seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Load and check everything, then roll back")
+    args = parser.parse_args()
+    if not any((args.chats, args.participants, args.messages, args.read_statuses)):
+        parser.error("nothing to import")
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
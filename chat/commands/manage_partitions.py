@@ -0,0 +1,92 @@
+"""Maintain monthly partitions of the messages table.
+
+Creates partitions for the current month and `--ahead` months after it, so
+new messages never land in the default partition. Messages that already
+landed there (the command did not run in time) are moved into partitions of
+their months. With `--retain-months`
+partitions older than that many months (counting the current one) are
+detached: they stay in the database as standalone tables with the same name,
+ready to be dumped or dropped, but their messages disappear from chats. Read
+statuses of those messages are moved to `<partition>_read_statuses` tables;
+message counters, last messages and unread counters of the affected chats are
+recomputed in the same transaction. Running API processes show the new last
+messages to users with a cached chat list after CHAT_LIST_CACHE_TTL.
+
+Run it regularly (e.g. daily from cron). Every partition is created or
+detached in its own short transaction under `--lock-timeout`, so the command
+never queues behind long queries for long.
+
+Usage (from the `chat` directory):
+
+    python -m commands.manage_partitions [--ahead 3] [--retain-months 24] [--dry-run]
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, timezone
+
+import sqlalchemy as sa
+from crud import MessagePartitionCRUD
+from crud.partitions import add_months, month_partition_name
+from db.db import MyDatabase
+from settings import SETTINGS
+
+
+async def main(args: argparse.Namespace) -> None:
+    MyDatabase.init()
+    current_month: date = datetime.now(timezone.utc).date().replace(day=1)
+
+    async with MyDatabase.engine.connect() as conn:
+        partitions: dict[date, str] = await MessagePartitionCRUD.get_month_partitions(conn)
+        default_months: list[date] = await MessagePartitionCRUD.get_default_partition_months(conn)
+
+    months: set[date] = {add_months(current_month, offset) for offset in range(args.ahead + 1)}
+    for month in sorted(months.union(default_months)):
+        if month in partitions:
+            continue
+        partitions[month] = month_partition_name(month)
+        if args.dry_run:
+            print(f"Would create {partitions[month]}")
+            continue
+        async with MyDatabase.engine.begin() as conn:
+            await conn.execute(sa.text(f"SET LOCAL lock_timeout = '{args.lock_timeout}s'"))
+            moved: int = await MessagePartitionCRUD.create_month_partition(conn, month)
+        print(f"Created {partitions[month]}" + (f", moved {moved} rows from the default partition" if moved else ""))
+
+    if args.retain_months is not None:
+        oldest_month: date = add_months(current_month, 1 - args.retain_months)
+        for month in sorted(month for month in partitions if month < oldest_month):
+            if args.dry_run:
+                print(f"Would detach {partitions[month]}")
+                continue
+            async with MyDatabase.engine.begin() as conn:
+                await conn.execute(sa.text(f"SET LOCAL lock_timeout = '{args.lock_timeout}s'"))
+                await MessagePartitionCRUD.detach_month_partition(conn, month)
+            print(f"Detached {partitions[month]}")
+
+    await MyDatabase.finish()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--ahead",
+        type=int,
+        default=SETTINGS.CHAT_MESSAGES_PARTITIONS_AHEAD,
+        help="Number of future monthly partitions to keep ready",
+    )
+    parser.add_argument(
+        "--retain-months",
+        type=int,
+        default=SETTINGS.CHAT_MESSAGES_PARTITIONS_RETAIN_MONTHS,
+        help="Detach partitions older than this many months (the current month included)",
+    )
+    parser.add_argument("--lock-timeout", type=float, default=5.0, help="Lock timeout of every DDL, seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Only print what would be done")
+    args = parser.parse_args()
+    if args.retain_months is not None and args.retain_months < 1:
+        parser.error("--retain-months must be at least 1")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
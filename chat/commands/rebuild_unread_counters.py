@@ -0,0 +1,32 @@
+"""Rebuild denormalized unread counters of chat participants.
+
+Counters in `chat_participants.unread_count` are recomputed from the read
+statuses in `messages_participants`; only diverged counters are updated.
+
+Usage (from the `chat` directory):
+
+    python -m commands.rebuild_unread_counters [--chat-id 42]
+"""
+import argparse
+import asyncio
+
+from crud import ChatCRUD
+from db.db import MyDatabase
+
+
+async def main(args: argparse.Namespace) -> None:
+    MyDatabase.init()
+    async with MyDatabase.async_session() as db:
+        repaired: int = await ChatCRUD.rebuild_unread_counters(db, chat_id=args.chat_id)
+    await MyDatabase.finish()
+    print(f"Repaired unread counters: {repaired}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-id", type=int, default=None, help="Rebuild counters of one chat only")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,8 +1,22 @@
+from .archive import MessageArchiveCRUD
 from .chats import ChatCRUD
+from .group_commit import (
+    GroupCommitWriter,
+    message_writer,
+    start_message_writer,
+    stop_message_writer,
+)
 from .messages import MessageCRUD
+from .partitions import MessagePartitionCRUD
 
 
 __all__ = (
     'ChatCRUD',
     'MessageCRUD',
+    'MessagePartitionCRUD',
+    'MessageArchiveCRUD',
+    'GroupCommitWriter',
+    'message_writer',
+    'start_message_writer',
+    'stop_message_writer',
 )
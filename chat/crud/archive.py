@@ -0,0 +1,193 @@
+from datetime import datetime
+
+import sqlalchemy as sa
+from enums import ReadStatusModes
+from models import (
+    Chat,
+    ChatParticipant,
+    Message,
+    MessageArchive,
+    MessagesToParticipants,
+    MessagesToParticipantsArchive,
+)
+from settings import SETTINGS
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql import func
+
+from .partitions import message_copy_columns, read_status_copy_columns
+
+
+# Таблицы, размер которых сообщает задача архивации
+ARCHIVED_TABLES: tuple = (
+    Message.__tablename__,
+    MessagesToParticipants.__tablename__,
+    MessageArchive.__tablename__,
+    MessagesToParticipantsArchive.__tablename__,
+)
+
+
+def row_bytes(cte: sa.CTE):
+    """Суммарный размер строк CTE, байты."""
+    return sa.select(func.coalesce(func.sum(func.pg_column_size(sa.literal_column(cte.name))), 0)) \
+        .select_from(cte) \
+        .scalar_subquery()
+
+
+def build_archive_messages_stmt(condition, batch_size: int) -> sa.Select:
+    """Построить запрос переноса пачки сообщений в архив.
+
+    Все шаги выполняются в CTE одного запроса:
+    - выбор до batch_size сообщений по condition с FOR UPDATE SKIP LOCKED: строки,
+      которые сейчас изменяются, пропускаются до следующего запуска, а не ждут блокировку;
+    - DELETE сообщений ... RETURNING и INSERT их в messages_archive;
+    - DELETE статусов прочтения этих сообщений ... RETURNING и INSERT в messages_participants_archive;
+    - UPDATE счетчиков сообщений чатов на количество перенесенных доступных сообщений;
+    - UPDATE счетчиков непрочитанных на количество перенесенных непрочитанных статусов (только в режиме ROWS).
+    Последнее сообщение чата (chats.last_message_id) не переносится.
+    Возвращает количество перенесенных сообщений, статусов, их объем в байтах
+    и id затронутых чатов (у их участников изменились счетчики непрочитанных).
+    """
+    messages = Message.__table__
+    read_statuses = MessagesToParticipants.__table__
+
+    batch = sa.select(messages.c.id, messages.c.dt_created) \
+        .where(sa.and_(
+            condition,
+            ~sa.exists().where(Chat.last_message_id == messages.c.id),
+        )) \
+        .order_by(messages.c.dt_created, messages.c.id) \
+        .limit(batch_size) \
+        .with_for_update(skip_locked=True) \
+        .cte("batch")
+
+    moved_messages = sa.delete(messages) \
+        .where(sa.and_(messages.c.id == batch.c.id, messages.c.dt_created == batch.c.dt_created)) \
+        .returning(*(messages.c[key] for key in message_copy_columns)) \
+        .cte("moved_messages")
+    archive_messages = sa.insert(MessageArchive.__table__) \
+        .from_select(message_copy_columns, sa.select(*(moved_messages.c[key] for key in message_copy_columns))) \
+        .cte("archive_messages")
+
+    moved_read_statuses = sa.delete(read_statuses) \
+        .where(read_statuses.c.message_id == moved_messages.c.id) \
+        .returning(*(read_statuses.c[key] for key in read_status_copy_columns)) \
+        .cte("moved_read_statuses")
+    archive_read_statuses = sa.insert(MessagesToParticipantsArchive.__table__) \
+        .from_select(
+            read_status_copy_columns,
+            sa.select(*(moved_read_statuses.c[key] for key in read_status_copy_columns)),
+        ) \
+        .cte("archive_read_statuses")
+
+    # доступные (старые) сообщения уходят из messages: уменьшаем счетчики сообщений их чатов,
+    # удаленные сообщения вычтены из счетчика еще при удалении
+    moved_available = sa.select(moved_messages.c.chat_id, func.count().label("message_count")) \
+        .where(moved_messages.c.is_available) \
+        .group_by(moved_messages.c.chat_id) \
+        .subquery("moved_available")
+    decrement_message_count = sa.update(Chat.__table__) \
+        .values(message_count=func.greatest(Chat.message_count - moved_available.c.message_count, 0)) \
+        .where(Chat.id == moved_available.c.chat_id) \
+        .cte("decrement_message_count")
+
+    select_stmt = sa.select(
+        sa.select(func.count()).select_from(moved_messages).scalar_subquery().label("messages"),
+        sa.select(func.count()).select_from(moved_read_statuses).scalar_subquery().label("read_statuses"),
+        row_bytes(moved_messages).label("message_bytes"),
+        row_bytes(moved_read_statuses).label("read_status_bytes"),
+        sa.select(func.array_agg(sa.distinct(moved_messages.c.chat_id))).scalar_subquery().label("chat_ids"),
+    ).add_cte(archive_messages, archive_read_statuses, decrement_message_count)
+
+    if SETTINGS.CHAT_READ_STATUS_MODE == ReadStatusModes.ROWS:
+        # счетчик непрочитанных равен количеству непрочитанных статусов участника,
+        # поэтому уменьшается на перенесенные непрочитанные статусы
+        is_unread = moved_read_statuses.c.is_read == False  # noqa
+        moved_unread = sa.select(
+            moved_read_statuses.c.chat_id,
+            moved_read_statuses.c.participant_id,
+            func.count().label("unread_count"),
+        ) \
+            .where(is_unread) \
+            .group_by(moved_read_statuses.c.chat_id, moved_read_statuses.c.participant_id) \
+            .subquery("moved_unread")
+        decrement_unread = sa.update(ChatParticipant.__table__) \
+            .values(unread_count=func.greatest(ChatParticipant.unread_count - moved_unread.c.unread_count, 0)) \
+            .where(sa.and_(
+                ChatParticipant.chat_id == moved_unread.c.chat_id,
+                ChatParticipant.participant_id == moved_unread.c.participant_id,
+            )) \
+            .cte("decrement_unread")
+        select_stmt = select_stmt.add_cte(decrement_unread)
+
+    return select_stmt
+
+
+class MessageArchiveCRUD:
+    """Перенос удаленных и старых сообщений в архивные таблицы.
+
+    Операции выполняются на соединении: каждая пачка - отдельная короткая транзакция,
+    которой управляет вызывающий код.
+    """
+
+    @classmethod
+    async def archive_deleted_messages(cls, conn: AsyncConnection, batch_size: int) -> dict:
+        """Перенести в архив пачку удаленных сообщений (самые старые первыми)."""
+        stmt = build_archive_messages_stmt(Message.is_available == False, batch_size)  # noqa
+        return dict((await conn.execute(stmt)).mappings().one())
+
+    @classmethod
+    async def archive_old_messages(
+            cls,
+            conn: AsyncConnection,
+            chat_id: int,
+            older_than: datetime,
+            batch_size: int,
+    ) -> dict:
+        """Перенести в архив пачку сообщений чата chat_id, созданных раньше older_than.
+
+        Сообщения выбираются по индексу (chat_id, dt_created, id), поэтому пачка
+        не перебирает уже очищенные, но еще не вакуумированные страницы таблицы.
+        """
+        stmt = build_archive_messages_stmt(
+            sa.and_(Message.chat_id == chat_id, Message.dt_created < older_than),
+            batch_size,
+        )
+        return dict((await conn.execute(stmt)).mappings().one())
+
+    @classmethod
+    async def get_chat_ids_with_old_messages(
+            cls,
+            conn: AsyncConnection,
+            older_than: datetime,
+            after_id: int,
+            limit: int,
+    ) -> list[int]:
+        """Id чатов, в которых есть сообщения старше older_than (кроме последнего), по возрастанию после after_id."""
+        has_old_messages = sa.exists().where(sa.and_(
+            Message.chat_id == Chat.id,
+            Message.dt_created < older_than,
+            Message.id.is_distinct_from(Chat.last_message_id),
+        ))
+        select_stmt = sa.select(Chat.id) \
+            .where(sa.and_(Chat.id > after_id, has_old_messages)) \
+            .order_by(Chat.id) \
+            .limit(limit)
+        return list((await conn.execute(select_stmt)).scalars())
+
+    @classmethod
+    async def get_table_sizes(cls, conn: AsyncConnection) -> dict[str, int]:
+        """Размер таблиц вместе с индексами и TOAST, байты (для секционированной - сумма секций)."""
+        select_stmt = sa.text(
+            """
+            SELECT t.name, coalesce(
+                (
+                    SELECT sum(pg_total_relation_size(i.inhrelid))
+                    FROM pg_inherits i
+                    WHERE i.inhparent = CAST(t.name AS regclass)
+                ),
+                pg_total_relation_size(CAST(t.name AS regclass))
+            )
+            FROM unnest(CAST(:tables AS text[])) AS t(name)
+            """
+        )
+        return dict((await conn.execute(select_stmt, {"tables": list(ARCHIVED_TABLES)})).all())
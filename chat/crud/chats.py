@@ -1,11 +1,18 @@
 import sqlalchemy as sa
+from cache import invalidate_chat_members, membership_cache
+from enums import ReadStatusModes
 from models import Chat, ChatParticipant, Message, MessagesToParticipants
+from pagination import encode_participant_cursor
 from schemas import ChatResponseItem, UpdateChatRequestSchema
-from schemas.chats.response import NEW_MESSAGE_COUNT, GetFullChatResponse
+from schemas.chats.response import LAST_MESSAGE, NEW_MESSAGE_COUNT
+from settings import SETTINGS
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql.expression import func
-from utils import row2dict
+
+from .messages import message_returning, message_returning_keys
+from .read_status import watermark_unread_count
 
 
 chat_returning_keys: tuple = (
@@ -26,27 +33,101 @@ chat_returning: tuple = (
     Chat.is_private,
 )
 
-full_chat_returning_keys: tuple = (
-    "chat",
-    "id",
-    "dt_created",
-    "dt_updated",
-    "admin_id",
-    "name",
-    "is_private",
-    "participants",
+CHAT_RETURNING_SIZE: int = len(chat_returning)
+
+chat_details_returning_keys: tuple = (
+    *chat_returning_keys,
+    "last_message_id",
+    "last_message_at",
 )
 
-full_chat_returning: tuple = (
-    Chat.id,
-    Chat.dt_created,
-    Chat.dt_updated,
-    Chat.admin_id,
-    Chat.name,
-    Chat.is_private,
-    Chat.participants,
+participant_returning_keys: tuple = (
+    "chat_id",
+    "participant_id",
+    "is_available",
 )
 
+participant_returning: tuple = (
+    ChatParticipant.chat_id,
+    ChatParticipant.participant_id,
+    ChatParticipant.is_available,
+)
+
+
+def build_rebuild_unread_counters_stmt(condition) -> sa.Update:
+    """Построить запрос пересчета счетчиков непрочитанных сообщений участников чатов по condition.
+
+    Счетчик равен количеству непрочитанных статусов участника в messages_participants,
+    обновляются только разошедшиеся счетчики.
+    """
+    actual_unread_count = (
+        sa.select(func.count(MessagesToParticipants.message_id))
+        .where(
+            sa.and_(
+                MessagesToParticipants.chat_id == ChatParticipant.chat_id,
+                MessagesToParticipants.participant_id == ChatParticipant.participant_id,
+                MessagesToParticipants.is_read == False,  # noqa
+            )
+        ).scalar_subquery()
+    )
+    return sa.update(ChatParticipant) \
+        .values(unread_count=actual_unread_count) \
+        .where(sa.and_(condition, ChatParticipant.unread_count != actual_unread_count))
+
+
+def build_get_chats_stmt(read_status_mode: ReadStatusModes) -> sa.Select:
+    """Построить запрос списка чатов пользователя с параметром participant_id.
+
+    Колонки: колонки чата, количество непрочитанных сообщений, колонки последнего сообщения.
+    """
+    if read_status_mode == ReadStatusModes.WATERMARK:
+        # количество непрочитанных сообщений вычисляется по отметке о прочтении
+        new_message_count = watermark_unread_count()
+    else:
+        # количество непрочитанных сообщений хранится в счетчике участника чата
+        new_message_count = ChatParticipant.unread_count
+
+    return (
+        sa.select(
+            *chat_returning,
+            new_message_count.label(NEW_MESSAGE_COUNT),
+            *message_returning,
+        )
+        .join(
+            ChatParticipant,
+            sa.and_(
+                ChatParticipant.chat_id == Chat.id,
+                ChatParticipant.participant_id == sa.bindparam("participant_id"),
+                ChatParticipant.is_available == True,  # noqa
+            ),
+        )
+        # последнее сообщение хранится в самом чате; условие по дате создания
+        # позволяет искать сообщение только в одной секции messages
+        .outerjoin(
+            Message,
+            sa.and_(
+                Message.id == Chat.last_message_id,
+                Message.dt_created == Chat.last_message_at,
+            ),
+        )
+        # сначала чаты с последней активностью
+        .order_by(Chat.last_message_at.desc().nulls_last(), Chat.dt_created.desc())
+    )
+
+
+# Запросы горячих путей строятся один раз при импорте, значения передаются параметрами
+# (см. INSERT_MESSAGES_STMTS в crud/messages.py)
+GET_CHATS_STMTS: dict[ReadStatusModes, sa.Select] = {mode: build_get_chats_stmt(mode) for mode in ReadStatusModes}
+
+select_chat_member_ids_stmt: sa.Select = sa.select(ChatParticipant.participant_id) \
+    .where(ChatParticipant.chat_id == sa.bindparam("chat_id"))
+
+check_user_in_chat_stmt: sa.Select = sa.select(ChatParticipant.participant_id) \
+    .where(sa.and_(
+        ChatParticipant.chat_id == sa.bindparam("chat_id"),
+        ChatParticipant.participant_id == sa.bindparam("participant_id"),
+    ))
+
 
 class ChatCRUD:
     @classmethod
@@ -54,87 +135,122 @@ class ChatCRUD:
             cls,
             participant_id: int,
             db: AsyncSession,
-    ) -> list[ChatResponseItem] | None:
-        # Подзапрос на получение id чатов, в которых состоит пользователь
-        chat_ids_subquery = (
-            sa.select(ChatParticipant.chat_id)
-            .where(
-                sa.and_(
-                    ChatParticipant.is_available == True,  # noqa
-                    ChatParticipant.participant_id == participant_id,
-                )
-            )
-        )
-
-        # Подзапрос на получение количества непрочитанных сообщений для чата
-        unread_msgs_subquery = (
-            sa.select(func.count(MessagesToParticipants.message_id))
-            .where(
-                sa.and_(
-                    MessagesToParticipants.participant_id == participant_id,
-                    MessagesToParticipants.is_read == False,  # noqa
-                    MessagesToParticipants.chat_id == Chat.id,
-                )
-            ).order_by(None).scalar_subquery()
-        )
-
-        # Подзапрос на получение последнего сообщения чата
-        last_chat_msg_id = (
-            sa.select(Message.id)
-            .filter(Message.chat_id == Chat.id)
-            .order_by(Message.dt_created.desc())
-            .order_by(Message.id.desc())
-            .limit(1)
-            .correlate(Chat)
-            .as_scalar()
-        )
-
-        # итоговый запрос
-        select_stmt = (
-            sa.select(
-                *chat_returning,
-                unread_msgs_subquery.label(NEW_MESSAGE_COUNT),
-                Message,
-            )
-            .filter(Chat.id.in_(chat_ids_subquery))
-            .outerjoin(Message, Message.id == last_chat_msg_id)
-            .order_by(Chat.dt_updated)
-        )
+    ) -> list[dict] | None:
+        """Список чатов пользователя в формате ChatResponseItem, готовый для orjson.
 
-        # добавляем в схему возврата кол-во непрочитанных сообщений для чата
+        Строки результата преобразуются в словари напрямую, без разбора pydantic-схемами:
+        значения уже имеют нужные типы (даты - datetime), а схемы используются только
+        для документации ответа.
+        """
+        select_stmt = GET_CHATS_STMTS[SETTINGS.CHAT_READ_STATUS_MODE]
         try:
-            res = (await db.execute(select_stmt)).all()
-            chats: list[ChatResponseItem] = []
-            for row in res:
-                chat_response_item: ChatResponseItem = ChatResponseItem.parse_obj(dict(zip(chat_returning_keys, row)))
-                # Осторожно порядок определен в запросе выше
-                chat_response_item.new_message_count = row[-2]
-                chat_response_item.last_message = row2dict(row[-1]) if row[-1] else None
-                chats.append(chat_response_item)
-            return chats
+            res = (await db.execute(select_stmt, {"participant_id": participant_id})).all()
         except OperationalError:
             return None
+        # Осторожно порядок определен в build_get_chats_stmt: колонки чата, счетчик, колонки последнего сообщения
+        chats: list[dict] = []
+        for row in res:
+            chat: dict = dict(zip(chat_returning_keys, row))
+            chat[NEW_MESSAGE_COUNT] = row[CHAT_RETURNING_SIZE]
+            # у чата без сообщений все колонки последнего сообщения - NULL
+            last_message: tuple = row[CHAT_RETURNING_SIZE + 1:]
+            chat[LAST_MESSAGE] = None if last_message[0] is None else dict(zip(message_returning_keys, last_message))
+            chats.append(chat)
+        return chats
 
     @classmethod
     async def get_chat_by_id(
             cls,
             chat_id: int,
+            participant_id: int,
             db: AsyncSession,
-    ) -> GetFullChatResponse | None:
-        select_chat_stmt = (
-            sa.select(Chat)
+            include_participants: bool = False,
+    ) -> tuple[dict, bool] | None:
+        """Чат в формате FullChatResponseItem и признак членства пользователя participant_id.
+
+        Членство (EXISTS) и количество участников вычисляются в том же запросе, что и чат,
+        поэтому участники не загружаются ради проверки доступа. Список участников
+        загружается только при include_participants.
+        Возвращает None, если чата нет.
+        """
+        is_member = sa.exists().where(sa.and_(
+            ChatParticipant.chat_id == Chat.id,
+            ChatParticipant.participant_id == participant_id,
+        ))
+        participant_count = sa.select(func.count()) \
+            .select_from(ChatParticipant) \
+            .where(ChatParticipant.chat_id == Chat.id) \
+            .scalar_subquery()
+        select_stmt = sa.select(Chat, participant_count.label("participant_count"), is_member.label("is_member")) \
             .where(Chat.id == chat_id)
-        )
+        if include_participants:
+            select_stmt = select_stmt.options(selectinload(Chat.participants))
 
         try:
-            res = (await db.execute(select_chat_stmt)).scalars()
-
-            if not res:
-                return None
-            res = dict(zip(full_chat_returning_keys, res))
-            return res
+            row = (await db.execute(select_stmt)).one_or_none()
         except OperationalError:
             return None
+        if row is None:
+            return None
+
+        chat, count, is_user_member = row
+        res: dict = {key: getattr(chat, key) for key in chat_details_returning_keys}
+        res["participant_count"] = count
+        if include_participants:
+            res["participants"] = [
+                {key: getattr(participant, key) for key in participant_returning_keys}
+                for participant in chat.participants
+            ]
+        return res, is_user_member
+
+    @classmethod
+    async def get_chat_participants(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+            participant_id: int,
+            size: int,
+            after: int | None = None,
+    ) -> dict | None:
+        """Страница участников чата в формате ChatParticipantsPage по возрастанию participant_id после after.
+
+        Членство пользователя participant_id проверяется в том же запросе: страница
+        присоединяется к результату EXISTS, который возвращается всегда одной строкой.
+        Возвращает None, если пользователь не участник чата.
+        """
+        membership = sa.select(
+            sa.exists().where(sa.and_(
+                ChatParticipant.chat_id == chat_id,
+                ChatParticipant.participant_id == participant_id,
+            )).label("is_member")
+        ).subquery("membership")
+
+        conditions: list = [ChatParticipant.chat_id == chat_id]
+        if after is not None:
+            conditions.append(ChatParticipant.participant_id > after)
+        # берем на одну строку больше, чтобы понять, есть ли следующая страница
+        page = sa.select(*participant_returning) \
+            .where(sa.and_(*conditions)) \
+            .order_by(ChatParticipant.participant_id) \
+            .limit(size + 1) \
+            .subquery("page")
+
+        select_stmt = sa.select(membership.c.is_member, *(page.c[key] for key in participant_returning_keys)) \
+            .select_from(membership.outerjoin(page, membership.c.is_member)) \
+            .order_by(page.c.participant_id)
+        rows = (await db.execute(select_stmt)).all()
+        if not rows[0].is_member:
+            return None
+
+        # без участников после курсора LEFT JOIN дает одну строку с NULL
+        items: list[dict] = [
+            dict(zip(participant_returning_keys, row[1:])) for row in rows if row.participant_id is not None
+        ]
+        next_cursor: str | None = None
+        if len(items) > size:
+            items = items[:size]
+            next_cursor = encode_participant_cursor(items[-1]["participant_id"])
+        return {"items": items, "size": size, "next_cursor": next_cursor}
 
     @classmethod
     async def create_chat(
@@ -158,6 +274,7 @@ class ChatCRUD:
                     chat_participants.append(ChatParticipant(chat_id=new_chat_id, participant_id=participant_id))
                 db.add_all(chat_participants)
                 await db.commit()
+                invalidate_chat_members(new_chat_id)
                 return ChatResponseItem.parse_obj(dict(zip(chat_returning_keys, res)))
             else:
                 return None
@@ -211,25 +328,93 @@ class ChatCRUD:
     ) -> int:
         stmt = sa.update(ChatParticipant) \
             .values(is_available=new_status) \
-            .where(sa.and_(chat_id == chat_id, participant_id == participant_id))
+            .where(
+                sa.and_(
+                    ChatParticipant.chat_id == chat_id,
+                    ChatParticipant.participant_id == participant_id,
+                )
+            )
         res = (await db.execute(stmt)).rowcount  # noqa
         await db.commit()
+        invalidate_chat_members(chat_id)
         return res
 
     @classmethod
-    async def check_user_in_chat(
+    async def rebuild_unread_counters(
+            cls,
+            db: AsyncSession,
+            chat_id: int | None = None,
+    ) -> int:
+        """Пересчитать счетчики непрочитанных сообщений по таблице messages_participants.
+
+        Обновляются только разошедшиеся счетчики. Возвращает количество исправленных строк.
+        """
+        condition = ChatParticipant.chat_id == chat_id if chat_id is not None else sa.true()
+        res = (await db.execute(build_rebuild_unread_counters_stmt(condition))).rowcount  # noqa
+        await db.commit()
+        return res
+
+    @classmethod
+    async def get_user_chat_ids(
             cls,
             db: AsyncSession,
-            chat_id: int,
             participant_id: int,
-    ) -> bool:
-        """Проверить, что пользователь (participant_id) является членом чата chat_id."""
-        check_user_stmt = sa.select(ChatParticipant.participant_id).where(
+    ) -> list[int]:
+        """Получить id чатов, в которых состоит пользователь participant_id."""
+        select_stmt = sa.select(ChatParticipant.chat_id).where(
+            sa.and_(
+                ChatParticipant.participant_id == participant_id,
+                ChatParticipant.is_available == True,  # noqa
+            )
+        )
+        return list((await db.execute(select_stmt)).scalars())
+
+    @classmethod
+    async def get_user_chat_ids_among(
+            cls,
+            db: AsyncSession,
+            participant_id: int,
+            chat_ids: list[int],
+    ) -> set[int]:
+        """Выбрать из chat_ids чаты, в которых состоит пользователь participant_id (одним запросом)."""
+        select_stmt = sa.select(ChatParticipant.chat_id).where(
             sa.and_(
-                ChatParticipant.chat_id == chat_id,
                 ChatParticipant.participant_id == participant_id,
+                ChatParticipant.chat_id.in_(chat_ids),
             )
         )
+        return set((await db.execute(select_stmt)).scalars())
+
+    @classmethod
+    async def get_chat_member_ids(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+    ) -> frozenset[int]:
+        """Получить id всех участников чата chat_id."""
+        return frozenset((await db.execute(select_chat_member_ids_stmt, {"chat_id": chat_id})).scalars())
+
+    @classmethod
+    async def check_user_in_chat(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+            participant_id: int,
+    ) -> bool:
+        """Проверить, что пользователь (participant_id) является членом чата chat_id.
+
+        Состав чата берется из кеша процесса (см. `cache.membership_cache`).
+        """
+        if not SETTINGS.CHAT_MEMBERSHIP_CACHE_ENABLED:
+            res = (await db.execute(
+                check_user_in_chat_stmt,
+                {"chat_id": chat_id, "participant_id": participant_id},
+            )).fetchone()
+            return bool(res)
 
-        res = (await db.execute(check_user_stmt)).fetchone()
-        return bool(res)
+        members: frozenset[int] | None = membership_cache.get(chat_id)
+        if members is None:
+            generation: int = membership_cache.generation
+            members = await cls.get_chat_member_ids(db, chat_id)
+            membership_cache.set(chat_id, members, generation)
+        return participant_id in members
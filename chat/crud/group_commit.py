@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from db.db import MyDatabase
+from log import get_logger
+from schemas import MessageResponseItem
+from settings import SETTINGS
+from sqlalchemy.exc import DBAPIError
+
+from .messages import insert_messages, message_returning_keys
+
+
+logger = get_logger(__name__)
+
+# Признак остановки в очереди записи
+STOP = object()
+
+
+class GroupCommitWriter:
+    """Групповая запись новых сообщений.
+
+    Сообщения копятся в очереди и записываются пачкой одним запросом
+    build_insert_messages_stmt в одной транзакции: раз в interval_ms миллисекунд
+    или как только набралось max_batch сообщений. Так один fsync WAL приходится
+    на всю пачку, а не на каждое сообщение. Каждый отправитель ждет future,
+    который получает созданное сообщение или ошибку.
+    """
+
+    def __init__(self, interval_ms: float, max_batch: int):
+        self.interval: float = interval_ms / 1000
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.flushes: int = 0
+        self.flushed_messages: int = 0
+        self._task: asyncio.Task | None = None
+        # принимает ли писатель сообщения в очередь; сбрасывается в начале остановки
+        self._accepting: bool = False
+
+    @property
+    def is_running(self) -> bool:
+        return self._accepting and self._task is not None and not self._task.done()
+
+    async def start(self):
+        if not self.is_running:
+            # очередь привязывается к циклу событий, в котором запущен писатель
+            self.queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+            self._accepting = True
+
+    async def stop(self):
+        """Остановить запись, дописав уже принятые сообщения.
+
+        С начала остановки новые сообщения в очередь не принимаются: add_message
+        записывает их сразу, каждое в своей транзакции.
+        """
+        self._accepting = False
+        if self._task is None:
+            return
+        if not self._task.done():
+            self.queue.put_nowait(STOP)
+            await self._task
+        self._task = None
+        # сообщения, оставшиеся в очереди, если задача записи завершилась раньше STOP
+        while not self.queue.empty():
+            batch: list[tuple[dict, asyncio.Future]] = []
+            while not self.queue.empty() and len(batch) < self.max_batch:
+                batch.append(self.queue.get_nowait())
+            await self._flush(batch)
+
+    async def add_message(self, author_id: int, chat_id: int, text: str) -> MessageResponseItem:
+        """Поставить сообщение в очередь и дождаться его записи.
+
+        Если писатель остановлен или останавливается, сообщение записывается сразу:
+        иначе оно попало бы в очередь, которую уже никто не разбирает.
+        """
+        values: dict = {"text": text, "author_id": author_id, "chat_id": chat_id}
+        if not self.is_running:
+            message, = await self._insert([values])
+            return message
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((values, future))
+        return await future
+
+    async def _run(self):
+        stopping: bool = False
+        while not stopping:
+            item = await self.queue.get()
+            if item is STOP:
+                break
+            batch: list[tuple[dict, asyncio.Future]] = [item]
+            # ждем остальные сообщения пачки не дольше interval с момента прихода первого
+            deadline: float = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                if self.queue.empty():
+                    timeout: float = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.queue.get_nowait()
+                if item is STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            messages: list[MessageResponseItem] = await self._insert([values for values, _ in batch])
+        except DBAPIError as e:
+            if len(batch) > 1:
+                # одно ошибочное сообщение (например, несуществующий чат) не должно
+                # ронять всю пачку: записываем сообщения по одному
+                logger.error(f"Failed to write batch of {len(batch)} messages, retry one by one: {e.orig}")
+                for item in batch:
+                    await self._flush([item])
+                return
+            self._set_exception(batch, e)
+            return
+        except Exception as e:  # noqa
+            logger.error(f"Failed to write batch of {len(batch)} messages: {e}")
+            self._set_exception(batch, e)
+            return
+
+        self.flushes += 1
+        self.flushed_messages += len(batch)
+        # id выдаются в порядке сообщений пачки, поэтому порядок ответа совпадает с порядком пачки
+        for (_, future), message in zip(batch, messages):
+            if not future.done():
+                future.set_result(message)
+
+    async def _insert(self, values: list[dict]) -> list[MessageResponseItem]:
+        MyDatabase.init()
+        async with MyDatabase.async_session() as db:
+            res = await insert_messages(db, values)
+            await db.commit()
+        return [MessageResponseItem.parse_obj(dict(zip(message_returning_keys, row))) for row in res]
+
+    @staticmethod
+    def _set_exception(batch: list[tuple[dict, asyncio.Future]], error: Exception):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+
+message_writer = GroupCommitWriter(
+    interval_ms=SETTINGS.CHAT_GROUP_COMMIT_INTERVAL_MS,
+    max_batch=SETTINGS.CHAT_GROUP_COMMIT_MAX_BATCH,
+)
+
+
+async def start_message_writer():
+    if SETTINGS.CHAT_GROUP_COMMIT_ENABLED:
+        await message_writer.start()
+
+
+async def stop_message_writer():
+    await message_writer.stop()
@@ -1,12 +1,27 @@
+import math
+from datetime import datetime
+from typing import AsyncIterator, Literal
+
 import sqlalchemy as sa
-from fastapi_pagination.ext.sqlalchemy import paginate
-from models import ChatParticipant, Message, MessagesToParticipants
-from schemas import CreateMessageRequestSchema, MessageResponseItem
-from sqlalchemy.dialects.postgresql import insert
+from enums import ReadStatusModes, TotalModes
+from models import Chat, ChatParticipant, Message, MessageArchive, MessagesToParticipants
+from models.message import MESSAGES_SEARCH_CONFIG
+from pagination import encode_message_cursor, encode_search_cursor
+from schemas import (
+    CreateMessageRequestSchema,
+    MessageCursorPage,
+    MessageResponseItem,
+    MessageSearchPage,
+    MessageSearchResultItem,
+)
+from settings import SETTINGS
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import OperationalError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 from sqlalchemy.sql import func
 
+from .read_status import advanced_watermark, read_message_id, watermark_unread_count
+
 
 message_returning_keys: tuple = (
     "id",
@@ -28,6 +43,214 @@ message_returning: tuple = (
     Message.dt_updated,
 )
 
+# Подсветка найденных слов в ts_headline
+SEARCH_HEADLINE_OPTIONS: str = "StartSel=<b>, StopSel=</b>, MaxWords=35, MinWords=15"
+
+
+def build_insert_messages_stmt(read_status_mode: ReadStatusModes) -> sa.Select:
+    """Построить запрос на добавление сообщений, который выполняется за один round trip.
+
+    Все шаги выполняются в CTE одного запроса и обрабатывают новые сообщения множеством,
+    поэтому время не зависит от количества участников чата:
+    - INSERT сообщений ... RETURNING;
+    - INSERT статусов прочтения для всех участников чата (только в режиме ROWS);
+    - UPDATE счетчиков непрочитанных сообщений (только в режиме ROWS);
+    - UPDATE последнего сообщения и счетчика сообщений чата.
+    Сообщения передаются массивами параметров texts, author_ids и chat_ids (см. insert_messages_params),
+    поэтому один и тот же запрос (и один подготовленный запрос asyncpg) годится для пачки любого размера.
+    Возвращает новые сообщения (колонки message_returning) в порядке id.
+    CTE строятся по Core-таблицам: ORM-запросы в CTE теряют соседние CTE.
+    """
+    new_rows = func.unnest(
+        sa.bindparam("texts", type_=ARRAY(sa.Text)),
+        sa.bindparam("author_ids", type_=ARRAY(sa.Integer)),
+        sa.bindparam("chat_ids", type_=ARRAY(sa.Integer)),
+    ) \
+        .table_valued("text", "author_id", "chat_id", with_ordinality="n") \
+        .render_derived("new_rows")
+    # python-default колонок не применяется к INSERT внутри CTE.
+    # id выдаются в порядке строк SELECT, то есть в порядке элементов массивов
+    new_messages = sa.insert(Message.__table__) \
+        .from_select(
+            ["text", "author_id", "chat_id", "is_available"],
+            sa.select(new_rows.c.text, new_rows.c.author_id, new_rows.c.chat_id, sa.true()).order_by(new_rows.c.n),
+        ) \
+        .returning(*message_returning) \
+        .cte("new_messages")
+
+    # последнее из новых сообщений каждого чата и количество новых сообщений чата
+    latest_messages = sa.select(
+        new_messages.c.chat_id,
+        new_messages.c.id,
+        new_messages.c.dt_created,
+        func.count().over(partition_by=new_messages.c.chat_id).label("message_count"),
+    ) \
+        .distinct(new_messages.c.chat_id) \
+        .order_by(new_messages.c.chat_id, new_messages.c.dt_created.desc(), new_messages.c.id.desc()) \
+        .subquery("latest_messages")
+
+    # запоминаем последнее сообщение чата (если параллельно не добавлено более новое)
+    # и увеличиваем счетчик сообщений; строка чата изменяется одним UPDATE
+    is_newer = sa.or_(
+        Chat.last_message_at.is_(None),
+        sa.tuple_(Chat.last_message_at, Chat.last_message_id)
+        < sa.tuple_(latest_messages.c.dt_created, latest_messages.c.id),
+    )
+    update_chats = sa.update(Chat.__table__) \
+        .values(
+            last_message_id=sa.case((is_newer, latest_messages.c.id), else_=Chat.last_message_id),
+            last_message_at=sa.case((is_newer, latest_messages.c.dt_created), else_=Chat.last_message_at),
+            message_count=Chat.message_count + latest_messages.c.message_count,
+        ) \
+        .where(Chat.id == latest_messages.c.chat_id) \
+        .cte("update_chats")
+
+    select_stmt = sa.select(*(new_messages.c[key] for key in message_returning_keys)) \
+        .add_cte(update_chats) \
+        .order_by(new_messages.c.id)
+
+    # В режиме WATERMARK статус прочтения вычисляется по отметке участника чата
+    # (last_read_message_id), поэтому запись в таблицы статусов не нужна
+    if read_status_mode == ReadStatusModes.ROWS:
+        # каждому члену чата создаем запись о статусе прочтения,
+        # свое сообщение считается сразу же прочитанным
+        insert_read_statuses = sa.insert(MessagesToParticipants.__table__) \
+            .from_select(
+                ["message_id", "participant_id", "is_read", "chat_id"],
+                sa.select(
+                    new_messages.c.id,
+                    ChatParticipant.participant_id,
+                    ChatParticipant.participant_id == new_messages.c.author_id,
+                    ChatParticipant.chat_id,
+                ).join_from(ChatParticipant, new_messages, ChatParticipant.chat_id == new_messages.c.chat_id),
+            ) \
+            .cte("insert_read_statuses")
+
+        # увеличиваем счетчики непрочитанных сообщений на количество чужих новых сообщений
+        new_unread_count = sa.select(func.count(new_messages.c.id)) \
+            .where(sa.and_(
+                new_messages.c.chat_id == ChatParticipant.chat_id,
+                new_messages.c.author_id != ChatParticipant.participant_id,
+            )) \
+            .scalar_subquery()
+        increment_unread = sa.update(ChatParticipant.__table__) \
+            .values(unread_count=ChatParticipant.unread_count + new_unread_count) \
+            .where(ChatParticipant.chat_id.in_(sa.select(new_messages.c.chat_id))) \
+            .cte("increment_unread")
+
+        select_stmt = select_stmt.add_cte(insert_read_statuses, increment_unread)
+
+    return select_stmt
+
+
+def insert_messages_params(values: list[dict]) -> dict:
+    """Параметры запроса build_insert_messages_stmt для сообщений values (text, author_id, chat_id)."""
+    return {
+        "texts": [row["text"] for row in values],
+        "author_ids": [row["author_id"] for row in values],
+        "chat_ids": [row["chat_id"] for row in values],
+    }
+
+
+# Запросы горячих путей строятся один раз при импорте: при выполнении SQLAlchemy
+# не собирает их заново и берет готовый SQL из кеша компиляции, а asyncpg - подготовленный
+# запрос из кеша соединения. Значения передаются параметрами (sa.bindparam).
+# Режим хранения статусов прочтения выбирается при выполнении, поэтому запрос строится для каждого режима.
+INSERT_MESSAGES_STMTS: dict[ReadStatusModes, sa.Select] = {
+    mode: build_insert_messages_stmt(mode) for mode in ReadStatusModes
+}
+
+
+async def insert_messages(db: AsyncSession | AsyncConnection, values: list[dict]) -> list[sa.Row]:
+    """Добавить сообщения values одним запросом. Возвращает строки message_returning в порядке values."""
+    insert_stmt = INSERT_MESSAGES_STMTS[SETTINGS.CHAT_READ_STATUS_MODE]
+    return (await db.execute(insert_stmt, insert_messages_params(values))).all()
+
+
+def build_chat_messages_page_stmt(with_total: TotalModes) -> sa.Select:
+    """Построить запрос страницы сообщений чата для MessageCRUD.get_chat_messages.
+
+    Параметры: chat_id, participant_id, limit и offset.
+    Колонки: is_member, total (кроме TotalModes.FALSE), колонки message_returning.
+    """
+    chat_id = sa.bindparam("chat_id", type_=sa.Integer)
+    membership = sa.select(
+        sa.exists().where(sa.and_(
+            ChatParticipant.chat_id == chat_id,
+            ChatParticipant.participant_id == sa.bindparam("participant_id"),
+        )).label("is_member")
+    ).subquery("membership")
+
+    conditions: tuple = (
+        Message.chat_id == chat_id,
+        Message.is_available == True,  # noqa
+    )
+    page_messages = sa.select(*message_returning) \
+        .where(*conditions) \
+        .order_by(Message.dt_created, Message.id) \
+        .limit(sa.bindparam("limit", type_=sa.Integer)) \
+        .offset(sa.bindparam("offset", type_=sa.Integer)) \
+        .subquery("page_messages")
+    # условие членства над подзапросом с LIMIT, а не внутри него: фильтр по каждой секции
+    # мешает планировщику читать секции по индексу в порядке сортировки
+    page_messages = sa.select(page_messages).where(membership.c.is_member).lateral("member_page_messages")
+
+    columns: list = [membership.c.is_member]
+    from_clause = membership
+    if with_total != TotalModes.FALSE:
+        if with_total == TotalModes.APPROX:
+            total = sa.select(Chat.message_count.label("total")).where(Chat.id == chat_id)
+        else:
+            total = sa.select(func.count().label("total")).where(*conditions)
+        total = total.where(membership.c.is_member).lateral("total")
+        columns.append(total.c.total)
+        from_clause = from_clause.outerjoin(total, sa.true())
+    columns.extend(page_messages.c[key] for key in message_returning_keys)
+    return sa.select(*columns) \
+        .select_from(from_clause.outerjoin(page_messages, sa.true())) \
+        .order_by(page_messages.c.dt_created, page_messages.c.id)
+
+
+CHAT_MESSAGES_PAGE_STMTS: dict[TotalModes, sa.Select] = {
+    mode: build_chat_messages_page_stmt(mode) for mode in TotalModes
+}
+
+
+def build_messages_cursor_page_stmt(
+        model: type[Message] | type[MessageArchive],
+        direction: str | None,
+) -> sa.Select:
+    """Построить запрос страницы сообщений по курсору для MessageCRUD._get_messages_page.
+
+    direction - "after" (сообщения новее курсора, по возрастанию), "before" (старше курсора,
+    по убыванию) или None (самые новые, по убыванию).
+    Параметры: chat_id, limit и для курсора cursor_dt_created, cursor_id.
+    """
+    cursor_dt_created = sa.bindparam("cursor_dt_created", type_=model.dt_created.type)
+    cursor_key = sa.tuple_(cursor_dt_created, sa.bindparam("cursor_id", type_=sa.Integer))
+    sort_key = sa.tuple_(model.dt_created, model.id)
+    select_stmt = sa.select(*(getattr(model, key) for key in message_returning_keys)) \
+        .where(sa.and_(
+            model.chat_id == sa.bindparam("chat_id"),
+            model.is_available == True,  # noqa
+        )) \
+        .limit(sa.bindparam("limit", type_=sa.Integer))
+
+    if direction == "after":
+        return select_stmt \
+            .where(sa.and_(sort_key > cursor_key, model.dt_created >= cursor_dt_created)) \
+            .order_by(model.dt_created, model.id)
+    if direction == "before":
+        select_stmt = select_stmt.where(sa.and_(sort_key < cursor_key, model.dt_created <= cursor_dt_created))
+    return select_stmt.order_by(model.dt_created.desc(), model.id.desc())
+
+
+MESSAGES_CURSOR_PAGE_STMTS: dict[tuple, sa.Select] = {
+    (model, direction): build_messages_cursor_page_stmt(model, direction)
+    for model in (Message, MessageArchive)
+    for direction in (None, "before", "after")
+}
+
 
 class MessageCRUD:
     @classmethod
@@ -38,67 +261,277 @@ class MessageCRUD:
             chat_id: int,
             message: CreateMessageRequestSchema,
     ) -> MessageResponseItem | None:
-        """Добавить сообщение чата в таблицу."""
-        insert_stmt = insert(Message) \
-            .values(text=message.text,
-                    author_id=author_id,
-                    chat_id=chat_id) \
-            .returning(*message_returning)
+        """Добавить сообщение чата в таблицу.
 
+        Сообщение, статусы прочтения, счетчики непрочитанных и последнее сообщение чата
+        записываются одним запросом.
+        """
         try:
-            res = (await db.execute(insert_stmt)).one()
-            if res is not None:
-                new_msg: MessageResponseItem = MessageResponseItem.parse_obj(dict(zip(message_returning_keys, res)))
-                # Сообщение добавлено в чат - надо завести записи о статусе (прочитано или нет)
-                # каждым пользователем в чате
-
-                # вытаскиваем всех членов чата
-                select_participant_ids = sa.select(ChatParticipant.participant_id) \
-                    .where(ChatParticipant.chat_id == chat_id)
-                participant_ids = (await db.execute(select_participant_ids)).scalars()
-
-                # каждому члену создаем запись - сообщение не прочитано
-                message_participants: list[MessagesToParticipants] = []
-                for participant_id in participant_ids:
-                    message_participants.append(
-                        MessagesToParticipants(
-                            message_id=new_msg.id,
-                            participant_id=participant_id,
-                            is_read=bool(participant_id == author_id),  # свое сообщение считается сразу же прочитанным
-                            chat_id=chat_id,
-                        )
-                    )
-                db.add_all(message_participants)
-
-                # завершаем транзакцию
-                await db.commit()
-                return new_msg
-            else:
+            res, = await insert_messages(db, [{"text": message.text, "author_id": author_id, "chat_id": chat_id}])
+            # завершаем транзакцию
+            await db.commit()
+            return MessageResponseItem.parse_obj(dict(zip(message_returning_keys, res)))
+        except OperationalError:
+            return None
+
+    @classmethod
+    async def add_messages(
+            cls,
+            db: AsyncSession,
+            author_id: int,
+            messages: list[CreateMessageRequestSchema],
+    ) -> list[MessageResponseItem] | None:
+        """Добавить несколько сообщений (возможно, в разные чаты) в одной транзакции.
+
+        Все сообщения вставляются одним запросом build_insert_messages_stmt.
+        Возвращает созданные сообщения в порядке messages.
+        """
+        values: list[dict] = [
+            {"text": message.text, "author_id": author_id, "chat_id": message.chat_id}
+            for message in messages
+        ]
+
+        try:
+            # id выдаются в порядке сообщений, поэтому порядок по id совпадает с порядком messages
+            res = await insert_messages(db, values)
+            await db.commit()
+            return [MessageResponseItem.parse_obj(dict(zip(message_returning_keys, row))) for row in res]
+        except OperationalError:
+            return None
+
+    @classmethod
+    async def get_message_by_id(
+            cls,
+            db: AsyncSession,
+            message_id: int,
+    ) -> MessageResponseItem | None:
+        select_stmt = sa.select(*message_returning).where(Message.id == message_id)
+
+        try:
+            res = (await db.execute(select_stmt)).one_or_none()
+            if res is None:
                 return None
+            return MessageResponseItem.parse_obj(dict(zip(message_returning_keys, res)))
         except OperationalError:
             return None
 
     @classmethod
     async def get_chat_messages(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+            participant_id: int,
+            page: int,
+            size: int,
+            with_total: TotalModes = TotalModes.EXACT,
+    ) -> dict | Literal[False] | None:
+        """Страница сообщений чата с id = chat_id в формате Page (items, total, page, size, pages).
+
+        Членство пользователя participant_id, общее количество сообщений и сама страница
+        получаются одним запросом: подзапросы количества и страницы - LATERAL
+        и выполняются только при is_member (One-Time Filter), поэтому для постороннего
+        пользователя сообщения чата не читаются.
+        Общее количество зависит от with_total: EXACT - COUNT(*) по сообщениям чата,
+        APPROX - счетчик chats.message_count (одна строка по первичному ключу),
+        FALSE - не считается, total и pages равны None.
+        Возвращает False, если пользователь не участник чата, и None, если запрос не выполнился.
+        """
+        select_stmt = CHAT_MESSAGES_PAGE_STMTS[with_total]
+        try:
+            rows = (await db.execute(select_stmt, {
+                "chat_id": chat_id,
+                "participant_id": participant_id,
+                "limit": size,
+                "offset": size * (page - 1),
+            })).all()
+        except OperationalError:
+            return None
+        if not rows[0].is_member:
+            return False
+
+        first_column: int = len(select_stmt.selected_columns) - len(message_returning_keys)
+        # за последней страницей LEFT JOIN дает одну строку с NULL
+        items: list[dict] = [
+            dict(zip(message_returning_keys, row[first_column:])) for row in rows if row.id is not None
+        ]
+        total_count: int | None = rows[0].total if with_total != TotalModes.FALSE else None
+        return {
+            "items": items,
+            "total": total_count,
+            "page": page,
+            "size": size,
+            "pages": math.ceil(total_count / size) if total_count is not None else None,
+        }
+
+    @classmethod
+    async def get_chat_messages_by_cursor(
             cls,
             chat_id: int,
+            size: int,
             db: AsyncSession,
-    ):
-        """Получить сообщения чата с id = chat_id.
+            before: tuple[datetime, int] | None = None,
+            after: tuple[datetime, int] | None = None,
+    ) -> MessageCursorPage | None:
+        """Получить страницу сообщений чата с id = chat_id по курсору.
 
-        Есть пагинация на уровне db.
+        Keyset-пагинация по (dt_created, id): в отличие от LIMIT/OFFSET база не перебирает
+        пропущенные строки, поэтому время ответа не зависит от глубины страницы.
+        Без курсоров возвращаются самые новые сообщения чата.
+        Сообщения на странице всегда упорядочены от старых к новым.
+        Граница курсора дублируется условием на dt_created: по сравнению кортежей
+        база не может отбросить секции messages, а по нему - может.
         """
-        select_stmt = sa.select(Message) \
-            .where(sa.and_(
-                Message.chat_id == chat_id,
-                Message.is_available == True,  # noqa
-            )) \
-            .order_by(Message.dt_created)
+        return await cls._get_messages_page(Message, chat_id, size, db, before, after)
+
+    @classmethod
+    async def get_archived_chat_messages_by_cursor(
+            cls,
+            chat_id: int,
+            size: int,
+            db: AsyncSession,
+            before: tuple[datetime, int] | None = None,
+            after: tuple[datetime, int] | None = None,
+    ) -> MessageCursorPage | None:
+        """Получить страницу архивных сообщений чата с id = chat_id по курсору.
+
+        Курсоры и порядок сообщений - как в get_chat_messages_by_cursor.
+        Удаленные сообщения хранятся в архиве, но не возвращаются.
+        """
+        return await cls._get_messages_page(MessageArchive, chat_id, size, db, before, after)
+
+    @classmethod
+    async def _get_messages_page(
+            cls,
+            model: type[Message] | type[MessageArchive],
+            chat_id: int,
+            size: int,
+            db: AsyncSession,
+            before: tuple[datetime, int] | None,
+            after: tuple[datetime, int] | None,
+    ) -> MessageCursorPage | None:
+        cursor: tuple[datetime, int] | None = after if after is not None else before
+        direction: str | None = "after" if after is not None else "before" if before is not None else None
+        select_stmt = MESSAGES_CURSOR_PAGE_STMTS[(model, direction)]
+        params: dict = {"chat_id": chat_id, "limit": size + 1}
+        if cursor is not None:
+            params.update(cursor_dt_created=cursor[0], cursor_id=cursor[1])
 
         try:
-            return await paginate(db, select_stmt)
+            rows = (await db.execute(select_stmt, params)).all()
         except OperationalError:
-            return []
+            return None
+
+        has_more: bool = len(rows) > size
+        rows = rows[:size]
+        if after is None:
+            rows.reverse()
+        items: list[MessageResponseItem] = [
+            MessageResponseItem.parse_obj(dict(zip(message_returning_keys, row))) for row in rows
+        ]
+
+        prev_cursor: str | None = None
+        next_cursor: str | None = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            # более старые сообщения есть всегда, если пришли по курсору after
+            if after is not None or has_more:
+                prev_cursor = encode_message_cursor(first.dt_created, first.id)
+            # более новые сообщения есть всегда, если пришли по курсору before
+            if before is not None or (after is not None and has_more):
+                next_cursor = encode_message_cursor(last.dt_created, last.id)
+
+        return MessageCursorPage(items=items, size=size, prev_cursor=prev_cursor, next_cursor=next_cursor)
+
+    @classmethod
+    async def stream_chat_messages(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+            batch_size: int,
+            include_archive: bool = False,
+    ) -> AsyncIterator[list[dict]]:
+        """Все доступные сообщения чата от старых к новым, пачками по batch_size.
+
+        Строки читаются серверным курсором (yield_per), поэтому в памяти держится
+        только одна пачка, сколько бы сообщений ни было в чате. С include_archive
+        архивные сообщения сливаются с основной историей по (dt_created, id).
+        """
+        def select_chat_messages(model: type[Message] | type[MessageArchive]) -> sa.Select:
+            return sa.select(*(getattr(model, key) for key in message_returning_keys)) \
+                .where(sa.and_(
+                    model.chat_id == chat_id,
+                    model.is_available == True,  # noqa
+                ))
+
+        select_stmt = select_chat_messages(Message)
+        if include_archive:
+            select_stmt = sa.union_all(select_chat_messages(MessageArchive), select_stmt)
+        select_stmt = select_stmt.order_by(select_stmt.selected_columns.dt_created, select_stmt.selected_columns.id)
+
+        res = await db.stream(select_stmt, execution_options={"yield_per": batch_size})
+        async for rows in res.partitions():
+            yield [dict(zip(message_returning_keys, row)) for row in rows]
+
+    @classmethod
+    async def search_messages(
+            cls,
+            db: AsyncSession,
+            participant_id: int,
+            query: str,
+            size: int,
+            chat_id: int | None = None,
+            after: tuple[float, int] | None = None,
+    ) -> MessageSearchPage | None:
+        """Полнотекстовый поиск по доступным сообщениям чатов пользователя participant_id.
+
+        Запрос разбирается websearch_to_tsquery, результаты упорядочены по убыванию
+        релевантности ts_rank_cd, затем по убыванию id. Пагинация keyset по (rank, id):
+        after - курсор последнего результата предыдущей страницы.
+        Фрагменты с подсветкой (ts_headline) строятся только для строк страницы.
+        """
+        ts_query = func.websearch_to_tsquery(MESSAGES_SEARCH_CONFIG, query)
+        rank = func.ts_rank_cd(Message.text_search, ts_query).label("rank")
+        user_chat_ids = sa.select(ChatParticipant.chat_id).where(
+            sa.and_(
+                ChatParticipant.participant_id == participant_id,
+                ChatParticipant.is_available == True,  # noqa
+            )
+        )
+
+        conditions: list = [
+            Message.text_search.op("@@")(ts_query),
+            Message.is_available == True,  # noqa
+            Message.chat_id.in_(user_chat_ids),
+        ]
+        if chat_id is not None:
+            conditions.append(Message.chat_id == chat_id)
+        if after is not None:
+            conditions.append(sa.tuple_(rank, Message.id) < sa.tuple_(sa.cast(after[0], sa.REAL), after[1]))
+
+        # берем на одну строку больше, чтобы понять, есть ли следующая страница
+        page = sa.select(*message_returning, rank) \
+            .where(sa.and_(*conditions)) \
+            .order_by(rank.desc(), Message.id.desc()) \
+            .limit(size + 1) \
+            .subquery("page")
+        snippet = func.ts_headline(
+            MESSAGES_SEARCH_CONFIG,
+            page.c.text,
+            ts_query,
+            SEARCH_HEADLINE_OPTIONS,
+        ).label("snippet")
+        select_stmt = sa.select(page, snippet).order_by(page.c.rank.desc(), page.c.id.desc())
+
+        try:
+            rows = (await db.execute(select_stmt)).mappings().all()
+        except OperationalError:
+            return None
+
+        items: list[MessageSearchResultItem] = [MessageSearchResultItem.parse_obj(row) for row in rows[:size]]
+        next_cursor: str | None = None
+        if len(rows) > size:
+            next_cursor = encode_search_cursor(items[-1].rank, items[-1].id)
+        return MessageSearchPage(items=items, size=size, next_cursor=next_cursor)
 
     @classmethod
     async def update_message(
@@ -114,7 +547,7 @@ class MessageCRUD:
             .returning(*message_returning)
 
         try:
-            res = (await db.execute(update_stmt)).one()
+            res = (await db.execute(update_stmt)).one_or_none()
             if res:
                 await db.commit()
                 return MessageResponseItem.parse_obj(dict(zip(message_returning_keys, res)))
@@ -124,11 +557,153 @@ class MessageCRUD:
             return None
 
     @classmethod
-    async def delete_message(cls, db: AsyncSession, message_id: int, author_id: int) -> int:
-        # только автор может удалить сообщение
+    async def delete_message(cls, db: AsyncSession, message_id: int, author_id: int) -> list[int]:
+        """Пометить сообщение удаленным. Возвращает id чатов удаленных сообщений."""
+        # только автор может удалить сообщение; счетчик сообщений чата уменьшается
+        # только при первом удалении, поэтому уже удаленные сообщения не изменяются
+        is_own_message = sa.and_(Message.id == message_id, Message.author_id == author_id)
         stmt = sa.update(Message) \
             .values(is_available=False) \
-            .where(sa.and_(Message.id == message_id, Message.author_id == author_id))
-        res = (await db.execute(stmt)).rowcount  # noqa
+            .where(sa.and_(
+                is_own_message,
+                Message.is_available == True,  # noqa
+            )) \
+            .returning(Message.chat_id)
+        deleted_chat_ids: list[int] = list((await db.execute(stmt)).scalars())
+        if not deleted_chat_ids:
+            # повторное удаление - не ошибка
+            deleted_chat_ids = list((await db.execute(sa.select(Message.chat_id).where(is_own_message))).scalars())
+            await db.commit()
+            return deleted_chat_ids
+
+        # если удалено последнее сообщение чата, то последним становится предыдущее доступное
+        for chat_id in deleted_chat_ids:
+            last_available_msg = sa.select(Message.id, Message.dt_created) \
+                .where(sa.and_(
+                    Message.chat_id == chat_id,
+                    Message.is_available == True,  # noqa
+                )) \
+                .order_by(Message.dt_created.desc(), Message.id.desc()) \
+                .limit(1) \
+                .subquery()
+            is_last_message = Chat.last_message_id == message_id
+            update_chat_stmt = sa.update(Chat) \
+                .values(
+                    last_message_id=sa.case(
+                        (is_last_message, sa.select(last_available_msg.c.id).scalar_subquery()),
+                        else_=Chat.last_message_id,
+                    ),
+                    last_message_at=sa.case(
+                        (is_last_message, sa.select(last_available_msg.c.dt_created).scalar_subquery()),
+                        else_=Chat.last_message_at,
+                    ),
+                    message_count=func.greatest(Chat.message_count - 1, 0),
+                ) \
+                .where(Chat.id == chat_id)
+            await db.execute(update_chat_stmt)
+
         await db.commit()
-        return res
+        return deleted_chat_ids
+
+    @classmethod
+    async def mark_messages_read(
+            cls,
+            db: AsyncSession,
+            chat_id: int,
+            participant_id: int,
+            message_id: int | None = None,
+    ) -> int | None:
+        """Отметить сообщения чата прочитанными пользователем participant_id.
+
+        Если указан message_id, то прочитанными отмечаются только сообщения с id <= message_id;
+        id сообщения другого чата или несуществующего сообщения ничего не отмечает.
+        Отметка о прочтении (last_read_message_id) и счетчик непрочитанных сообщений
+        обновляются одним UPDATE.
+        Возвращает количество оставшихся непрочитанных сообщений или None, если пользователь не состоит в чате.
+        """
+        participant_condition = sa.and_(
+            ChatParticipant.chat_id == chat_id,
+            ChatParticipant.participant_id == participant_id,
+        )
+        last_read_message_id = read_message_id(chat_id, message_id)
+
+        if SETTINGS.CHAT_READ_STATUS_MODE == ReadStatusModes.WATERMARK:
+            # RETURNING с подзапросом поддерживается только для Core-таблицы
+            update_stmt = sa.update(ChatParticipant.__table__) \
+                .values(last_read_message_id=advanced_watermark(last_read_message_id)) \
+                .where(participant_condition) \
+                .returning(watermark_unread_count().label("unread_count"))
+        else:
+            read_conditions = [
+                MessagesToParticipants.chat_id == chat_id,
+                MessagesToParticipants.participant_id == participant_id,
+                MessagesToParticipants.is_read == False,  # noqa
+            ]
+            if message_id is not None:
+                read_conditions.append(MessagesToParticipants.message_id <= last_read_message_id)
+
+            marked_messages = sa.update(MessagesToParticipants) \
+                .values(is_read=True) \
+                .where(sa.and_(*read_conditions)) \
+                .returning(MessagesToParticipants.message_id) \
+                .cte("marked_messages")
+
+            marked_count = sa.select(func.count()).select_from(marked_messages).scalar_subquery()
+            update_stmt = sa.update(ChatParticipant) \
+                .values(
+                    unread_count=func.greatest(ChatParticipant.unread_count - marked_count, 0),
+                    last_read_message_id=advanced_watermark(last_read_message_id),
+                ) \
+                .where(participant_condition) \
+                .returning(ChatParticipant.unread_count) \
+                .add_cte(marked_messages)
+
+        try:
+            res = (await db.execute(update_stmt)).scalar_one_or_none()
+            await db.commit()
+            return res
+        except OperationalError:
+            return None
+
+    @classmethod
+    async def get_message_readers(
+            cls,
+            db: AsyncSession,
+            message_id: int,
+            participant_id: int,
+    ) -> list[int] | None:
+        """Получить id пользователей, прочитавших сообщение message_id.
+
+        Возвращает None, если сообщения нет или пользователь participant_id не состоит в его чате.
+        """
+        select_message_stmt = sa.select(Message.chat_id, Message.author_id) \
+            .join(ChatParticipant, sa.and_(
+                ChatParticipant.chat_id == Message.chat_id,
+                ChatParticipant.participant_id == participant_id,
+            )) \
+            .where(Message.id == message_id)
+
+        try:
+            msg = (await db.execute(select_message_stmt)).one_or_none()
+            if msg is None:
+                return None
+
+            if SETTINGS.CHAT_READ_STATUS_MODE == ReadStatusModes.WATERMARK:
+                # свое сообщение автор прочитал сразу
+                select_readers_stmt = sa.select(ChatParticipant.participant_id) \
+                    .where(sa.and_(
+                        ChatParticipant.chat_id == msg.chat_id,
+                        sa.or_(
+                            ChatParticipant.last_read_message_id >= message_id,
+                            ChatParticipant.participant_id == msg.author_id,
+                        ),
+                    ))
+            else:
+                select_readers_stmt = sa.select(MessagesToParticipants.participant_id) \
+                    .where(sa.and_(
+                        MessagesToParticipants.message_id == message_id,
+                        MessagesToParticipants.is_read == True,  # noqa
+                    ))
+            return list((await db.execute(select_readers_stmt.order_by(sa.text("participant_id")))).scalars())
+        except OperationalError:
+            return None
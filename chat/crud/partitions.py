@@ -0,0 +1,241 @@
+import re
+from datetime import date, datetime, timezone
+
+import sqlalchemy as sa
+from enums import ReadStatusModes
+from models import ChatParticipant
+from models.message import MESSAGES_DEFAULT_PARTITION_NAME, MESSAGES_TABLE_NAME
+from models.messages_participants import MESSAGES_PARTICIPANTS_TABLE_NAME
+from settings import SETTINGS
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from .chats import build_rebuild_unread_counters_stmt
+
+
+# Колонки, которые переносятся между секциями (text_search вычисляется заново)
+message_copy_columns: tuple = (
+    "id",
+    "dt_created",
+    "dt_updated",
+    "text",
+    "is_available",
+    "author_id",
+    "chat_id",
+)
+
+# Колонки статуса прочтения, которые переносятся из messages_participants
+read_status_copy_columns: tuple = (
+    "message_id",
+    "participant_id",
+    "chat_id",
+    "is_read",
+)
+
+# Имя помесячной секции: messages_y2026m10
+MONTH_PARTITION_NAME_RE = re.compile(rf"^{MESSAGES_TABLE_NAME}_y(\d{{4}})m(\d{{2}})$")
+
+
+def add_months(month: date, months: int) -> date:
+    """Первое число месяца, отстоящего от month на months месяцев."""
+    index: int = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_partition_name(month: date) -> str:
+    return f"{MESSAGES_TABLE_NAME}_y{month:%Y}m{month:%m}"
+
+
+def month_read_statuses_name(month: date) -> str:
+    """Таблица статусов прочтения сообщений отсоединенной секции месяца."""
+    return f"{month_partition_name(month)}_read_statuses"
+
+
+def month_partition_bounds(month: date) -> tuple[datetime, datetime]:
+    """Границы секции месяца [начало, конец) в UTC."""
+    start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    end_month: date = add_months(month, 1)
+    return start, datetime(end_month.year, end_month.month, 1, tzinfo=timezone.utc)
+
+
+def parse_month_partition_name(name: str) -> date | None:
+    match = MONTH_PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+class MessagePartitionCRUD:
+    """Обслуживание помесячных секций таблицы messages.
+
+    Все операции - DDL, поэтому выполняются на соединении, а не в сессии ORM;
+    транзакцией управляет вызывающий код.
+    """
+
+    @classmethod
+    async def get_partitions(cls, conn: AsyncConnection) -> list[str]:
+        """Имена секций таблицы messages, включая секцию по умолчанию."""
+        select_stmt = sa.text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table_name AS regclass)
+            ORDER BY c.relname
+            """
+        )
+        return list((await conn.execute(select_stmt, {"table_name": MESSAGES_TABLE_NAME})).scalars())
+
+    @classmethod
+    async def get_month_partitions(cls, conn: AsyncConnection) -> dict[date, str]:
+        """Помесячные секции по первому числу месяца."""
+        partitions: dict[date, str] = {}
+        for name in await cls.get_partitions(conn):
+            month: date | None = parse_month_partition_name(name)
+            if month is not None:
+                partitions[month] = name
+        return partitions
+
+    @classmethod
+    async def get_default_partition_months(cls, conn: AsyncConnection) -> list[date]:
+        """Месяцы сообщений, попавших в секцию по умолчанию (секции этих месяцев не было)."""
+        if MESSAGES_DEFAULT_PARTITION_NAME not in await cls.get_partitions(conn):
+            return []
+        select_stmt = sa.text(
+            f"""
+            SELECT DISTINCT CAST(date_trunc('month', dt_created AT TIME ZONE 'UTC') AS date) AS month
+            FROM {MESSAGES_DEFAULT_PARTITION_NAME}
+            ORDER BY month
+            """
+        )
+        return list((await conn.execute(select_stmt)).scalars())
+
+    @classmethod
+    async def create_month_partition(cls, conn: AsyncConnection, month: date) -> int:
+        """Создать секцию месяца month.
+
+        Если сообщения этого месяца уже попали в секцию по умолчанию, то они
+        переносятся в новую секцию. Возвращает количество перенесенных строк.
+        """
+        name: str = month_partition_name(month)
+        start, end = month_partition_bounds(month)
+        # параметры в DDL не передаются, границы - даты, сформированные здесь же
+        bounds: str = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+
+        default_rows: int = 0
+        if MESSAGES_DEFAULT_PARTITION_NAME in await cls.get_partitions(conn):
+            default_rows = (await conn.execute(
+                sa.text(
+                    f"SELECT count(*) FROM {MESSAGES_DEFAULT_PARTITION_NAME} "
+                    "WHERE dt_created >= :start AND dt_created < :end"
+                ),
+                {"start": start, "end": end},
+            )).scalar_one()
+
+        if not default_rows:
+            await conn.execute(sa.text(f"CREATE TABLE {name} PARTITION OF {MESSAGES_TABLE_NAME} FOR VALUES {bounds}"))
+            return 0
+
+        # Секция с пересекающимся диапазоном не создается, пока строки лежат в секции
+        # по умолчанию: переносим их в отдельную таблицу и присоединяем ее как секцию
+        columns: str = ", ".join(message_copy_columns)
+        await conn.execute(sa.text(
+            f"CREATE TABLE {name} (LIKE {MESSAGES_TABLE_NAME} INCLUDING DEFAULTS INCLUDING GENERATED)"
+        ))
+        await conn.execute(
+            sa.text(
+                f"""
+                WITH moved AS (
+                    DELETE FROM {MESSAGES_DEFAULT_PARTITION_NAME}
+                    WHERE dt_created >= :start AND dt_created < :end
+                    RETURNING {columns}
+                )
+                INSERT INTO {name} ({columns})
+                SELECT {columns} FROM moved
+                """
+            ),
+            {"start": start, "end": end},
+        )
+        await conn.execute(sa.text(f"ALTER TABLE {MESSAGES_TABLE_NAME} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+        return default_rows
+
+    @classmethod
+    async def detach_month_partition(cls, conn: AsyncConnection, month: date) -> str | None:
+        """Отсоединить секцию месяца month от таблицы messages.
+
+        Секция остается отдельной таблицей с тем же именем (для выгрузки или удаления),
+        но ее сообщения больше не видны в чатах. Статусы прочтения этих сообщений
+        переносятся из messages_participants в отдельную таблицу {секция}_read_statuses
+        (дописываются, если она уже есть).
+        В той же транзакции пересчитываются счетчики сообщений затронутых чатов,
+        их последние сообщения (если они были в секции) и счетчики непрочитанных
+        их участников (режим ROWS). Возвращает имя отсоединенной секции.
+        """
+        name: str = month_partition_name(month)
+        if name not in await cls.get_partitions(conn):
+            return None
+        # SHARE запрещает изменения только в этой (старой) секции, пока она не отсоединена
+        await conn.execute(sa.text(f"LOCK TABLE {name} IN SHARE MODE"))
+        # сообщения секции уходят из чатов: вычитаем их из счетчиков сообщений
+        await conn.execute(sa.text(
+            f"""
+            UPDATE chats c
+            SET message_count = greatest(c.message_count - m.message_count, 0)
+            FROM (
+                SELECT chat_id, count(*) AS message_count
+                FROM {name}
+                WHERE is_available
+                GROUP BY chat_id
+            ) m
+            WHERE m.chat_id = c.id
+            """
+        ))
+
+        # статусы прочтения сообщений секции больше не считаются непрочитанными
+        read_statuses_name: str = month_read_statuses_name(month)
+        columns: str = ", ".join(read_status_copy_columns)
+        # таблица могла остаться от прошлого отсоединения этого месяца: статусы дописываются в нее
+        await conn.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS {read_statuses_name} "
+            f"(LIKE {MESSAGES_PARTICIPANTS_TABLE_NAME} INCLUDING DEFAULTS)"
+        ))
+        await conn.execute(sa.text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {MESSAGES_PARTICIPANTS_TABLE_NAME} s
+                USING {name} m
+                WHERE s.message_id = m.id AND s.chat_id = m.chat_id
+                RETURNING {", ".join(f"s.{column}" for column in read_status_copy_columns)}
+            )
+            INSERT INTO {read_statuses_name} ({columns})
+            SELECT {columns} FROM moved
+            """
+        ))
+        if SETTINGS.CHAT_READ_STATUS_MODE == ReadStatusModes.ROWS:
+            partition_chat_ids = sa.select(sa.distinct(sa.column("chat_id"))).select_from(sa.table(name))
+            await conn.execute(build_rebuild_unread_counters_stmt(ChatParticipant.chat_id.in_(partition_chat_ids)))
+
+        # DETACH ... CONCURRENTLY недоступен при наличии секции по умолчанию
+        await conn.execute(sa.text(f"ALTER TABLE {MESSAGES_TABLE_NAME} DETACH PARTITION {name}"))
+
+        # последнее сообщение чата было в секции: им становится последнее доступное
+        # из оставшихся сообщений (NULL, если их нет)
+        start, end = month_partition_bounds(month)
+        await conn.execute(
+            sa.text(
+                f"""
+                UPDATE chats c
+                SET last_message_id = latest.id, last_message_at = latest.dt_created
+                FROM (SELECT DISTINCT chat_id FROM {name}) p
+                LEFT JOIN LATERAL (
+                    SELECT m.id, m.dt_created
+                    FROM {MESSAGES_TABLE_NAME} m
+                    WHERE m.chat_id = p.chat_id AND m.is_available
+                    ORDER BY m.dt_created DESC, m.id DESC
+                    LIMIT 1
+                ) latest ON true
+                WHERE c.id = p.chat_id AND c.last_message_at >= :start AND c.last_message_at < :end
+                """
+            ),
+            {"start": start, "end": end},
+        )
+        return name
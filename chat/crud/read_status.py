@@ -0,0 +1,53 @@
+import sqlalchemy as sa
+from models import Chat, ChatParticipant, Message
+from sqlalchemy.sql import func
+
+
+def watermark_unread_count():
+    """Количество непрочитанных сообщений чата по отметке участника (режим WATERMARK).
+
+    Подзапрос коррелирует с ChatParticipant: непрочитанными считаются доступные сообщения
+    других пользователей, добавленные после last_read_message_id.
+    """
+    return (
+        sa.select(func.count(Message.id))
+        .where(
+            sa.and_(
+                Message.chat_id == ChatParticipant.chat_id,
+                Message.id > func.coalesce(ChatParticipant.last_read_message_id, 0),
+                Message.author_id != ChatParticipant.participant_id,
+                Message.is_available == True,  # noqa
+            )
+        )
+        .correlate(ChatParticipant)
+        .scalar_subquery()
+    )
+
+
+def read_message_id(chat_id: int, message_id: int | None):
+    """Id сообщения, до которого включительно чат отмечается прочитанным.
+
+    Если message_id не указан, то берется последнее сообщение чата. Id, присланный клиентом,
+    принимается, только если это доступное сообщение чата chat_id, иначе подзапрос вернет NULL.
+    """
+    if message_id is None:
+        return sa.select(Chat.last_message_id).where(Chat.id == chat_id).scalar_subquery()
+    return (
+        sa.select(Message.id)
+        .where(
+            sa.and_(
+                Message.id == message_id,
+                Message.chat_id == chat_id,
+                Message.is_available == True,  # noqa
+            )
+        )
+        .scalar_subquery()
+    )
+
+
+def advanced_watermark(read_message_id):
+    """Новое значение отметки о прочтении: отметка только растет.
+
+    greatest пропускает NULL, поэтому при неизвестном read_message_id отметка не меняется.
+    """
+    return func.greatest(func.coalesce(ChatParticipant.last_read_message_id, 0), read_message_id)
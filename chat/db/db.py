@@ -1,11 +1,15 @@
 import os
 import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from uuid import uuid4
 
 from log import get_logger
 from settings import SETTINGS
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import NullPool
 
 
 logger = get_logger(__name__)
@@ -23,12 +27,41 @@ class MyDatabase:
         Create connection pool.
         """
         if cls.engine is None:
-            cls.engine = create_async_engine(SETTINGS.get_async_database_uri(), future=True, pool_size=20)  # noqa
+            cls.engine = create_async_engine(SETTINGS.get_async_database_uri(), **cls.engine_options())
         if cls.SessionLocal is None:
             cls.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=cls.engine)
         if cls.async_session is None:
             cls.async_session = sessionmaker(cls.engine, class_=AsyncSession, expire_on_commit=False)
 
+    @classmethod
+    def engine_options(cls) -> dict:
+        """Options of the engine: statement caches and pooling.
+
+        SQLAlchemy caches compiled SQL per process (query_cache_size), asyncpg caches
+        prepared statements per connection (prepared_statement_cache_size). Behind
+        PgBouncer in transaction mode a connection may switch server backends between
+        transactions, so prepared statements are not cached and get unique names,
+        and pooling is left to PgBouncer.
+        """
+        options: dict = {
+            "future": True,
+            "query_cache_size": SETTINGS.CHAT_POSTGRES_QUERY_CACHE_SIZE,
+        }
+        if SETTINGS.CHAT_POSTGRES_PGBOUNCER:
+            options["poolclass"] = NullPool
+            options["connect_args"] = {
+                "prepared_statement_cache_size": 0,
+                "statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        else:
+            options["pool_size"] = 20
+            options["connect_args"] = {
+                "prepared_statement_cache_size": SETTINGS.CHAT_POSTGRES_STATEMENT_CACHE_SIZE,
+                "statement_cache_size": SETTINGS.CHAT_POSTGRES_STATEMENT_CACHE_SIZE,
+            }
+        return options
+
     @classmethod
     def create_tables(cls):
         """Create tables in database if they do not exist."""
@@ -45,6 +78,23 @@ class MyDatabase:
                 logger.error("Try to create tables in 3s...")
                 time.sleep(3)
 
+    @classmethod
+    @asynccontextmanager
+    async def rollback_session(cls) -> AsyncIterator[AsyncSession]:
+        """Session whose changes are rolled back on exit, even if they were committed.
+
+        Commits inside the session only release savepoints of the outer transaction.
+        Used by checks and benchmarks that must not leave data behind.
+        """
+        cls.init()
+        async with cls.engine.connect() as conn:
+            trans = await conn.begin()
+            try:
+                async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as session:
+                    yield session
+            finally:
+                await trans.rollback()
+
     @classmethod
     async def finish(cls):
         """Dispose the connection pool."""
@@ -1,6 +1,13 @@
+from .overflow import OverflowPolicies
+from .pagination import PaginationModes, TotalModes
+from .read_status import ReadStatusModes
 from .stages import Stages
 
 
 __all__ = (
+    'OverflowPolicies',
+    'PaginationModes',
+    'ReadStatusModes',
     'Stages',
+    'TotalModes',
 )
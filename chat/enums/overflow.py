@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class OverflowPolicies(str, Enum):
+    # выбросить самый старый кадр из очереди отправки
+    DROP_OLDEST: str = 'DROP_OLDEST'
+    # отключить клиента с подсказкой заново синхронизировать состояние
+    DISCONNECT: str = 'DISCONNECT'
@@ -0,0 +1,15 @@
+from enum import Enum
+
+
+class PaginationModes(str, Enum):
+    PAGE: str = 'page'
+    CURSOR: str = 'cursor'
+
+
+class TotalModes(str, Enum):
+    # общее количество не считается (бесконечная прокрутка)
+    FALSE: str = 'false'
+    # счетчик сообщений чата (chats.message_count), без чтения истории
+    APPROX: str = 'approx'
+    # COUNT(*) по сообщениям чата
+    EXACT: str = 'exact'
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ReadStatusModes(str, Enum):
+    # статус прочтения хранится строкой messages_participants для каждого получателя
+    ROWS: str = 'ROWS'
+    # каждый участник чата хранит id последнего прочитанного сообщения
+    WATERMARK: str = 'WATERMARK'
@@ -0,0 +1,25 @@
+from .importer import HistoryImporter, IntegrityViolation, get_message_months
+from .sources import ImportColumn, ImportFormatError, ImportTable, read_records
+from .tables import (
+    IMPORT_TABLES,
+    chat_participants_import,
+    chats_import,
+    messages_import,
+    read_statuses_import,
+)
+
+
+__all__ = (
+    "HistoryImporter",
+    "IntegrityViolation",
+    "get_message_months",
+    "ImportColumn",
+    "ImportTable",
+    "ImportFormatError",
+    "read_records",
+    "IMPORT_TABLES",
+    "chats_import",
+    "chat_participants_import",
+    "messages_import",
+    "read_statuses_import",
+)
@@ -0,0 +1,274 @@
+import time
+from datetime import date, timezone
+from pathlib import Path
+from typing import Callable
+
+import sqlalchemy as sa
+from crud.chats import build_rebuild_unread_counters_stmt
+from enums import ReadStatusModes
+from models import Chat, ChatParticipant, Message
+from models.chat import CHAT_TABLE_NAME
+from models.chat_participant import CHAT_PARTICIPANTS_TABLE_NAME
+from models.message import MESSAGES_TABLE_NAME
+from models.message_archive import MESSAGES_ARCHIVE_TABLE_NAME
+from models.messages_participants import MESSAGES_PARTICIPANTS_TABLE_NAME
+from settings import SETTINGS
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql import func
+
+from .sources import ImportTable, read_records
+from .tables import messages_import
+
+
+# Ключ advisory-блокировки: два импорта не выполняются одновременно
+IMPORT_LOCK_KEY: int = 7_300_020
+
+# Сколько нарушающих строк показывать в отчете о проверке
+VIOLATION_SAMPLE_SIZE: int = 5
+
+# Проверки целостности загруженных строк: запросы выбирают ключи нарушающих строк
+# в диапазоне [:lo, :hi] колонки, по которой проверка ограничена.
+# Внешние ключи chat_participants.chat_id и messages_participants.chat_id проверяет сам COPY.
+MESSAGES_OF_UNKNOWN_CHATS: str = f"""
+    SELECT CAST(m.id AS text) AS key
+    FROM {MESSAGES_TABLE_NAME} m
+    WHERE m.id BETWEEN :lo AND :hi
+      AND NOT EXISTS (SELECT 1 FROM {CHAT_TABLE_NAME} c WHERE c.id = m.chat_id)
+"""
+
+# первичный ключ секционированной messages - (id, dt_created), поэтому уникальность id
+# проверяется отдельно, вместе с архивом
+DUPLICATE_MESSAGE_IDS: str = f"""
+    SELECT CAST(id AS text) AS key
+    FROM (
+        SELECT id FROM {MESSAGES_TABLE_NAME} WHERE id BETWEEN :lo AND :hi
+        UNION ALL
+        SELECT id FROM {MESSAGES_ARCHIVE_TABLE_NAME} WHERE id BETWEEN :lo AND :hi
+    ) AS ids
+    GROUP BY id
+    HAVING count(*) > 1
+"""
+
+READ_STATUSES_OF_UNKNOWN_MESSAGES: str = f"""
+    SELECT s.message_id || '/' || s.participant_id AS key
+    FROM {MESSAGES_PARTICIPANTS_TABLE_NAME} s
+    WHERE s.message_id BETWEEN :lo AND :hi
+      AND NOT EXISTS (SELECT 1 FROM {MESSAGES_TABLE_NAME} m WHERE m.id = s.message_id AND m.chat_id = s.chat_id)
+"""
+
+READ_STATUSES_OF_NON_PARTICIPANTS: str = f"""
+    SELECT s.message_id || '/' || s.participant_id AS key
+    FROM {MESSAGES_PARTICIPANTS_TABLE_NAME} s
+    WHERE s.message_id BETWEEN :lo AND :hi
+      AND NOT EXISTS (
+          SELECT 1 FROM {CHAT_PARTICIPANTS_TABLE_NAME} p
+          WHERE p.chat_id = s.chat_id AND p.participant_id = s.participant_id
+      )
+"""
+
+READ_MARKS_OF_UNKNOWN_MESSAGES: str = f"""
+    SELECT p.chat_id || '/' || p.participant_id AS key
+    FROM {CHAT_PARTICIPANTS_TABLE_NAME} p
+    WHERE p.chat_id BETWEEN :lo AND :hi
+      AND p.last_read_message_id IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM {MESSAGES_TABLE_NAME} m
+          WHERE m.id = p.last_read_message_id AND m.chat_id = p.chat_id
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM {MESSAGES_ARCHIVE_TABLE_NAME} a
+          WHERE a.id = p.last_read_message_id AND a.chat_id = p.chat_id
+      )
+"""
+
+# (название, запрос, таблица и колонка, диапазоном значений которой ограничена проверка)
+INTEGRITY_CHECKS: tuple = (
+    ("messages of unknown chats", MESSAGES_OF_UNKNOWN_CHATS, (MESSAGES_TABLE_NAME, "id")),
+    ("duplicate message ids", DUPLICATE_MESSAGE_IDS, (MESSAGES_TABLE_NAME, "id")),
+    (
+        "read statuses of unknown messages",
+        READ_STATUSES_OF_UNKNOWN_MESSAGES,
+        (MESSAGES_PARTICIPANTS_TABLE_NAME, "message_id"),
+    ),
+    (
+        "read statuses of non-participants",
+        READ_STATUSES_OF_NON_PARTICIPANTS,
+        (MESSAGES_PARTICIPANTS_TABLE_NAME, "message_id"),
+    ),
+    ("read marks of unknown messages", READ_MARKS_OF_UNKNOWN_MESSAGES, (CHAT_PARTICIPANTS_TABLE_NAME, "chat_id")),
+)
+
+# Продвинуть последовательность id таблицы за максимальный id, если она отстает
+SETVAL_SQL: str = """
+    SELECT setval(s.seq, s.max_id)
+    FROM (
+        SELECT CAST(pg_get_serial_sequence(:table_name, 'id') AS regclass) AS seq,
+               (SELECT max(id) FROM {table_name}) AS max_id
+    ) AS s
+    WHERE s.max_id > coalesce(pg_sequence_last_value(s.seq), 0)
+"""
+
+
+class IntegrityViolation:
+    __slots__ = ("check", "count", "sample")
+
+    def __init__(self, check: str, count: int, sample: list[str]):
+        self.check = check
+        self.count = count
+        self.sample = sample
+
+    def __str__(self) -> str:
+        return f"{self.check}: {self.count} (e.g. {', '.join(self.sample)})"
+
+
+def get_message_months(path: Path, batch_size: int) -> set[date]:
+    """Месяцы (UTC) сообщений файла: секции этих месяцев должны существовать до загрузки.
+
+    Файл читается целиком, поэтому ошибки формата обнаруживаются до начала транзакции импорта.
+    """
+    dt_created_index: int = messages_import.column_names.index("dt_created")
+    months: set[date] = set()
+    for records in read_records(path, messages_import, batch_size):
+        months.update(
+            record[dt_created_index].astimezone(timezone.utc).date().replace(day=1) for record in records
+        )
+    return months
+
+
+class HistoryImporter:
+    """Загрузка истории чатов из файлов NDJSON/CSV через COPY в существующие таблицы.
+
+    Все операции выполняются на соединении в одной транзакции, которой управляет
+    вызывающий код: если проверка целостности нашла нарушения, импорт откатывается целиком.
+    Для загруженных строк запоминаются диапазоны ключей: проверки и пересчет
+    денормализованных полей затрагивают только эти диапазоны, а не таблицы целиком.
+    """
+
+    def __init__(
+            self,
+            conn: AsyncConnection,
+            batch_size: int,
+            on_progress: Callable[[str, int, float], None] | None = None,
+    ):
+        self.conn = conn
+        self.batch_size = batch_size
+        # вызывается после каждой пачки: (таблица, загружено строк, секунд с начала файла)
+        self.on_progress = on_progress
+        self.rows: dict[str, int] = {}
+        self.scopes: dict[tuple[str, str], tuple[int, int]] = {}
+
+    async def lock(self):
+        """Взять блокировку импорта до конца транзакции.
+
+        Это и первый запрос транзакции: SQLAlchemy открывает ее на соединении лениво,
+        а COPY выполняется напрямую через asyncpg.
+        """
+        await self.conn.execute(sa.select(func.pg_advisory_xact_lock(IMPORT_LOCK_KEY)))
+
+    async def copy(self, table: ImportTable, path: Path) -> int:
+        """Загрузить файл path в таблицу table пачками по batch_size. Возвращает количество строк."""
+        driver_connection = (await self.conn.get_raw_connection()).driver_connection
+        started_at: float = time.monotonic()
+        rows: int = 0
+        for records in read_records(path, table, self.batch_size):
+            await driver_connection.copy_records_to_table(table.name, records=records, columns=table.column_names)
+            rows += len(records)
+            self._extend_scopes(table, records)
+            if self.on_progress is not None:
+                self.on_progress(table.name, rows, time.monotonic() - started_at)
+        self.rows[table.name] = self.rows.get(table.name, 0) + rows
+        return rows
+
+    def _extend_scopes(self, table: ImportTable, records: list[tuple]):
+        for column, index in zip(table.scope_columns, table.scope_indexes):
+            values: list[int] = [record[index] for record in records]
+            lo, hi = min(values), max(values)
+            scope: tuple[int, int] | None = self.scopes.get((table.name, column))
+            self.scopes[(table.name, column)] = (lo, hi) if scope is None else (min(scope[0], lo), max(scope[1], hi))
+
+    def get_chat_scope(self) -> tuple[int, int] | None:
+        """Диапазон id чатов, затронутых импортом."""
+        scopes: list[tuple[int, int]] = [
+            scope
+            for (table_name, column), scope in self.scopes.items()
+            if (table_name, column) == (CHAT_TABLE_NAME, "id") or column == "chat_id"
+        ]
+        if not scopes:
+            return None
+        return min(lo for lo, _ in scopes), max(hi for _, hi in scopes)
+
+    async def check_integrity(self) -> list[IntegrityViolation]:
+        """Проверить ссылки загруженных строк запросами над множествами, а не построчно."""
+        violations: list[IntegrityViolation] = []
+        for check, query, scope_key in INTEGRITY_CHECKS:
+            scope: tuple[int, int] | None = self.scopes.get(scope_key)
+            if scope is None:
+                continue
+            select_stmt = sa.text(
+                f"SELECT count(*), (array_agg(key))[1:{VIOLATION_SAMPLE_SIZE}] FROM ({query}) AS violations"
+            )
+            count, sample = (await self.conn.execute(select_stmt, {"lo": scope[0], "hi": scope[1]})).one()
+            if count:
+                violations.append(IntegrityViolation(check, count, sample))
+        return violations
+
+    async def fix_sequences(self) -> dict[str, int]:
+        """Продвинуть последовательности id за загруженные id.
+
+        setval не откатывается вместе с транзакцией, поэтому вызывается перед фиксацией.
+        Возвращает новые значения последовательностей по таблицам.
+        """
+        values: dict[str, int] = {}
+        for table_name in (CHAT_TABLE_NAME, MESSAGES_TABLE_NAME):
+            if not self.rows.get(table_name):
+                continue
+            value: int | None = (await self.conn.execute(
+                sa.text(SETVAL_SQL.format(table_name=table_name)),
+                {"table_name": table_name},
+            )).scalar()
+            if value is not None:
+                values[table_name] = value
+        return values
+
+    async def rebuild_chat_state(self) -> tuple[int, int]:
+        """Пересчитать последнее сообщение и счетчик сообщений затронутых чатов, счетчики непрочитанных (ROWS).
+
+        Возвращает количество обновленных чатов и участников.
+        """
+        chat_scope: tuple[int, int] | None = self.get_chat_scope()
+        if chat_scope is None:
+            return 0, 0
+
+        latest_messages = sa.select(
+            Message.chat_id,
+            Message.id,
+            Message.dt_created,
+            func.count().over(partition_by=Message.chat_id).label("message_count"),
+        ) \
+            .where(sa.and_(
+                Message.chat_id.between(*chat_scope),
+                Message.is_available == True,  # noqa
+            )) \
+            .distinct(Message.chat_id) \
+            .order_by(Message.chat_id, Message.dt_created.desc(), Message.id.desc()) \
+            .subquery("latest_messages")
+        update_last_message = sa.update(Chat.__table__) \
+            .values(
+                last_message_id=latest_messages.c.id,
+                last_message_at=latest_messages.c.dt_created,
+                message_count=latest_messages.c.message_count,
+            ) \
+            .where(sa.and_(
+                Chat.id == latest_messages.c.chat_id,
+                sa.or_(
+                    Chat.last_message_id.is_distinct_from(latest_messages.c.id),
+                    Chat.message_count != latest_messages.c.message_count,
+                ),
+            ))
+        chats: int = (await self.conn.execute(update_last_message)).rowcount  # noqa
+
+        participants: int = 0
+        if SETTINGS.CHAT_READ_STATUS_MODE == ReadStatusModes.ROWS:
+            update_unread = build_rebuild_unread_counters_stmt(ChatParticipant.chat_id.between(*chat_scope))
+            participants = (await self.conn.execute(update_unread)).rowcount  # noqa
+        return chats, participants
@@ -0,0 +1,131 @@
+import csv
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import orjson
+
+
+# Признак обязательной колонки: значения по умолчанию нет
+REQUIRED: object = object()
+
+# Расширения файлов с одним JSON-объектом на строку
+NDJSON_SUFFIXES: tuple = (".ndjson", ".jsonl")
+CSV_SUFFIXES: tuple = (".csv",)
+
+TRUE_VALUES: frozenset = frozenset(("true", "t", "1", "yes", "y"))
+FALSE_VALUES: frozenset = frozenset(("false", "f", "0", "no", "n"))
+
+
+class ImportFormatError(ValueError):
+    """Строку файла импорта нельзя преобразовать в строку таблицы."""
+
+
+def to_int(value: Any) -> int:
+    return int(value)
+
+
+def to_text(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    lowered: str = str(value).strip().lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def to_datetime(value: Any) -> datetime:
+    """Дата и время в ISO 8601; без часового пояса считается UTC."""
+    dt: datetime = datetime.fromisoformat(value)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class ImportColumn:
+    """Колонка таблицы, загружаемая из поля файла с тем же именем.
+
+    default - значение для отсутствующего или пустого поля; вызываемый default
+    вычисляется один раз на файл (например, время начала импорта).
+    """
+
+    __slots__ = ("name", "convert", "default")
+
+    def __init__(self, name: str, convert: Callable[[Any], Any], default: Any = None):
+        self.name = name
+        self.convert = convert
+        self.default = default
+
+
+class ImportTable:
+    """Таблица, загружаемая из файла, и колонки в порядке COPY.
+
+    scope_columns - колонки, по диапазону значений которых проверяется целостность
+    загруженных строк и пересчитываются денормализованные поля.
+    """
+
+    def __init__(self, name: str, columns: tuple[ImportColumn, ...], scope_columns: tuple[str, ...]):
+        self.name = name
+        self.columns = columns
+        self.column_names: tuple[str, ...] = tuple(column.name for column in columns)
+        self.scope_columns = scope_columns
+        self.scope_indexes: tuple[int, ...] = tuple(self.column_names.index(name) for name in scope_columns)
+
+
+def read_rows(path: Path) -> Iterator[tuple[int, dict]]:
+    """Строки файла NDJSON или CSV (с заголовком) вместе с номерами строк файла."""
+    if path.suffix in NDJSON_SUFFIXES:
+        with path.open("rb") as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, orjson.loads(line)
+                    except orjson.JSONDecodeError as e:
+                        raise ImportFormatError(f"{path}:{line_no}: {e}") from e
+    elif path.suffix in CSV_SUFFIXES:
+        with path.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+    else:
+        raise ImportFormatError(f"{path}: unknown format, expected one of {NDJSON_SUFFIXES + CSV_SUFFIXES}")
+
+
+def read_records(path: Path, table: ImportTable, batch_size: int) -> Iterator[list[tuple]]:
+    """Записи для COPY в таблицу table пачками по batch_size.
+
+    Пустое поле CSV равносильно отсутствующему. Ошибки преобразования
+    сообщаются с именем файла и номером строки.
+    """
+    columns: list[tuple[str, Callable[[Any], Any], Any]] = [
+        (column.name, column.convert, column.default() if callable(column.default) else column.default)
+        for column in table.columns
+    ]
+    batch: list[tuple] = []
+    for line_no, row in read_rows(path):
+        record: list = []
+        for name, convert, default in columns:
+            value = row.get(name)
+            if value is None or value == "":
+                if default is REQUIRED:
+                    raise ImportFormatError(f"{path}:{line_no}: `{name}` is required")
+                record.append(default)
+                continue
+            try:
+                record.append(convert(value))
+            except (TypeError, ValueError) as e:
+                raise ImportFormatError(f"{path}:{line_no}: `{name}`: {e}") from e
+        batch.append(tuple(record))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
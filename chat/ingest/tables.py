@@ -0,0 +1,79 @@
+from models.chat import CHAT_TABLE_NAME
+from models.chat_participant import CHAT_PARTICIPANTS_TABLE_NAME
+from models.message import MESSAGES_TABLE_NAME
+from models.messages_participants import MESSAGES_PARTICIPANTS_TABLE_NAME
+
+from .sources import (
+    REQUIRED,
+    ImportColumn,
+    ImportTable,
+    to_bool,
+    to_datetime,
+    to_int,
+    to_text,
+    utc_now,
+)
+
+
+# Денормализованные поля (chats.last_message_*, chat_participants.unread_count)
+# не загружаются, а пересчитываются после импорта
+
+chats_import = ImportTable(
+    CHAT_TABLE_NAME,
+    (
+        ImportColumn("id", to_int, REQUIRED),
+        ImportColumn("dt_created", to_datetime, utc_now),
+        ImportColumn("dt_updated", to_datetime, utc_now),
+        ImportColumn("name", to_text),
+        ImportColumn("admin_id", to_int),
+        ImportColumn("is_private", to_bool, True),
+    ),
+    scope_columns=("id",),
+)
+
+chat_participants_import = ImportTable(
+    CHAT_PARTICIPANTS_TABLE_NAME,
+    (
+        ImportColumn("chat_id", to_int, REQUIRED),
+        ImportColumn("participant_id", to_int, REQUIRED),
+        ImportColumn("is_available", to_bool, True),
+        # отметка о прочтении для режима WATERMARK
+        ImportColumn("last_read_message_id", to_int),
+    ),
+    scope_columns=("chat_id",),
+)
+
+messages_import = ImportTable(
+    MESSAGES_TABLE_NAME,
+    (
+        ImportColumn("id", to_int, REQUIRED),
+        ImportColumn("dt_created", to_datetime, REQUIRED),
+        ImportColumn("dt_updated", to_datetime),
+        ImportColumn("text", to_text),
+        ImportColumn("is_available", to_bool, True),
+        ImportColumn("author_id", to_int),
+        ImportColumn("chat_id", to_int, REQUIRED),
+    ),
+    scope_columns=("id", "chat_id"),
+)
+
+# статусы прочтения для режима ROWS
+read_statuses_import = ImportTable(
+    MESSAGES_PARTICIPANTS_TABLE_NAME,
+    (
+        ImportColumn("message_id", to_int, REQUIRED),
+        ImportColumn("participant_id", to_int, REQUIRED),
+        ImportColumn("chat_id", to_int, REQUIRED),
+        ImportColumn("is_read", to_bool, False),
+    ),
+    scope_columns=("message_id", "chat_id"),
+)
+
+# Порядок загрузки: внешние ключи chat_participants и messages_participants
+# проверяются при COPY, поэтому чаты загружаются первыми
+IMPORT_TABLES: tuple[ImportTable, ...] = (
+    chats_import,
+    chat_participants_import,
+    messages_import,
+    read_statuses_import,
+)
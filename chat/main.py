@@ -1,8 +1,10 @@
 import fastapi as fa
 from api import api_router
 from api.consts import USER_ID_HTTP_HEADER
+from crud import start_message_writer, stop_message_writer
 from enums import Stages
 from fastapi_pagination import add_pagination
+from realtime import start_pubsub, stop_pubsub
 from settings import SETTINGS
 
 
@@ -27,6 +29,14 @@ def get_app() -> fa.FastAPI:
     application.include_router(api_router)
     add_pagination(application)
 
+    # подписка процесса на межпроцессную шину событий
+    application.add_event_handler("startup", start_pubsub)
+    application.add_event_handler("shutdown", stop_pubsub)
+
+    # групповая запись новых сообщений (CHAT_GROUP_COMMIT_ENABLED)
+    application.add_event_handler("startup", start_message_writer)
+    application.add_event_handler("shutdown", stop_message_writer)
+
     return application
 
 
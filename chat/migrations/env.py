@@ -55,7 +55,7 @@ def run_migrations_offline() -> None:
 
     """
     context.configure(
-        url=SETTINGS.get_sync_database_uri(),
+        url=SETTINGS.get_direct_database_uri(),
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
@@ -73,7 +73,7 @@ def run_migrations_online() -> None:
 
     """
     alembic_config = config.get_section(config.config_ini_section)
-    alembic_config['sqlalchemy.url'] = SETTINGS.get_sync_database_uri()
+    alembic_config['sqlalchemy.url'] = SETTINGS.get_direct_database_uri()
     connectable = engine_from_config(
         alembic_config,
         prefix="sqlalchemy.",
@@ -0,0 +1,63 @@
+"""Add hot path indexes for messages, participants and read status
+
+Revision ID: d57459d7f232
+Revises: 427fe58301bc
+Create Date: 2026-10-18 09:00:12.412311
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd57459d7f232'
+down_revision = '427fe58301bc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицы, но не может выполняться в транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix__messages__chat_id_dt_created_id'),
+            'messages',
+            ['chat_id', 'dt_created', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix__chat_participants__participant_id_chat_id'),
+            'chat_participants',
+            ['participant_id', 'chat_id'],
+            unique=False,
+            postgresql_where=sa.text('is_available'),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f('ix__messages_participants__participant_id_chat_id_unread'),
+            'messages_participants',
+            ['participant_id', 'chat_id'],
+            unique=False,
+            postgresql_where=sa.text('NOT is_read'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f('ix__messages_participants__participant_id_chat_id_unread'),
+            table_name='messages_participants',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f('ix__chat_participants__participant_id_chat_id'),
+            table_name='chat_participants',
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            op.f('ix__messages__chat_id_dt_created_id'),
+            table_name='messages',
+            postgresql_concurrently=True,
+        )
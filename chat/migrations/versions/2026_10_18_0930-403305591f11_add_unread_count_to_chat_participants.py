@@ -0,0 +1,35 @@
+"""Add unread_count to chat_participants table
+
+Revision ID: 403305591f11
+Revises: d57459d7f232
+Create Date: 2026-10-18 09:30:41.027533
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '403305591f11'
+down_revision = 'd57459d7f232'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_participants', sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False))
+    # заполняем счетчики по текущим статусам прочтения
+    op.execute(
+        """
+        UPDATE chat_participants cp
+        SET unread_count = (
+            SELECT count(*)
+            FROM messages_participants mp
+            WHERE mp.chat_id = cp.chat_id AND mp.participant_id = cp.participant_id AND NOT mp.is_read
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('chat_participants', 'unread_count')
@@ -0,0 +1,51 @@
+"""Add last_message_id and last_message_at to chats table
+
+Revision ID: e99cb063f0fa
+Revises: 403305591f11
+Create Date: 2026-10-18 10:00:27.730164
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e99cb063f0fa'
+down_revision = '403305591f11'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('last_message_id', sa.Integer(), nullable=True))
+    op.add_column('chats', sa.Column('last_message_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+    # последнее доступное сообщение каждого чата
+    op.execute(
+        """
+        UPDATE chats c
+        SET last_message_id = m.id, last_message_at = m.dt_created
+        FROM (
+            SELECT DISTINCT ON (chat_id) chat_id, id, dt_created
+            FROM messages
+            WHERE is_available
+            ORDER BY chat_id, dt_created DESC, id DESC
+        ) m
+        WHERE m.chat_id = c.id
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix__chats__last_message_at'),
+            'chats',
+            [sa.text('last_message_at DESC NULLS LAST')],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix__chats__last_message_at'), table_name='chats', postgresql_concurrently=True)
+    op.drop_column('chats', 'last_message_at')
+    op.drop_column('chats', 'last_message_id')
@@ -0,0 +1,49 @@
+"""Add last_read_message_id to chat_participants table
+
+Revision ID: df300fed9a22
+Revises: e99cb063f0fa
+Create Date: 2026-10-18 10:30:04.518822
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'df300fed9a22'
+down_revision = 'e99cb063f0fa'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_participants', sa.Column('last_read_message_id', sa.Integer(), nullable=True))
+    # переносим статусы прочтения из messages_participants:
+    # отметкой становится последнее прочитанное сообщение
+    op.execute(
+        """
+        UPDATE chat_participants cp
+        SET last_read_message_id = mp.message_id
+        FROM (
+            SELECT chat_id, participant_id, max(message_id) AS message_id
+            FROM messages_participants
+            WHERE is_read
+            GROUP BY chat_id, participant_id
+        ) mp
+        WHERE mp.chat_id = cp.chat_id AND mp.participant_id = cp.participant_id
+        """
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix__messages__chat_id_id'),
+            'messages',
+            ['chat_id', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix__messages__chat_id_id'), table_name='messages', postgresql_concurrently=True)
+    op.drop_column('chat_participants', 'last_read_message_id')
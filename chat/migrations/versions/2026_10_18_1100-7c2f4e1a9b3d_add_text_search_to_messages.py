@@ -0,0 +1,46 @@
+"""Add full-text search column and index to messages table
+
+Revision ID: 7c2f4e1a9b3d
+Revises: df300fed9a22
+Create Date: 2026-10-18 11:00:12.402981
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2f4e1a9b3d'
+down_revision = 'df300fed9a22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # добавление STORED-колонки переписывает таблицу под ACCESS EXCLUSIVE блокировкой
+    op.add_column(
+        'messages',
+        sa.Column(
+            'text_search',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', coalesce(text, ''))", persisted=True),
+            nullable=True,
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix__messages__text_search'),
+            'messages',
+            ['text_search'],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_where=sa.text('is_available'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix__messages__text_search'), table_name='messages', postgresql_concurrently=True)
+    op.drop_column('messages', 'text_search')
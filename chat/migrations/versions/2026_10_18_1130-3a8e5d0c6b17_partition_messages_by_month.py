@@ -0,0 +1,149 @@
+"""Partition messages table by month of dt_created
+
+Revision ID: 3a8e5d0c6b17
+Revises: 7c2f4e1a9b3d
+Create Date: 2026-10-18 11:30:41.918254
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8e5d0c6b17'
+down_revision = '7c2f4e1a9b3d'
+branch_labels = None
+depends_on = None
+
+# секции вперед от текущего месяца, дальше их создает commands/manage_partitions.py
+PARTITIONS_AHEAD = 3
+
+MESSAGE_COLUMNS = 'id, dt_created, dt_updated, text, is_available, author_id, chat_id'
+
+
+def message_columns() -> list:
+    return [
+        sa.Column('id', sa.Integer(), server_default=sa.text("nextval('messages_id_seq'::regclass)"), nullable=False),
+        sa.Column(
+            'dt_created',
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text('CURRENT_TIMESTAMP'),
+            nullable=False,
+        ),
+        sa.Column('dt_updated', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.Column(
+            'text_search',
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('simple', coalesce(text, ''))", persisted=True),
+            nullable=True,
+        ),
+        sa.Column('is_available', sa.Boolean(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+    ]
+
+
+def create_message_indexes() -> None:
+    op.create_index(op.f('ix__messages__chat_id_dt_created_id'), 'messages', ['chat_id', 'dt_created', 'id'])
+    op.create_index(op.f('ix__messages__chat_id_id'), 'messages', ['chat_id', 'id'])
+    op.create_index(
+        op.f('ix__messages__text_search'),
+        'messages',
+        ['text_search'],
+        postgresql_using='gin',
+        postgresql_where=sa.text('is_available'),
+    )
+
+
+def release_message_names(old_table: str) -> None:
+    """Освободить имена индексов и первичного ключа messages для новой таблицы."""
+    op.drop_index(op.f('ix__messages__text_search'), table_name=old_table)
+    op.drop_index(op.f('ix__messages__chat_id_id'), table_name=old_table)
+    op.drop_index(op.f('ix__messages__chat_id_dt_created_id'), table_name=old_table)
+    op.execute(f'ALTER TABLE {old_table} RENAME CONSTRAINT pk__messages TO pk__{old_table}')
+
+
+def upgrade() -> None:
+    # Таблица переписывается целиком: на время миграции запись сообщений заблокирована.
+    # Внешний ключ на секционированную таблицу должен ссылаться на (id, dt_created),
+    # которых нет в messages_participants, поэтому он удаляется
+    op.drop_constraint(
+        op.f('fk__messages_participants__message_id__messages'),
+        'messages_participants',
+        type_='foreignkey',
+    )
+    op.rename_table('messages', 'messages_unpartitioned')
+    release_message_names('messages_unpartitioned')
+
+    op.create_table(
+        'messages',
+        *message_columns(),
+        sa.PrimaryKeyConstraint('id', 'dt_created', name=op.f('pk__messages')),
+        postgresql_partition_by='RANGE (dt_created)',
+    )
+    # помесячные секции в UTC от самого старого сообщения до PARTITIONS_AHEAD месяцев вперед
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc(
+                        'month',
+                        coalesce((SELECT min(dt_created) FROM messages_unpartitioned), now()) AT TIME ZONE 'UTC'
+                    ),
+                    date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{PARTITIONS_AHEAD} months',
+                    interval '1 month'
+                )
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    'messages_' || to_char(month, '"y"YYYY"m"MM'),
+                    month AT TIME ZONE 'UTC',
+                    (month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END
+        $$
+        """
+    )
+    op.execute('CREATE TABLE messages_default PARTITION OF messages DEFAULT')
+
+    op.execute(f'INSERT INTO messages ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages_unpartitioned')
+    # индексы строятся после копирования - так быстрее, чем обновлять их на каждую строку
+    create_message_indexes()
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages.id')
+    op.drop_table('messages_unpartitioned')
+    op.execute('ANALYZE messages')
+
+
+def downgrade() -> None:
+    # отсоединенные секции не возвращаются: их сообщения остаются в отдельных таблицах
+    op.rename_table('messages', 'messages_partitioned')
+    release_message_names('messages_partitioned')
+
+    op.create_table(
+        'messages',
+        *message_columns(),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk__messages')),
+    )
+    op.execute(f'INSERT INTO messages ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages_partitioned')
+    create_message_indexes()
+    op.execute('ALTER SEQUENCE messages_id_seq OWNED BY messages.id')
+    op.drop_table('messages_partitioned')
+
+    # статусы прочтения сообщений из отсоединенных секций не пройдут проверку внешнего ключа
+    op.execute(
+        'DELETE FROM messages_participants mp WHERE NOT EXISTS (SELECT FROM messages m WHERE m.id = mp.message_id)'
+    )
+    op.create_foreign_key(
+        op.f('fk__messages_participants__message_id__messages'),
+        'messages_participants',
+        'messages',
+        ['message_id'],
+        ['id'],
+    )
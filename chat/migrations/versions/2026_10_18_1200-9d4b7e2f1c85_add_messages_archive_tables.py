@@ -0,0 +1,79 @@
+"""Add messages archive tables and index of deleted messages
+
+Revision ID: 9d4b7e2f1c85
+Revises: 3a8e5d0c6b17
+Create Date: 2026-10-18 12:00:03.517206
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4b7e2f1c85'
+down_revision = '3a8e5d0c6b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'messages_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('dt_created', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('dt_updated', postgresql.TIMESTAMP(timezone=True), nullable=True),
+        sa.Column(
+            'dt_archived',
+            postgresql.TIMESTAMP(timezone=True),
+            server_default=sa.text('CURRENT_TIMESTAMP'),
+            nullable=False,
+        ),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.Column('is_available', sa.Boolean(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk__messages_archive')),
+    )
+    op.create_index(
+        op.f('ix__messages_archive__chat_id_dt_created_id'),
+        'messages_archive',
+        ['chat_id', 'dt_created', 'id'],
+    )
+    op.create_table(
+        'messages_participants_archive',
+        sa.Column('is_read', sa.Boolean(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('chat_id', sa.Integer(), nullable=True),
+        sa.Column('participant_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('message_id', 'participant_id', name=op.f('pk__messages_participants_archive')),
+    )
+
+    # CREATE INDEX CONCURRENTLY не поддерживается для секционированной таблицы:
+    # создаем индекс только на родителе, строим индексы секций без блокировки записи
+    # и присоединяем их - после присоединения всех секций индекс родителя становится валидным
+    op.execute(
+        'CREATE INDEX ix__messages__dt_created_id_unavailable ON ONLY messages (dt_created, id) '
+        'WHERE NOT is_available'
+    )
+    partitions = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'messages'::regclass"
+    )).scalars().all()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_dt_created_id_unavailable_idx '
+                f'ON {partition} (dt_created, id) WHERE NOT is_available'
+            )
+            op.execute(
+                f'ALTER INDEX ix__messages__dt_created_id_unavailable '
+                f'ATTACH PARTITION {partition}_dt_created_id_unavailable_idx'
+            )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix__messages__dt_created_id_unavailable'), table_name='messages')
+    op.drop_table('messages_participants_archive')
+    op.drop_index(op.f('ix__messages_archive__chat_id_dt_created_id'), table_name='messages_archive')
+    op.drop_table('messages_archive')
@@ -0,0 +1,38 @@
+"""Add message_count to chats table
+
+Revision ID: 5b1f0c7e3a42
+Revises: 9d4b7e2f1c85
+Create Date: 2026-10-18 12:30:12.604519
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1f0c7e3a42'
+down_revision = '9d4b7e2f1c85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chats', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    # заполняем счетчики по доступным сообщениям
+    op.execute(
+        """
+        UPDATE chats c
+        SET message_count = m.message_count
+        FROM (
+            SELECT chat_id, count(*) AS message_count
+            FROM messages
+            WHERE is_available
+            GROUP BY chat_id
+        ) m
+        WHERE m.chat_id = c.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('chats', 'message_count')
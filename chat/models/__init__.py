@@ -1,6 +1,7 @@
 from .chat import Chat
 from .chat_participant import ChatParticipant
 from .message import Message
+from .message_archive import MessageArchive, MessagesToParticipantsArchive
 from .messages_participants import MessagesToParticipants
 
 
@@ -8,5 +9,7 @@ __all__ = [
     'Chat',
     'ChatParticipant',
     'Message',
+    'MessageArchive',
     'MessagesToParticipants',
+    'MessagesToParticipantsArchive',
 ]
@@ -44,4 +44,30 @@ class Chat(BaseTable):
         doc='Если is_private=True, то это переписка между 2-мя людьми',
     )
 
-    participants = relationship("ChatParticipant", back_populates="parent", lazy="selectin")
+    last_message_id = sa.Column(
+        sa.Integer,
+        nullable=True,
+        doc='Id последнего доступного сообщения чата',
+    )
+
+    last_message_at = sa.Column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        doc='Дата и время создания последнего доступного сообщения чата (type TIMESTAMP)',
+    )
+
+    message_count = sa.Column(
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+        doc='Количество доступных сообщений чата в таблице messages (денормализовано, для with_total=approx)',
+    )
+
+    # участников в больших чатах тысячи, поэтому они загружаются только явно:
+    # options(selectinload(Chat.participants)); неявная загрузка - ошибка
+    participants = relationship("ChatParticipant", back_populates="parent", lazy="raise")
+
+
+# список чатов пользователя упорядочен по последней активности
+sa.Index('ix__chats__last_message_at', Chat.last_message_at.desc().nulls_last())
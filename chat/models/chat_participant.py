@@ -10,6 +10,15 @@ CHAT_PARTICIPANTS_TABLE_NAME: str = 'chat_participants'
 
 class ChatParticipant(DeclarativeBase):
     __tablename__ = CHAT_PARTICIPANTS_TABLE_NAME
+    __table_args__ = (
+        # чаты пользователя
+        sa.Index(
+            'ix__chat_participants__participant_id_chat_id',
+            'participant_id',
+            'chat_id',
+            postgresql_where=sa.text('is_available'),
+        ),
+    )
 
     is_available = sa.Column(
         sa.Boolean,
@@ -27,3 +36,17 @@ class ChatParticipant(DeclarativeBase):
         nullable=False,
         doc='Идентификатор пользователя',
     )
+
+    unread_count = sa.Column(
+        sa.Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+        doc='Количество непрочитанных пользователем сообщений чата (денормализовано из messages_participants)',
+    )
+
+    last_read_message_id = sa.Column(
+        sa.Integer,
+        nullable=True,
+        doc='Id последнего прочитанного пользователем сообщения чата',
+    )
@@ -1,6 +1,6 @@
 import sqlalchemy as sa
-from sqlalchemy.dialects.postgresql import TIMESTAMP
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy.dialects.postgresql import TIMESTAMP, TSVECTOR
+from sqlalchemy.orm import Mapped, deferred, relationship
 from sqlalchemy.sql import func
 
 from .base import BaseTable
@@ -8,12 +8,50 @@ from .base import BaseTable
 
 MESSAGES_TABLE_NAME: str = 'messages'
 
+# Секция для сообщений, месяц которых не попал ни в одну из помесячных секций
+MESSAGES_DEFAULT_PARTITION_NAME: str = f'{MESSAGES_TABLE_NAME}_default'
+
+# Конфигурация полнотекстового поиска: без стемминга, т.к. сообщения пишут на разных языках
+MESSAGES_SEARCH_CONFIG: str = 'simple'
+
 
 class Message(BaseTable):
     __tablename__ = MESSAGES_TABLE_NAME
+    __table_args__ = (
+        # история сообщений чата и поиск последнего сообщения чата
+        sa.Index('ix__messages__chat_id_dt_created_id', 'chat_id', 'dt_created', 'id'),
+        # сообщения чата после отметки о прочтении
+        sa.Index('ix__messages__chat_id_id', 'chat_id', 'id'),
+        # удаленные сообщения для переноса в архив
+        sa.Index(
+            'ix__messages__dt_created_id_unavailable',
+            'dt_created',
+            'id',
+            postgresql_where=sa.text('NOT is_available'),
+        ),
+        # полнотекстовый поиск по доступным сообщениям
+        sa.Index(
+            'ix__messages__text_search',
+            'text_search',
+            postgresql_using='gin',
+            postgresql_where=sa.text('is_available'),
+        ),
+        # помесячные секции по дате создания, см. commands/manage_partitions.py
+        {'postgresql_partition_by': 'RANGE (dt_created)'},
+    )
+
+    # первичный ключ секционированной таблицы обязан включать ключ секционирования,
+    # уникальность id обеспечивает последовательность
+    id = sa.Column(
+        sa.Integer,
+        primary_key=True,
+        autoincrement=True,
+        doc="Unique index of element",
+    )
 
     dt_created = sa.Column(
         TIMESTAMP(timezone=True),
+        primary_key=True,
         server_default=func.current_timestamp(),
         nullable=False,
         doc="Date and time of create (type TIMESTAMP)",
@@ -30,6 +68,13 @@ class Message(BaseTable):
         doc='Текст сообщения',
     )
 
+    # не загружается вместе с сообщением, нужен только для поиска
+    text_search = deferred(sa.Column(
+        TSVECTOR,
+        sa.Computed(f"to_tsvector('{MESSAGES_SEARCH_CONFIG}', coalesce(text, ''))", persisted=True),
+        doc='Лексемы текста сообщения для полнотекстового поиска',
+    ))
+
     is_available = sa.Column(
         sa.Boolean,
         nullable=False,
@@ -46,4 +91,7 @@ class Message(BaseTable):
         doc='Id чата, в котором отправлено сообщение',
     )
 
-    read_participants: Mapped[list["MessagesToParticipants"]] = relationship()  # noqa
+    read_participants: Mapped[list["MessagesToParticipants"]] = relationship(  # noqa
+        primaryjoin="Message.id == foreign(MessagesToParticipants.message_id)",
+        viewonly=True,
+    )
@@ -0,0 +1,86 @@
+import sqlalchemy as sa
+from db import DeclarativeBase
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.sql import func
+
+
+MESSAGES_ARCHIVE_TABLE_NAME: str = 'messages_archive'
+MESSAGES_PARTICIPANTS_ARCHIVE_TABLE_NAME: str = 'messages_participants_archive'
+
+
+class MessageArchive(DeclarativeBase):
+    """Удаленные и старые сообщения, перенесенные из messages (commands/archive_messages.py)."""
+
+    __tablename__ = MESSAGES_ARCHIVE_TABLE_NAME
+    __table_args__ = (
+        # история архивных сообщений чата
+        sa.Index('ix__messages_archive__chat_id_dt_created_id', 'chat_id', 'dt_created', 'id'),
+    )
+
+    # id сохраняется из messages
+    id = sa.Column(
+        sa.Integer,
+        primary_key=True,
+        autoincrement=False,
+        doc="Unique index of element",
+    )
+
+    dt_created = sa.Column(
+        TIMESTAMP(timezone=True),
+        nullable=False,
+        doc="Date and time of create (type TIMESTAMP)",
+    )
+
+    dt_updated = sa.Column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        doc="Date and time of update (type TIMESTAMP)",
+    )
+
+    dt_archived = sa.Column(
+        TIMESTAMP(timezone=True),
+        server_default=func.current_timestamp(),
+        nullable=False,
+        doc="Date and time of moving to archive (type TIMESTAMP)",
+    )
+
+    text = sa.Column(
+        sa.Text,
+        doc='Текст сообщения',
+    )
+
+    is_available = sa.Column(
+        sa.Boolean,
+        nullable=False,
+        doc='Удалено автором или нет',
+    )
+
+    author_id = sa.Column(
+        sa.Integer,
+    )
+
+    chat_id = sa.Column(
+        sa.Integer,
+        doc='Id чата, в котором отправлено сообщение',
+    )
+
+
+class MessagesToParticipantsArchive(DeclarativeBase):
+    """Статусы прочтения архивных сообщений."""
+
+    __tablename__ = MESSAGES_PARTICIPANTS_ARCHIVE_TABLE_NAME
+
+    is_read = sa.Column(
+        sa.Boolean,
+        nullable=False,
+        doc='Статус прочтения сообщения пользователем',
+    )
+    message_id = sa.Column(sa.Integer, primary_key=True)  # noqa
+    chat_id = sa.Column(sa.Integer)  # noqa
+
+    participant_id = sa.Column(
+        sa.Integer,
+        primary_key=True,
+        nullable=False,
+        doc='Идентификатор пользователя',
+    )
@@ -2,7 +2,6 @@ import sqlalchemy as sa
 from db import DeclarativeBase
 
 from .chat import Chat
-from .message import Message
 
 
 MESSAGES_PARTICIPANTS_TABLE_NAME: str = 'messages_participants'
@@ -10,6 +9,15 @@ MESSAGES_PARTICIPANTS_TABLE_NAME: str = 'messages_participants'
 
 class MessagesToParticipants(DeclarativeBase):
     __tablename__ = MESSAGES_PARTICIPANTS_TABLE_NAME
+    __table_args__ = (
+        # непрочитанные сообщения пользователя в чате
+        sa.Index(
+            'ix__messages_participants__participant_id_chat_id_unread',
+            'participant_id',
+            'chat_id',
+            postgresql_where=sa.text('NOT is_read'),
+        ),
+    )
 
     is_read = sa.Column(
         sa.Boolean,
@@ -17,7 +25,8 @@ class MessagesToParticipants(DeclarativeBase):
         default=False,
         doc='Статус прочтения сообщения пользователем',
     )
-    message_id = sa.Column(sa.ForeignKey(Message.id), primary_key=True)  # noqa
+    # без внешнего ключа: messages секционирована и уникальна только по (id, dt_created)
+    message_id = sa.Column(sa.Integer, primary_key=True)  # noqa
     chat_id = sa.Column(sa.ForeignKey(Chat.id))  # noqa
 
     participant_id = sa.Column(
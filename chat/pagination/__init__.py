@@ -1,6 +1,34 @@
-from .message_param import MessagePaginationParams
+from .chat_param import ChatParticipantsParams
+from .cursor import (
+    decode_cursor,
+    decode_message_cursor,
+    decode_participant_cursor,
+    decode_search_cursor,
+    encode_cursor,
+    encode_message_cursor,
+    encode_participant_cursor,
+    encode_search_cursor,
+)
+from .message_param import (
+    MessageArchiveParams,
+    MessageCursorParams,
+    MessagePaginationParams,
+    MessageSearchParams,
+)
 
 
 __all__ = (
     "MessagePaginationParams",
+    "MessageCursorParams",
+    "MessageSearchParams",
+    "MessageArchiveParams",
+    "ChatParticipantsParams",
+    "encode_cursor",
+    "decode_cursor",
+    "encode_message_cursor",
+    "decode_message_cursor",
+    "encode_search_cursor",
+    "decode_search_cursor",
+    "encode_participant_cursor",
+    "decode_participant_cursor",
 )
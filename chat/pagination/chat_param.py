@@ -0,0 +1,7 @@
+import fastapi as fa
+import pydantic as pd
+
+
+class ChatParticipantsParams(pd.BaseModel):
+    size: int = fa.Query(100, ge=1, le=1000, description="Page size")
+    cursor: str | None = fa.Query(None, description="Cursor of the next page (`next_cursor`)")
@@ -0,0 +1,71 @@
+import base64
+import binascii
+from datetime import datetime
+
+import orjson
+
+
+def encode_cursor(*values) -> str:
+    """Упаковать значения ключа сортировки в непрозрачный для клиента токен."""
+    raw: bytes = orjson.dumps(values)
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> list:
+    """Распаковать токен, созданный `encode_cursor`.
+
+    При битом токене выбрасывается ValueError.
+    """
+    try:
+        raw: bytes = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = orjson.loads(raw)
+    except (binascii.Error, orjson.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def _is_int(value) -> bool:
+    # bool - подкласс int, но true/false из JSON идентификатором не являются
+    return type(value) is int
+
+
+def encode_message_cursor(dt_created: datetime, message_id: int) -> str:
+    return encode_cursor(dt_created.isoformat(), message_id)
+
+
+def decode_message_cursor(token: str) -> tuple[datetime, int]:
+    """Курсор сообщения - это пара (dt_created, id)."""
+    values: list = decode_cursor(token)
+    if len(values) != 2 or not isinstance(values[0], str) or not _is_int(values[1]):
+        raise ValueError("Invalid cursor")
+    dt_created: datetime = datetime.fromisoformat(values[0])
+    # dt_created сравнивается с timestamptz: время без часового пояса неоднозначно
+    if dt_created.tzinfo is None:
+        raise ValueError("Invalid cursor")
+    return dt_created, values[1]
+
+
+def encode_search_cursor(rank: float, message_id: int) -> str:
+    return encode_cursor(rank, message_id)
+
+
+def decode_search_cursor(token: str) -> tuple[float, int]:
+    """Курсор результата поиска - это пара (rank, id)."""
+    values: list = decode_cursor(token)
+    if len(values) != 2 or type(values[0]) not in (int, float) or not _is_int(values[1]):
+        raise ValueError("Invalid cursor")
+    return float(values[0]), values[1]
+
+
+def encode_participant_cursor(participant_id: int) -> str:
+    return encode_cursor(participant_id)
+
+
+def decode_participant_cursor(token: str) -> int:
+    """Курсор участника чата - это его participant_id."""
+    values: list = decode_cursor(token)
+    if len(values) != 1 or not _is_int(values[0]):
+        raise ValueError("Invalid cursor")
+    return values[0]
@@ -1,14 +1,46 @@
 import fastapi as fa
 import pydantic as pd
+from enums import PaginationModes, TotalModes
 from fastapi_pagination.bases import AbstractParams, RawParams
 
 
 class MessagePaginationParams(pd.BaseModel, AbstractParams):
     page: int = fa.Query(1, ge=1, description="Page number")
     size: int = fa.Query(15, ge=1, le=100, description="Page size")
+    with_total: TotalModes = fa.Query(
+        TotalModes.EXACT,
+        description="Total of `total` and `pages`: exact count, approx (chat message counter) or false (no total)",
+    )
 
     def to_raw_params(self) -> RawParams:
         return RawParams(
             limit=self.size,
             offset=self.size * (self.page - 1),
         )
+
+
+class MessageCursorParams(pd.BaseModel):
+    mode: PaginationModes = fa.Query(PaginationModes.PAGE, description="Pagination mode: page/size or cursor")
+    before: str | None = fa.Query(None, description="Cursor: messages older than the cursor (`prev_cursor`)")
+    after: str | None = fa.Query(None, description="Cursor: messages newer than the cursor (`next_cursor`)")
+
+    @property
+    def is_cursor_mode(self) -> bool:
+        return self.mode == PaginationModes.CURSOR or self.before is not None or self.after is not None
+
+
+class MessageSearchParams(pd.BaseModel):
+    q: str = fa.Query(
+        min_length=1,
+        max_length=256,
+        description="Search query (websearch syntax: words, \"phrase\", or, -word)",
+    )
+    chat_id: int | None = fa.Query(None, description="Search only in this chat")
+    size: int = fa.Query(20, ge=1, le=100, description="Page size")
+    cursor: str | None = fa.Query(None, description="Cursor of the next page (`next_cursor`)")
+
+
+class MessageArchiveParams(pd.BaseModel):
+    size: int = fa.Query(15, ge=1, le=100, description="Page size")
+    before: str | None = fa.Query(None, description="Cursor: messages older than the cursor (`prev_cursor`)")
+    after: str | None = fa.Query(None, description="Cursor: messages newer than the cursor (`next_cursor`)")
@@ -0,0 +1,52 @@
+from .connection import ClientConnection, ConnectionMetrics
+from .events import (
+    ACK,
+    CHAT_MEMBERS_ADDED,
+    CHAT_MEMBERS_REMOVED,
+    CHAT_READ,
+    CHAT_UPDATED,
+    MESSAGE_CREATED,
+    RESYNC,
+    encode_event,
+)
+from .frames import Frame
+from .manager import ConnectionManager, websocket_manager
+from .notifier import (
+    handle_event,
+    publish_chat_members_added,
+    publish_chat_members_removed,
+    publish_chat_read,
+    publish_chat_updated,
+    publish_message_created,
+    pubsub,
+    start_pubsub,
+    stop_pubsub,
+)
+from .pubsub import PostgresPubSub
+
+
+__all__ = (
+    "ConnectionManager",
+    "ClientConnection",
+    "ConnectionMetrics",
+    "websocket_manager",
+    "PostgresPubSub",
+    "pubsub",
+    "start_pubsub",
+    "stop_pubsub",
+    "handle_event",
+    "publish_message_created",
+    "publish_chat_members_added",
+    "publish_chat_members_removed",
+    "publish_chat_read",
+    "publish_chat_updated",
+    "MESSAGE_CREATED",
+    "CHAT_MEMBERS_ADDED",
+    "CHAT_MEMBERS_REMOVED",
+    "CHAT_READ",
+    "CHAT_UPDATED",
+    "RESYNC",
+    "ACK",
+    "encode_event",
+    "Frame",
+)
@@ -0,0 +1,117 @@
+import asyncio
+
+import fastapi as fa
+from enums import OverflowPolicies
+from log import get_logger
+
+from .events import RESYNC
+from .frames import Frame
+
+
+logger = get_logger(__name__)
+
+# Сколько ждать отправки подсказки о пересинхронизации медленному клиенту
+EVICTION_SEND_TIMEOUT: float = 1.0
+
+
+class ConnectionMetrics:
+    """Счетчики очередей отправки всех соединений процесса."""
+
+    def __init__(self):
+        self.dropped_frames: int = 0
+        self.evictions: int = 0
+        self.send_errors: int = 0
+
+
+class ClientConnection:
+    """Websocket-соединение клиента с собственной ограниченной очередью отправки.
+
+    Кадры кладутся в очередь без ожидания, а отправляет их отдельная задача-писатель,
+    поэтому медленный клиент не задерживает рассылку остальным.
+    При переполнении очереди применяется overflow_policy.
+    """
+
+    def __init__(
+            self,
+            user_id: int,
+            websocket: fa.WebSocket,
+            queue_size: int,
+            overflow_policy: OverflowPolicies,
+            metrics: ConnectionMetrics,
+            binary_frames: bool = False,
+    ):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.overflow_policy = overflow_policy
+        self.metrics = metrics
+        self.binary_frames = binary_frames
+        self.queue: asyncio.Queue[Frame] = asyncio.Queue(maxsize=queue_size)
+        self.is_closed: bool = False
+        self._writer: asyncio.Task | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def start(self):
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, frame: Frame):
+        """Поставить кадр в очередь отправки (без ожидания)."""
+        if self.is_closed:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            if self.overflow_policy == OverflowPolicies.DROP_OLDEST:
+                self.queue.get_nowait()
+                self.queue.put_nowait(frame)
+                self.metrics.dropped_frames += 1
+            else:
+                self.evict()
+
+    def evict(self):
+        """Отключить медленного клиента: очередь сбрасывается, клиенту отправляется подсказка resync."""
+        self.is_closed = True
+        self.metrics.evictions += 1
+        logger.debug(f"Evict slow websocket consumer of user {self.user_id}")
+        if self._writer is not None:
+            self._writer.cancel()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self._writer = asyncio.create_task(self._close_with_resync())
+
+    async def close(self):
+        self.is_closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+
+    async def _write(self):
+        try:
+            while True:
+                frame: Frame = await self.queue.get()
+                await self._send_frame(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # noqa
+            # соединение уже закрыто: его уберет из реестра обработчик websocket-а
+            self.is_closed = True
+            self.metrics.send_errors += 1
+            logger.debug(f"Failed to send websocket message: {e}")
+
+    async def _send_frame(self, frame: Frame):
+        if self.binary_frames:
+            # буфер кадра уходит в сокет без перекодирования
+            await self.websocket.send_bytes(frame.payload)
+        else:
+            await self.websocket.send_text(frame.text)
+
+    async def _close_with_resync(self):
+        try:
+            await asyncio.wait_for(
+                self._send_frame(Frame.from_event(RESYNC, {"reason": "slow_consumer"})),
+                EVICTION_SEND_TIMEOUT,
+            )
+            await self.websocket.close(code=fa.status.WS_1013_TRY_AGAIN_LATER)
+        except Exception as e:  # noqa
+            logger.debug(f"Failed to close slow websocket consumer: {e}")
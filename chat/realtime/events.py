@@ -0,0 +1,21 @@
+import orjson
+
+
+# Типы событий, отправляемых клиентам по websocket
+MESSAGE_CREATED: str = "message.created"
+# Результат команды, присланной клиентом по websocket
+ACK: str = "ack"
+# Клиент отключен из-за переполнения очереди отправки и должен заново загрузить состояние
+RESYNC: str = "resync"
+
+# Служебные события межпроцессной шины
+CHAT_MEMBERS_ADDED: str = "chat.members_added"
+CHAT_MEMBERS_REMOVED: str = "chat.members_removed"
+CHAT_READ: str = "chat.read"
+# изменение чата или его сообщений, которое нельзя применить к кешам точечно
+CHAT_UPDATED: str = "chat.updated"
+
+
+def encode_event(event_type: str, data: dict) -> str:
+    """Сериализовать событие в текстовый websocket-кадр."""
+    return orjson.dumps({"type": event_type, "data": data}).decode()
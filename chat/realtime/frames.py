@@ -0,0 +1,40 @@
+from functools import cached_property
+
+import orjson
+from schemas import MessageResponseItem
+
+from .events import MESSAGE_CREATED
+
+
+class Frame:
+    """Websocket-кадр, сериализованный один раз.
+
+    Один и тот же буфер ставится в очереди всех получателей,
+    поэтому стоимость сериализации не зависит от их числа.
+    """
+
+    def __init__(self, payload: bytes):
+        self.payload: bytes = payload
+
+    @classmethod
+    def from_event(cls, event_type: str, data: dict) -> "Frame":
+        return cls(orjson.dumps({"type": event_type, "data": data}))
+
+    @classmethod
+    def from_message(cls, message: MessageResponseItem) -> "Frame":
+        return cls.from_event(MESSAGE_CREATED, message.dict())
+
+    @classmethod
+    def from_text(cls, text: str) -> "Frame":
+        """Кадр из уже сериализованного события (например, полученного из шины)."""
+        frame = cls(text.encode())
+        frame.__dict__["text"] = text
+        return frame
+
+    @cached_property
+    def text(self) -> str:
+        """Текстовое представление кадра, декодируется один раз на всех получателей."""
+        return self.payload.decode()
+
+    def __len__(self) -> int:
+        return len(self.payload)
@@ -0,0 +1,117 @@
+from collections import defaultdict
+from typing import Iterable
+
+import fastapi as fa
+from schemas import MessageResponseItem
+from settings import SETTINGS
+
+from .connection import ClientConnection, ConnectionMetrics
+from .frames import Frame
+
+
+class ConnectionManager:
+    """Реестр websocket-соединений текущего процесса.
+
+    У пользователя может быть несколько соединений (несколько устройств).
+    Для рассылки по чату хранится индекс chat_id -> онлайн-участники,
+    поэтому рассылка не перебирает все соединения процесса.
+    Каждое соединение отправляет кадры из своей очереди, поэтому рассылка не ждет медленных клиентов.
+    """
+
+    def __init__(self):
+        self.active_connections: dict[int, set[ClientConnection]] = defaultdict(set)
+        # chat_id -> id онлайн-участников чата
+        self.chat_members: dict[int, set[int]] = defaultdict(set)
+        # user_id -> id чатов онлайн-пользователя
+        self.user_chats: dict[int, set[int]] = defaultdict(set)
+        self.connection_metrics = ConnectionMetrics()
+
+    async def connect(self, user_id: int, websocket: fa.WebSocket, chat_ids: Iterable[int]) -> ClientConnection:
+        await websocket.accept()
+        connection = ClientConnection(
+            user_id=user_id,
+            websocket=websocket,
+            queue_size=SETTINGS.CHAT_WS_SEND_QUEUE_SIZE,
+            overflow_policy=SETTINGS.CHAT_WS_OVERFLOW_POLICY,
+            metrics=self.connection_metrics,
+            binary_frames=SETTINGS.CHAT_WS_BINARY_FRAMES,
+        )
+        connection.start()
+        self.active_connections[user_id].add(connection)
+        for chat_id in chat_ids:
+            self.chat_members[chat_id].add(user_id)
+            self.user_chats[user_id].add(chat_id)
+        return connection
+
+    async def disconnect(self, connection: ClientConnection):
+        await connection.close()
+        user_id: int = connection.user_id
+        connections: set[ClientConnection] | None = self.active_connections.get(user_id)
+        if connections is None:
+            return
+        connections.discard(connection)
+        if connections:
+            return
+
+        # последнее соединение пользователя закрыто - убираем его из индекса чатов
+        del self.active_connections[user_id]
+        for chat_id in self.user_chats.pop(user_id, ()):
+            self._discard_chat_member(chat_id, user_id)
+
+    def add_chat_members(self, chat_id: int, participant_ids: Iterable[int]):
+        """Добавить в индекс чата новых участников, которые сейчас онлайн."""
+        for participant_id in participant_ids:
+            if participant_id in self.active_connections:
+                self.chat_members[chat_id].add(participant_id)
+                self.user_chats[participant_id].add(chat_id)
+
+    def remove_chat_members(self, chat_id: int, participant_ids: Iterable[int]):
+        for participant_id in participant_ids:
+            self._discard_chat_member(chat_id, participant_id)
+            chats: set[int] | None = self.user_chats.get(participant_id)
+            if chats is not None:
+                chats.discard(chat_id)
+
+    def _discard_chat_member(self, chat_id: int, user_id: int):
+        members: set[int] | None = self.chat_members.get(chat_id)
+        if members is None:
+            return
+        members.discard(user_id)
+        if not members:
+            del self.chat_members[chat_id]
+
+    def send_personal_message(self, frame: Frame, connection: ClientConnection):
+        connection.send(frame)
+
+    async def broadcast(self, chat_id: int, frame: Frame):
+        """Поставить кадр в очереди всех соединений онлайн-участников чата.
+
+        Кадр сериализован заранее: все получатели разделяют один и тот же буфер.
+        """
+        for user_id in self.chat_members.get(chat_id, ()):
+            for connection in self.active_connections.get(user_id, ()):
+                connection.send(frame)
+
+    def metrics(self) -> dict:
+        """Снимок метрик соединений процесса."""
+        depths: list[int] = [
+            connection.queue_depth
+            for connections in self.active_connections.values()
+            for connection in connections
+        ]
+        return {
+            "connections": len(depths),
+            "online_users": len(self.active_connections),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_frames": self.connection_metrics.dropped_frames,
+            "evictions": self.connection_metrics.evictions,
+            "send_errors": self.connection_metrics.send_errors,
+        }
+
+    async def broadcast_message(self, message: MessageResponseItem):
+        """Доставить новое сообщение онлайн-участникам его чата."""
+        await self.broadcast(message.chat_id, Frame.from_message(message))
+
+
+websocket_manager = ConnectionManager()
@@ -0,0 +1,113 @@
+import asyncpg
+import orjson
+from cache import chat_list_cache, invalidate_chat_members
+from crud import MessageCRUD
+from db.db import MyDatabase
+from log import get_logger
+from schemas import MessageResponseItem
+from settings import SETTINGS
+
+from .events import (
+    CHAT_MEMBERS_ADDED,
+    CHAT_MEMBERS_REMOVED,
+    CHAT_READ,
+    CHAT_UPDATED,
+    MESSAGE_CREATED,
+    encode_event,
+)
+from .frames import Frame
+from .manager import websocket_manager
+from .pubsub import NOTIFY_PAYLOAD_LIMIT, PostgresPubSub
+
+
+logger = get_logger(__name__)
+
+# LISTEN не работает через PgBouncer в режиме transaction, поэтому соединение шины - прямое
+pubsub = PostgresPubSub(SETTINGS.get_direct_database_uri(), SETTINGS.CHAT_PUBSUB_CHANNEL)
+
+
+async def start_pubsub():
+    if SETTINGS.CHAT_PUBSUB_ENABLED:
+        await pubsub.start(handle_event)
+
+
+async def stop_pubsub():
+    await pubsub.stop()
+
+
+async def publish_event(payload: str):
+    """Опубликовать событие для всех процессов.
+
+    Если шина не запущена, то событие обрабатывается только в текущем процессе.
+    """
+    if pubsub.is_running:
+        try:
+            await pubsub.publish(payload)
+            return
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            logger.error(f"Failed to publish event, deliver it locally: {e}")
+    await handle_event(payload)
+
+
+async def publish_message_created(message: MessageResponseItem):
+    payload: str = encode_event(MESSAGE_CREATED, message.dict())
+    if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+        # большое сообщение не влезает в NOTIFY: передаем только id,
+        # получатели загрузят сообщение из базы
+        payload = orjson.dumps({"type": MESSAGE_CREATED, "id": message.id, "chat_id": message.chat_id}).decode()
+    await publish_event(payload)
+
+
+async def publish_chat_members_added(chat_id: int, participant_ids: list[int]):
+    await publish_event(encode_event(CHAT_MEMBERS_ADDED, {"chat_id": chat_id, "participant_ids": participant_ids}))
+
+
+async def publish_chat_members_removed(chat_id: int, participant_ids: list[int]):
+    await publish_event(encode_event(CHAT_MEMBERS_REMOVED, {"chat_id": chat_id, "participant_ids": participant_ids}))
+
+
+async def publish_chat_read(chat_id: int, participant_id: int, unread_count: int):
+    await publish_event(encode_event(
+        CHAT_READ,
+        {"chat_id": chat_id, "participant_id": participant_id, "unread_count": unread_count},
+    ))
+
+
+async def publish_chat_updated(chat_id: int):
+    await publish_event(encode_event(CHAT_UPDATED, {"chat_id": chat_id}))
+
+
+async def handle_event(payload: str):
+    """Передать событие шины локальному ConnectionManager."""
+    event: dict = orjson.loads(payload)
+    event_type: str | None = event.get("type")
+
+    if event_type == MESSAGE_CREATED:
+        if "data" in event:
+            chat_list_cache.apply_message(event["data"])
+            # событие уже в формате websocket-кадра - пересылаем как есть
+            await websocket_manager.broadcast(event["data"]["chat_id"], Frame.from_text(payload))
+            return
+        chat_list_cache.invalidate_chat(event["chat_id"])
+        if not websocket_manager.chat_members.get(event["chat_id"]):
+            return
+        MyDatabase.init()
+        async with MyDatabase.async_session() as db:
+            message: MessageResponseItem | None = await MessageCRUD.get_message_by_id(db, event["id"])
+        if message is not None:
+            await websocket_manager.broadcast_message(message)
+    elif event_type == CHAT_MEMBERS_ADDED:
+        # состав чата изменился в другом процессе - сбрасываем кеш участников
+        invalidate_chat_members(event["data"]["chat_id"])
+        chat_list_cache.invalidate_users(event["data"]["participant_ids"])
+        websocket_manager.add_chat_members(event["data"]["chat_id"], event["data"]["participant_ids"])
+    elif event_type == CHAT_MEMBERS_REMOVED:
+        invalidate_chat_members(event["data"]["chat_id"])
+        chat_list_cache.invalidate_users(event["data"]["participant_ids"])
+        websocket_manager.remove_chat_members(event["data"]["chat_id"], event["data"]["participant_ids"])
+    elif event_type == CHAT_READ:
+        chat_list_cache.apply_read(**event["data"])
+    elif event_type == CHAT_UPDATED:
+        chat_list_cache.invalidate_chat(event["data"]["chat_id"])
+    else:
+        logger.error(f"Unknown event type: {event_type}")
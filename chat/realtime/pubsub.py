@@ -0,0 +1,88 @@
+import asyncio
+from typing import Awaitable, Callable
+
+import asyncpg
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+# Максимальный размер payload NOTIFY в postgres - 8000 байт
+NOTIFY_PAYLOAD_LIMIT: int = 7999
+
+RECONNECT_DELAY: int = 3
+
+
+class PostgresPubSub:
+    """Межпроцессная шина событий на postgres LISTEN/NOTIFY.
+
+    Каждый процесс держит одно выделенное соединение: на нем выполняется LISTEN
+    и через него же публикуются события. Postgres доставляет NOTIFY всем
+    подписчикам канала, в том числе и самому отправителю.
+    """
+
+    def __init__(self, dsn: str, channel: str):
+        self.dsn = dsn
+        self.channel = channel
+        self.connection: asyncpg.Connection | None = None
+        self.handler: Callable[[str], Awaitable[None]] | None = None
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._closing: bool = False
+
+    @property
+    def is_running(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed()
+
+    async def start(self, handler: Callable[[str], Awaitable[None]]):
+        """Подписаться на канал. handler вызывается для каждого полученного payload."""
+        self.handler = handler
+        self._closing = False
+        await self._connect()
+
+    async def stop(self):
+        self._closing = True
+        if self.connection is not None:
+            await self.connection.close()
+            self.connection = None
+
+    async def publish(self, payload: str):
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            raise ValueError("Payload is too big for NOTIFY")
+        async with self._lock:
+            await self.connection.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+
+    async def _connect(self):
+        self.connection = await asyncpg.connect(self.dsn)
+        self.connection.add_termination_listener(self._on_termination)
+        await self.connection.add_listener(self.channel, self._on_notification)
+        logger.debug(f"Listening to `{self.channel}` channel")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        task = asyncio.create_task(self._handle(payload))
+        # храним ссылку на задачу, чтобы ее не собрал сборщик мусора
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle(self, payload: str):
+        try:
+            await self.handler(payload)
+        except Exception as e:  # noqa
+            logger.error(f"Failed to handle event: {e}")
+
+    def _on_termination(self, connection):
+        if self._closing:
+            return
+        logger.error("Pub/sub connection is lost, reconnecting...")
+        self.connection = None
+        task = asyncio.create_task(self._reconnect())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _reconnect(self):
+        while not self._closing and not self.is_running:
+            try:
+                await self._connect()
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.error(f"{e}. Try to reconnect in {RECONNECT_DELAY}s...")
+                await asyncio.sleep(RECONNECT_DELAY)
@@ -1,20 +1,72 @@
 from .chats import (
+    ChatParticipantItem,
+    ChatParticipantsPage,
     ChatResponseItem,
     CreateChatRequestSchema,
     FullChatResponseItem,
     GetChatsResponseItem,
+    GetFullChatResponse,
     UpdateChatRequestSchema,
 )
-from .messages import CreateMessageRequestSchema, MessageResponseItem, UpdateMessageRequestSchema
+from .messages import (
+    CreateMessageRequestSchema,
+    CreateMessagesBatchRequestSchema,
+    MessageBatchResultItem,
+    MessageCursorPage,
+    MessageReadersResponseItem,
+    MessageResponseItem,
+    MessagesBatchResponseItem,
+    MessageSearchPage,
+    MessageSearchResultItem,
+    ReadMessagesRequestSchema,
+    ReadMessagesResponseItem,
+    UpdateMessageRequestSchema,
+)
+from .metrics import (
+    CacheMetricsResponseItem,
+    CacheStatsResponseItem,
+    ChatListCacheStatsResponseItem,
+    WebsocketMetricsResponseItem,
+)
+from .websocket import (
+    DeleteMessageCommand,
+    EditMessageCommand,
+    MarkReadCommand,
+    SendMessageCommand,
+    WebsocketAck,
+    WebsocketCommandFrame,
+)
 
 
 __all__ = (
     "MessageResponseItem",
+    "MessageCursorPage",
+    "MessageSearchResultItem",
+    "MessageSearchPage",
     "CreateMessageRequestSchema",
+    "CreateMessagesBatchRequestSchema",
+    "MessageBatchResultItem",
+    "MessagesBatchResponseItem",
     "UpdateMessageRequestSchema",
+    "ReadMessagesRequestSchema",
+    "ReadMessagesResponseItem",
+    "MessageReadersResponseItem",
     "ChatResponseItem",
     "GetChatsResponseItem",
     "FullChatResponseItem",
+    "GetFullChatResponse",
+    "ChatParticipantItem",
+    "ChatParticipantsPage",
     "CreateChatRequestSchema",
     "UpdateChatRequestSchema",
+    "WebsocketMetricsResponseItem",
+    "CacheStatsResponseItem",
+    "ChatListCacheStatsResponseItem",
+    "CacheMetricsResponseItem",
+    "SendMessageCommand",
+    "EditMessageCommand",
+    "DeleteMessageCommand",
+    "MarkReadCommand",
+    "WebsocketCommandFrame",
+    "WebsocketAck",
 )
@@ -1,11 +1,21 @@
 from .request import CreateChatRequestSchema, UpdateChatRequestSchema
-from .response import ChatResponseItem, FullChatResponseItem, GetChatsResponseItem
+from .response import (
+    ChatParticipantItem,
+    ChatParticipantsPage,
+    ChatResponseItem,
+    FullChatResponseItem,
+    GetChatsResponseItem,
+    GetFullChatResponse,
+)
 
 
 __all__ = (
     "ChatResponseItem",
     "GetChatsResponseItem",
     "FullChatResponseItem",
+    "GetFullChatResponse",
+    "ChatParticipantItem",
+    "ChatParticipantsPage",
     "CreateChatRequestSchema",
     "UpdateChatRequestSchema",
 )
@@ -37,8 +37,21 @@ class FullChatResponseItem(pd.BaseModel):
     dt_updated: datetime | str
     name: str | None
     is_private: bool
-    participants: list[ChatParticipantItem]
+    last_message_id: int | None
+    last_message_at: datetime | str | None
+    participant_count: int = pd.Field(description="Количество участников чата")
+    participants: list[ChatParticipantItem] | None = pd.Field(
+        default=None,
+        description="Все участники чата, только с include_participants=true; "
+                    "для больших чатов - GET /chats/{chat_id}/participants",
+    )
 
 
 class GetFullChatResponse(pd.BaseModel):
     chat: FullChatResponseItem
+
+
+class ChatParticipantsPage(pd.BaseModel):
+    items: list[ChatParticipantItem]
+    size: int
+    next_cursor: str | None = pd.Field(description="Курсор следующей страницы участников")
@@ -1,9 +1,32 @@
-from .request import CreateMessageRequestSchema, UpdateMessageRequestSchema
-from .response import MessageResponseItem
+from .request import (
+    CreateMessageRequestSchema,
+    CreateMessagesBatchRequestSchema,
+    ReadMessagesRequestSchema,
+    UpdateMessageRequestSchema,
+)
+from .response import (
+    MessageBatchResultItem,
+    MessageCursorPage,
+    MessageReadersResponseItem,
+    MessageResponseItem,
+    MessagesBatchResponseItem,
+    MessageSearchPage,
+    MessageSearchResultItem,
+    ReadMessagesResponseItem,
+)
 
 
 __all__ = (
     "MessageResponseItem",
+    "MessageCursorPage",
+    "MessageSearchResultItem",
+    "MessageSearchPage",
     "CreateMessageRequestSchema",
+    "CreateMessagesBatchRequestSchema",
+    "MessageBatchResultItem",
+    "MessagesBatchResponseItem",
     "UpdateMessageRequestSchema",
+    "ReadMessagesRequestSchema",
+    "ReadMessagesResponseItem",
+    "MessageReadersResponseItem",
 )
@@ -18,5 +18,19 @@ class CreateMessageRequestSchema(pd.BaseModel):
         return values
 
 
+class CreateMessagesBatchRequestSchema(pd.BaseModel):
+    messages: list[CreateMessageRequestSchema] = pd.Field(
+        min_items=1,
+        description="Сообщения в порядке отправки (не больше CHAT_MESSAGES_BATCH_MAX_SIZE)",
+    )
+
+
 class UpdateMessageRequestSchema(pd.BaseModel):
     text: str
+
+
+class ReadMessagesRequestSchema(pd.BaseModel):
+    message_id: int | None = pd.Field(
+        default=None,
+        description="Id последнего прочитанного сообщения. Если не указан, прочитанными считаются все сообщения чата",
+    )
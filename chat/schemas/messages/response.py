@@ -11,3 +11,43 @@ class MessageResponseItem(pd.BaseModel):
     is_available: bool
     author_id: int
     chat_id: int
+
+
+class MessageCursorPage(pd.BaseModel):
+    items: list[MessageResponseItem]
+    size: int
+    prev_cursor: str | None = pd.Field(description="Курсор для получения более старых сообщений (`before`)")
+    next_cursor: str | None = pd.Field(description="Курсор для получения более новых сообщений (`after`)")
+
+
+class MessageSearchResultItem(MessageResponseItem):
+    rank: float = pd.Field(description="Релевантность сообщения запросу")
+    snippet: str = pd.Field(description="Фрагменты текста, найденные слова выделены <b>...</b>")
+
+
+class MessageSearchPage(pd.BaseModel):
+    items: list[MessageSearchResultItem]
+    size: int
+    next_cursor: str | None = pd.Field(description="Курсор следующей (менее релевантной) страницы")
+
+
+class ReadMessagesResponseItem(pd.BaseModel):
+    chat_id: int
+    unread_count: int
+
+
+class MessageReadersResponseItem(pd.BaseModel):
+    message_id: int
+    participant_ids: list[int]
+
+
+class MessageBatchResultItem(pd.BaseModel):
+    index: int = pd.Field(description="Позиция сообщения в запросе")
+    message: MessageResponseItem | None = pd.Field(description="Созданное сообщение (если нет ошибки)")
+    error: str | None = pd.Field(description="Почему сообщение не создано")
+
+
+class MessagesBatchResponseItem(pd.BaseModel):
+    created: int
+    failed: int
+    items: list[MessageBatchResultItem] = pd.Field(description="Результаты в порядке сообщений запроса")
@@ -0,0 +1,14 @@
+from .response import (
+    CacheMetricsResponseItem,
+    CacheStatsResponseItem,
+    ChatListCacheStatsResponseItem,
+    WebsocketMetricsResponseItem,
+)
+
+
+__all__ = (
+    "WebsocketMetricsResponseItem",
+    "CacheStatsResponseItem",
+    "ChatListCacheStatsResponseItem",
+    "CacheMetricsResponseItem",
+)
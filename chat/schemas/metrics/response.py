@@ -0,0 +1,39 @@
+import pydantic as pd
+
+
+class WebsocketMetricsResponseItem(pd.BaseModel):
+    connections: int
+    online_users: int
+    queued_frames: int = pd.Field(description="Суммарная глубина очередей отправки")
+    max_queue_depth: int
+    dropped_frames: int = pd.Field(description="Кадры, вытесненные из переполненных очередей (DROP_OLDEST)")
+    evictions: int = pd.Field(description="Медленные клиенты, отключенные с подсказкой resync (DISCONNECT)")
+    send_errors: int
+
+
+class CacheStatsResponseItem(pd.BaseModel):
+    size: int
+    maxsize: int
+    ttl: float = pd.Field(description="Время жизни записи, секунды")
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class ChatListCacheStatsResponseItem(pd.BaseModel):
+    users: int
+    size_bytes: int
+    max_bytes: int
+    ttl: float = pd.Field(description="Время жизни записи, секунды")
+    hits: int
+    misses: int
+    hit_ratio: float
+    evictions: int
+    invalidations: int
+
+
+class CacheMetricsResponseItem(pd.BaseModel):
+    membership: CacheStatsResponseItem
+    chat_list: ChatListCacheStatsResponseItem
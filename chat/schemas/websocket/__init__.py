@@ -0,0 +1,18 @@
+from .request import (
+    DeleteMessageCommand,
+    EditMessageCommand,
+    MarkReadCommand,
+    SendMessageCommand,
+    WebsocketCommandFrame,
+)
+from .response import WebsocketAck
+
+
+__all__ = (
+    "SendMessageCommand",
+    "EditMessageCommand",
+    "DeleteMessageCommand",
+    "MarkReadCommand",
+    "WebsocketCommandFrame",
+    "WebsocketAck",
+)
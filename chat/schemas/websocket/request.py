@@ -0,0 +1,45 @@
+from typing import Literal, Union
+
+import pydantic as pd
+
+
+class WebsocketCommand(pd.BaseModel):
+    client_id: str = pd.Field(max_length=64, description="Id команды, сгенерированный клиентом; возвращается в ack")
+
+
+class SendMessageCommand(WebsocketCommand):
+    type: Literal["send"]
+    chat_id: int | None = pd.Field(description="Id чата на несколько человек (если уже создан)")
+    dest_id: int | None = pd.Field(description="Id пользователя для первого сообщения в личной переписке")
+    text: str
+
+
+class EditMessageCommand(WebsocketCommand):
+    type: Literal["edit"]
+    message_id: int
+    text: str
+
+
+class DeleteMessageCommand(WebsocketCommand):
+    type: Literal["delete"]
+    message_id: int
+
+
+class MarkReadCommand(WebsocketCommand):
+    type: Literal["mark_read"]
+    chat_id: int
+    message_id: int | None = pd.Field(
+        default=None,
+        description="Id последнего прочитанного сообщения. Если не указан, прочитанными считаются все сообщения чата",
+    )
+
+
+class WebsocketCommandFrame(pd.BaseModel):
+    """Входящий websocket-кадр клиента, тип команды определяется полем type."""
+
+    __root__: Union[
+        SendMessageCommand,
+        EditMessageCommand,
+        DeleteMessageCommand,
+        MarkReadCommand,
+    ] = pd.Field(discriminator="type")
@@ -0,0 +1,8 @@
+import pydantic as pd
+
+
+class WebsocketAck(pd.BaseModel):
+    client_id: str | None = pd.Field(description="Id команды клиента (None, если кадр не удалось разобрать)")
+    ok: bool
+    data: dict | None = pd.Field(description="Результат команды (формат как у ответа соответствующего HTTP-метода)")
+    error: str | None
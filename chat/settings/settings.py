@@ -2,7 +2,7 @@ from functools import lru_cache
 
 import pydantic as pd
 from dotenv import load_dotenv
-from enums import Stages
+from enums import OverflowPolicies, ReadStatusModes, Stages
 from log import get_logger
 
 
@@ -26,6 +26,74 @@ class Settings(pd.BaseSettings):
     CHAT_POSTGRES_PASSWORD: str | None
     CHAT_POSTGRES_HOST: str | None
     CHAT_POSTGRES_PORT: int = 5432
+    # Прямое подключение к postgres для LISTEN/NOTIFY, если основное идет через PgBouncer;
+    # None - основной хост и порт
+    CHAT_POSTGRES_DIRECT_HOST: str | None = None
+    CHAT_POSTGRES_DIRECT_PORT: int | None = None
+
+    # Кеши запросов
+    # скомпилированных SQLAlchemy запросов на процесс (query_cache_size); 0 - не кешировать
+    CHAT_POSTGRES_QUERY_CACHE_SIZE: int = 500
+    # подготовленных asyncpg запросов на соединение (prepared_statement_cache_size); 0 - не кешировать
+    CHAT_POSTGRES_STATEMENT_CACHE_SIZE: int = 100
+    # Подключение через PgBouncer в режиме pool_mode=transaction: серверное соединение меняется
+    # между транзакциями, поэтому подготовленные запросы не кешируются, получают уникальные имена,
+    # а пул соединений держит PgBouncer (NullPool)
+    CHAT_POSTGRES_PGBOUNCER: bool = False
+
+    # Способ хранения статусов прочтения сообщений
+    CHAT_READ_STATUS_MODE: ReadStatusModes = ReadStatusModes.ROWS
+
+    # Максимальное количество сообщений в POST /messages/batch
+    CHAT_MESSAGES_BATCH_MAX_SIZE: int = 100
+
+    # Строк, читаемых из серверного курсора за раз при выгрузке истории чата
+    CHAT_EXPORT_BATCH_SIZE: int = 2000
+
+    # Строк в одном COPY при импорте истории (commands/import_history.py)
+    CHAT_IMPORT_BATCH_SIZE: int = 10_000
+
+    # Групповая запись новых сообщений: одна транзакция на пачку сообщений
+    CHAT_GROUP_COMMIT_ENABLED: bool = False
+    # сколько ждать остальные сообщения пачки после первого, миллисекунды
+    CHAT_GROUP_COMMIT_INTERVAL_MS: float = 5.0
+    CHAT_GROUP_COMMIT_MAX_BATCH: int = 200
+
+    # Помесячные секции таблицы messages (commands/manage_partitions.py)
+    # на сколько месяцев вперед создавать секции
+    CHAT_MESSAGES_PARTITIONS_AHEAD: int = 3
+    # сколько месяцев, включая текущий, хранить в таблице; более старые секции отсоединяются.
+    # None - не отсоединять
+    CHAT_MESSAGES_PARTITIONS_RETAIN_MONTHS: int | None = None
+
+    # Перенос удаленных и старых сообщений в архив (commands/archive_messages.py)
+    # сообщения старше стольких дней переносятся в архив; None - переносятся только удаленные
+    CHAT_MESSAGES_ARCHIVE_AFTER_DAYS: int | None = None
+    # сообщений в одной транзакции переноса
+    CHAT_MESSAGES_ARCHIVE_BATCH_SIZE: int = 500
+
+    # Межпроцессная доставка событий через postgres LISTEN/NOTIFY
+    CHAT_PUBSUB_ENABLED: bool = True
+    CHAT_PUBSUB_CHANNEL: str = "chat_events"
+
+    # Очередь отправки каждого websocket-соединения
+    CHAT_WS_SEND_QUEUE_SIZE: int = 256
+    CHAT_WS_OVERFLOW_POLICY: OverflowPolicies = OverflowPolicies.DROP_OLDEST
+    # Отправлять события бинарными кадрами (буфер orjson без перекодирования в текст)
+    CHAT_WS_BINARY_FRAMES: bool = False
+
+    # Кеш участников чатов для проверки членства
+    CHAT_MEMBERSHIP_CACHE_ENABLED: bool = True
+    CHAT_MEMBERSHIP_CACHE_SIZE: int = 10_000
+    # время жизни записи, секунды
+    CHAT_MEMBERSHIP_CACHE_TTL: float = 5.0
+
+    # Кеш ответов GET /chats по пользователям
+    CHAT_LIST_CACHE_ENABLED: bool = True
+    # предел памяти под кеш, байты
+    CHAT_LIST_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # время жизни списка, секунды (страховка от потерянных событий шины)
+    CHAT_LIST_CACHE_TTL: float = 60.0
 
     @pd.validator("CHAT_POSTGRES_DBNAME")
     def validate_chat_postgres_dbname_not_empty(cls, v: str):
@@ -52,6 +120,22 @@ class Settings(pd.BaseSettings):
             "port": self.CHAT_POSTGRES_PORT,
         }
 
+    @property
+    def direct_database_settings(self) -> dict:
+        """
+        Get settings for direct connection with database (bypassing PgBouncer).
+        """
+        return {
+            **self.database_settings,
+            "host": self.CHAT_POSTGRES_DIRECT_HOST or self.CHAT_POSTGRES_HOST,
+            "port": self.CHAT_POSTGRES_DIRECT_PORT or self.CHAT_POSTGRES_PORT,
+        }
+
+    def get_direct_database_uri(self):
+        return "postgresql://{user}:{password}@{host}:{port}/{database}".format(
+            **self.direct_database_settings,
+        )
+
     def get_sync_database_uri(self):
         return "postgresql://{user}:{password}@{host}:{port}/{database}".format(
             **self.database_settings,
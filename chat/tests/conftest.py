@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+
+# Настройки читаются при импорте модулей приложения; тесты с базой пропускаются, если она недоступна
+os.environ.setdefault("CHAT_POSTGRES_DBNAME", "chat")
+os.environ.setdefault("CHAT_POSTGRES_USER", "postgres")
+os.environ.setdefault("CHAT_POSTGRES_PASSWORD", "password")
+os.environ.setdefault("CHAT_POSTGRES_HOST", "localhost")
+
+
+class FakeWebSocket:
+    """Websocket, который запоминает отправленные кадры."""
+
+    def __init__(self):
+        self.sent: list[str | bytes] = []
+        self.close_code: int | None = None
+        self.send_error: Exception | None = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        self._send(text)
+
+    async def send_bytes(self, data: bytes):
+        self._send(data)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+    def _send(self, data: str | bytes):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sent.append(data)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def make_websocket():
+    return FakeWebSocket
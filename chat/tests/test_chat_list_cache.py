@@ -0,0 +1,197 @@
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from cache import ChatListCache
+from cache.chat_list import RECENT_CHANGES_SIZE
+
+
+USER_ID: int = 1
+OTHER_USER_ID: int = 2
+
+
+def make_message(message_id: int, chat_id: int, day: int, author_id: int = OTHER_USER_ID) -> dict:
+    return {
+        "id": message_id,
+        "dt_created": f"2026-10-{day:02d}T12:00:00+00:00",
+        "dt_updated": None,
+        "text": f"message {message_id}",
+        "is_available": True,
+        "author_id": author_id,
+        "chat_id": chat_id,
+    }
+
+
+def make_chat(chat_id: int, last_message: dict | None = None, new_message_count: int | None = 0) -> dict:
+    return {
+        "id": chat_id,
+        "dt_created": "2026-10-01T00:00:00+00:00",
+        "name": f"chat {chat_id}",
+        "is_private": False,
+        "last_message": last_message,
+        "new_message_count": new_message_count,
+    }
+
+
+def chat_ids(body: bytes) -> list[int]:
+    return [chat["id"] for chat in orjson.loads(body)["chats"]]
+
+
+@pytest.fixture
+def cache() -> ChatListCache:
+    return ChatListCache(max_bytes=1024 * 1024, ttl=60.0)
+
+
+def test_set_and_get_sorted_by_last_message(cache):
+    chats: list[dict] = [
+        make_chat(10, make_message(1, 10, day=2)),
+        make_chat(20),
+        make_chat(30, make_message(2, 30, day=5)),
+    ]
+    body: bytes = cache.set(USER_ID, chats, cache.seq)
+
+    assert chat_ids(body) == [30, 10, 20]
+    assert cache.get(USER_ID) == body
+    assert cache.get(OTHER_USER_ID) is None
+
+
+def test_apply_message_updates_last_message_and_unread_count(cache):
+    cache.set(USER_ID, [make_chat(10, make_message(1, 10, day=5)), make_chat(20, make_message(2, 20, day=2))], 0)
+    cache.set(OTHER_USER_ID, [make_chat(20, make_message(2, 20, day=2))], cache.seq)
+
+    message: dict = make_message(3, 20, day=7, author_id=OTHER_USER_ID)
+    cache.apply_message(message)
+
+    chats: list[dict] = orjson.loads(cache.get(USER_ID))["chats"]
+    assert [chat["id"] for chat in chats] == [20, 10]
+    assert chats[0]["last_message"] == message
+    assert chats[0]["new_message_count"] == 1
+    # автору свое сообщение непрочитанным не считается
+    author_chat: dict = orjson.loads(cache.get(OTHER_USER_ID))["chats"][0]
+    assert author_chat["last_message"] == message
+    assert author_chat["new_message_count"] == 0
+
+
+def test_apply_message_skips_message_already_in_list(cache):
+    last_message: dict = make_message(5, 10, day=5)
+    body: bytes = cache.set(USER_ID, [make_chat(10, last_message, new_message_count=1)], cache.seq)
+
+    cache.apply_message(make_message(5, 10, day=5))
+
+    assert cache.get(USER_ID) == body
+
+
+def test_late_older_message_drops_lists_with_stale_unread_count(cache):
+    cache.set(USER_ID, [make_chat(10, make_message(5, 10, day=5), new_message_count=1)], cache.seq)
+    cache.set(OTHER_USER_ID, [make_chat(20)], cache.seq)
+    # старое сообщение закоммичено после загрузки списка: в базе непрочитанных уже 2
+    seq: int = cache.seq
+    cache.apply_message(make_message(4, 10, day=4))
+
+    assert cache.get(USER_ID) is None
+    assert cache.get(OTHER_USER_ID) is not None
+    # список, загруженный до этого сообщения, тоже не сохраняется
+    cache.set(USER_ID, [make_chat(10, make_message(5, 10, day=5), new_message_count=1)], seq)
+    assert cache.get(USER_ID) is None
+
+    body: bytes = cache.set(USER_ID, [make_chat(10, make_message(5, 10, day=5), new_message_count=2)], cache.seq)
+    assert orjson.loads(body)["chats"][0]["new_message_count"] == 2
+    assert cache.get(USER_ID) == body
+
+
+def test_apply_message_keeps_unknown_unread_count(cache):
+    cache.set(USER_ID, [make_chat(10, new_message_count=None)], cache.seq)
+
+    cache.apply_message(make_message(1, 10, day=3))
+
+    chat: dict = orjson.loads(cache.get(USER_ID))["chats"][0]
+    assert chat["last_message"]["id"] == 1
+    assert chat["new_message_count"] is None
+
+
+def test_apply_read_sets_unread_count(cache):
+    cache.set(USER_ID, [make_chat(10, new_message_count=5)], cache.seq)
+
+    cache.apply_read(10, USER_ID, 2)
+
+    assert orjson.loads(cache.get(USER_ID))["chats"][0]["new_message_count"] == 2
+
+
+def test_list_loaded_during_change_of_its_chat_is_not_stored(cache):
+    seq: int = cache.seq
+    cache.apply_message(make_message(1, 10, day=3))
+
+    body: bytes = cache.set(USER_ID, [make_chat(10)], seq)
+
+    assert chat_ids(body) == [10]
+    assert cache.get(USER_ID) is None
+
+
+def test_list_loaded_during_change_of_other_chat_is_stored(cache):
+    seq: int = cache.seq
+    cache.apply_message(make_message(1, 99, day=3))
+    cache.invalidate_users([OTHER_USER_ID])
+
+    cache.set(USER_ID, [make_chat(10)], seq)
+
+    assert cache.get(USER_ID) is not None
+
+
+def test_list_loaded_during_change_of_its_user_is_not_stored(cache):
+    seq: int = cache.seq
+    cache.apply_read(99, USER_ID, 0)
+
+    cache.set(USER_ID, [make_chat(10)], seq)
+
+    assert cache.get(USER_ID) is None
+
+
+def test_list_loaded_during_clear_is_not_stored(cache):
+    seq: int = cache.seq
+    cache.clear()
+
+    cache.set(USER_ID, [make_chat(10)], seq)
+
+    assert cache.get(USER_ID) is None
+
+
+def test_list_is_not_stored_when_changes_are_forgotten(cache):
+    seq: int = cache.seq
+    # изменения только чужих чатов, но журнал их уже не помнит
+    for chat_id in range(1000, 1000 + RECENT_CHANGES_SIZE + 1):
+        cache.invalidate_chat(chat_id)
+
+    cache.set(USER_ID, [make_chat(10)], seq)
+
+    assert cache.get(USER_ID) is None
+
+
+def test_invalidate_chat_drops_lists_of_its_users(cache):
+    cache.set(USER_ID, [make_chat(10), make_chat(20)], cache.seq)
+    cache.set(OTHER_USER_ID, [make_chat(20)], cache.seq)
+
+    cache.invalidate_chat(10)
+
+    assert cache.get(USER_ID) is None
+    assert cache.get(OTHER_USER_ID) is not None
+    assert cache.stats.invalidations == 1
+
+
+def test_least_recently_read_list_is_evicted(cache):
+    body: bytes = cache.set(USER_ID, [make_chat(10)], cache.seq)
+    cache.max_bytes = cache.size * 2 - 1
+    cache.set(OTHER_USER_ID, [make_chat(10)], cache.seq)
+
+    assert cache.get(USER_ID) is None
+    assert cache.get(OTHER_USER_ID) == body
+    assert cache.stats.evictions == 1
+    assert cache.size <= cache.max_bytes
+
+
+def test_list_expires_after_ttl(cache, monkeypatch):
+    cache.set(USER_ID, [make_chat(10)], cache.seq)
+    expires_at: float = cache._users[USER_ID].expires_at
+    monkeypatch.setattr("cache.chat_list.time", SimpleNamespace(monotonic=lambda: expires_at + 1))
+
+    assert cache.get(USER_ID) is None
+    assert len(cache) == 0
@@ -0,0 +1,95 @@
+import asyncio
+
+import fastapi as fa
+import orjson
+import pytest
+from enums import OverflowPolicies
+from realtime import RESYNC, ClientConnection, ConnectionMetrics, Frame
+
+
+pytestmark = pytest.mark.anyio
+
+
+def make_connection(websocket, policy: OverflowPolicies, queue_size: int = 2, **kwargs) -> ClientConnection:
+    return ClientConnection(
+        user_id=1,
+        websocket=websocket,
+        queue_size=queue_size,
+        overflow_policy=policy,
+        metrics=ConnectionMetrics(),
+        **kwargs,
+    )
+
+
+def frames(count: int) -> list[Frame]:
+    return [Frame.from_event("test", {"n": n}) for n in range(count)]
+
+
+async def test_writer_sends_frames_in_order(make_websocket):
+    websocket = make_websocket()
+    connection = make_connection(websocket, OverflowPolicies.DROP_OLDEST, queue_size=10)
+    connection.start()
+    for frame in frames(3):
+        connection.send(frame)
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+
+    assert [orjson.loads(text)["data"]["n"] for text in websocket.sent] == [0, 1, 2]
+    await connection.close()
+
+
+async def test_binary_frames_send_payload(make_websocket):
+    websocket = make_websocket()
+    connection = make_connection(websocket, OverflowPolicies.DROP_OLDEST, binary_frames=True)
+    connection.start()
+    frame, = frames(1)
+    connection.send(frame)
+    await asyncio.sleep(0)
+
+    assert websocket.sent == [frame.payload]
+    await connection.close()
+
+
+async def test_drop_oldest_keeps_newest_frames(make_websocket):
+    websocket = make_websocket()
+    connection = make_connection(websocket, OverflowPolicies.DROP_OLDEST)
+    sent = frames(3)
+    # писатель не запущен: клиент ничего не читает
+    for frame in sent:
+        connection.send(frame)
+
+    assert [connection.queue.get_nowait() for _ in range(connection.queue_depth)] == sent[1:]
+    assert connection.metrics.dropped_frames == 1
+    assert not connection.is_closed
+
+
+async def test_disconnect_evicts_slow_consumer(make_websocket):
+    websocket = make_websocket()
+    connection = make_connection(websocket, OverflowPolicies.DISCONNECT)
+    for frame in frames(3):
+        connection.send(frame)
+
+    assert connection.is_closed
+    assert connection.queue_depth == 0
+    assert connection.metrics.evictions == 1
+    assert connection.metrics.dropped_frames == 0
+
+    await connection._writer
+    assert [orjson.loads(text)["type"] for text in websocket.sent] == [RESYNC]
+    assert websocket.close_code == fa.status.WS_1013_TRY_AGAIN_LATER
+
+    # закрытое соединение больше ничего не принимает
+    connection.send(frames(1)[0])
+    assert connection.queue_depth == 0
+
+
+async def test_send_error_closes_connection(make_websocket):
+    websocket = make_websocket()
+    websocket.send_error = RuntimeError("connection closed")
+    connection = make_connection(websocket, OverflowPolicies.DROP_OLDEST)
+    connection.start()
+    connection.send(frames(1)[0])
+    await connection._writer
+
+    assert connection.is_closed
+    assert connection.metrics.send_errors == 1
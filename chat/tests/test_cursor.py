@@ -0,0 +1,124 @@
+import base64
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+from api.consts import USER_ID_HTTP_HEADER
+from api.deps import get_db
+from main import app
+from pagination import (
+    decode_message_cursor,
+    decode_participant_cursor,
+    decode_search_cursor,
+    encode_cursor,
+    encode_message_cursor,
+    encode_participant_cursor,
+    encode_search_cursor,
+)
+
+
+def raw_token(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+VALID_MESSAGE_CURSOR: str = encode_message_cursor(datetime(2026, 10, 18, 12, 30, tzinfo=timezone.utc), 42)
+
+INVALID_MESSAGE_CURSORS: list[str] = [
+    "",
+    "not a cursor!",
+    VALID_MESSAGE_CURSOR[:-3],
+    raw_token(b"not json"),
+    raw_token(b'{"dt_created": "2026-10-18", "id": 1}'),
+    encode_cursor("2026-10-18T12:30:00+00:00"),
+    encode_cursor("2026-10-18T12:30:00+00:00", 1, 2),
+    encode_cursor("2026-10-18T12:30:00+00:00", "1"),
+    encode_cursor(1, 1),
+    encode_cursor("yesterday", 1),
+    encode_cursor("2026-10-18T12:30:00+00:00", True),
+    encode_cursor("2026-10-18T12:30:00", 1),
+]
+
+
+def test_message_cursor_round_trip():
+    dt_created = datetime(2026, 10, 18, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+    assert decode_message_cursor(encode_message_cursor(dt_created, 42)) == (dt_created, 42)
+
+
+def test_search_cursor_round_trip():
+    assert decode_search_cursor(encode_search_cursor(0.0607927, 42)) == (0.0607927, 42)
+    assert decode_search_cursor(encode_search_cursor(1, 42)) == (1.0, 42)
+
+
+def test_participant_cursor_round_trip():
+    assert decode_participant_cursor(encode_participant_cursor(1_000_000)) == 1_000_000
+
+
+def test_cursor_is_url_safe():
+    token: str = encode_cursor("?&=/+", 2 ** 40)
+
+    assert token.isascii()
+    assert not set(token) & set("+/=")
+
+
+@pytest.mark.parametrize("token", INVALID_MESSAGE_CURSORS)
+def test_invalid_message_cursor(token: str):
+    with pytest.raises(ValueError):
+        decode_message_cursor(token)
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "",
+        "garbage",
+        encode_cursor("0.5", 1),
+        encode_cursor(0.5, 1.5),
+        encode_cursor(0.5),
+        encode_cursor(0.5, False),
+        encode_cursor(True, 1),
+    ],
+)
+def test_invalid_search_cursor(token: str):
+    with pytest.raises(ValueError):
+        decode_search_cursor(token)
+
+
+@pytest.mark.parametrize(
+    "token",
+    ["", "garbage", encode_cursor("1"), encode_cursor(1, 2), encode_cursor(None), encode_cursor(True)],
+)
+def test_invalid_participant_cursor(token: str):
+    with pytest.raises(ValueError):
+        decode_participant_cursor(token)
+
+
+@pytest.fixture
+async def client():
+    async def get_no_db():
+        # курсор проверяется до обращения к базе
+        yield None
+
+    app.dependency_overrides[get_db] = get_no_db
+    transport = httpx.ASGITransport(app=app)  # type: ignore
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/messages/1?before=garbage",
+        "/messages/1?after=garbage",
+        "/messages/1/archive?before=garbage",
+        "/messages/search?q=hello&cursor=garbage",
+        "/chats/1/participants?cursor=garbage",
+    ],
+)
+async def test_endpoint_answers_400_to_invalid_cursor(client, url: str):
+    response = await client.get(url, headers={USER_ID_HTTP_HEADER: "1"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
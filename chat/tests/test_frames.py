@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+from realtime import MESSAGE_CREATED, ConnectionManager, Frame
+from schemas import MessageResponseItem
+
+
+pytestmark = pytest.mark.anyio
+
+
+def make_message(chat_id: int) -> MessageResponseItem:
+    return MessageResponseItem(
+        id=1,
+        dt_created=datetime(2026, 10, 18, tzinfo=timezone.utc),
+        dt_updated=None,
+        text="hello",
+        is_available=True,
+        author_id=100,
+        chat_id=chat_id,
+    )
+
+
+def test_text_is_decoded_once():
+    frame = Frame.from_event("test", {"n": 1})
+
+    assert orjson.loads(frame.payload) == {"type": "test", "data": {"n": 1}}
+    assert frame.text is frame.text
+    assert len(frame) == len(frame.payload)
+
+
+def test_from_text_keeps_text():
+    text: str = '{"type":"test","data":{}}'
+    frame = Frame.from_text(text)
+
+    assert frame.text is text
+    assert frame.payload == text.encode()
+
+
+async def test_broadcast_encodes_message_once(make_websocket, monkeypatch):
+    calls: list = []
+    dumps = orjson.dumps
+
+    def counting_dumps(*args, **kwargs):
+        calls.append(args)
+        return dumps(*args, **kwargs)
+
+    monkeypatch.setattr(orjson, "dumps", counting_dumps)
+    manager = ConnectionManager()
+    websockets = [make_websocket() for _ in range(3)]
+    connections = [
+        await manager.connect(user_id, websocket, [10])
+        for user_id, websocket in enumerate(websockets, start=1)
+    ]
+    outsider = make_websocket()
+    connections.append(await manager.connect(99, outsider, [20]))
+
+    await manager.broadcast_message(make_message(chat_id=10))
+    await asyncio.sleep(0)
+
+    assert len(calls) == 1
+    sent: list = [websocket.sent[0] for websocket in websockets]
+    assert orjson.loads(sent[0])["type"] == MESSAGE_CREATED
+    # все получатели отправляют один и тот же декодированный текст
+    assert all(text is sent[0] for text in sent)
+    assert outsider.sent == []
+    for connection in connections:
+        await manager.disconnect(connection)
@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from crud import GroupCommitWriter
+from schemas import MessageResponseItem
+from sqlalchemy.exc import IntegrityError
+
+
+pytestmark = pytest.mark.anyio
+
+# сообщения в этот чат нарушают внешний ключ
+MISSING_CHAT_ID: int = 404
+
+
+class FakeInsert:
+    """Заменяет GroupCommitWriter._insert: запоминает пачки и выдает id по порядку."""
+
+    def __init__(self):
+        self.batches: list[list[dict]] = []
+        self.last_id: int = 0
+
+    async def __call__(self, values: list[dict]) -> list[MessageResponseItem]:
+        self.batches.append(values)
+        if any(item["chat_id"] == MISSING_CHAT_ID for item in values):
+            raise IntegrityError("INSERT INTO messages", {}, Exception("foreign key violation"))
+        messages: list[MessageResponseItem] = []
+        for item in values:
+            self.last_id += 1
+            messages.append(MessageResponseItem(
+                id=self.last_id,
+                dt_created=datetime.now(timezone.utc),
+                dt_updated=None,
+                is_available=True,
+                **item,
+            ))
+        return messages
+
+
+@pytest.fixture
+def insert() -> FakeInsert:
+    return FakeInsert()
+
+
+def make_writer(insert: FakeInsert, interval_ms: float, max_batch: int) -> GroupCommitWriter:
+    writer = GroupCommitWriter(interval_ms=interval_ms, max_batch=max_batch)
+    writer._insert = insert
+    return writer
+
+
+def send(writer: GroupCommitWriter, text: str, chat_id: int = 1) -> asyncio.Task:
+    return asyncio.create_task(writer.add_message(author_id=7, chat_id=chat_id, text=text))
+
+
+async def test_full_batch_is_written_without_waiting_interval(insert):
+    writer = make_writer(insert, interval_ms=10_000, max_batch=3)
+    await writer.start()
+
+    messages = await asyncio.wait_for(
+        asyncio.gather(*(writer.add_message(author_id=7, chat_id=1, text=str(n)) for n in range(6))),
+        timeout=1.0,
+    )
+
+    assert [len(batch) for batch in insert.batches] == [3, 3]
+    # каждый отправитель получает свое сообщение
+    assert [message.text for message in messages] == [str(n) for n in range(6)]
+    assert (writer.flushes, writer.flushed_messages) == (2, 6)
+    await writer.stop()
+
+
+async def test_partial_batch_is_written_after_interval(insert):
+    writer = make_writer(insert, interval_ms=20, max_batch=100)
+    await writer.start()
+
+    first = await asyncio.gather(send(writer, "a"), send(writer, "b"))
+    second = await send(writer, "c")
+
+    assert [[item["text"] for item in batch] for batch in insert.batches] == [["a", "b"], ["c"]]
+    assert [message.id for message in first] == [1, 2]
+    assert second.id == 3
+    await writer.stop()
+
+
+async def test_failed_batch_is_retried_one_by_one(insert):
+    writer = make_writer(insert, interval_ms=20, max_batch=100)
+    await writer.start()
+
+    results = await asyncio.gather(
+        send(writer, "a"),
+        send(writer, "lost", chat_id=MISSING_CHAT_ID),
+        send(writer, "b"),
+        return_exceptions=True,
+    )
+
+    assert [len(batch) for batch in insert.batches] == [3, 1, 1, 1]
+    assert results[0].text == "a"
+    assert isinstance(results[1], IntegrityError)
+    assert results[2].text == "b"
+    assert writer.flushed_messages == 2
+    await writer.stop()
+
+
+async def test_stop_writes_accepted_messages(insert):
+    writer = make_writer(insert, interval_ms=10_000, max_batch=100)
+    await writer.start()
+    tasks: list[asyncio.Task] = [send(writer, str(n)) for n in range(3)]
+    await asyncio.sleep(0)
+
+    await asyncio.wait_for(writer.stop(), timeout=1.0)
+
+    assert all(task.done() for task in tasks)
+    assert [task.result().text for task in tasks] == ["0", "1", "2"]
+    assert insert.batches == [[{"text": str(n), "author_id": 7, "chat_id": 1} for n in range(3)]]
+    assert not writer.is_running
+
+
+async def test_message_sent_during_stop_is_written_at_once(insert):
+    writer = make_writer(insert, interval_ms=10_000, max_batch=100)
+    await writer.start()
+    accepted: asyncio.Task = send(writer, "accepted")
+    await asyncio.sleep(0)
+
+    stopping: asyncio.Task = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0)
+    # остановка началась: новое сообщение в очередь не попадает
+    assert not writer.is_running
+    late: MessageResponseItem = await asyncio.wait_for(
+        writer.add_message(author_id=7, chat_id=1, text="late"),
+        timeout=1.0,
+    )
+    await asyncio.wait_for(stopping, timeout=1.0)
+
+    assert (await accepted).text == "accepted"
+    assert late.text == "late"
+    assert sorted(len(batch) for batch in insert.batches) == [1, 1]
+    assert writer.queue.empty()
+
+
+async def test_stopped_writer_writes_message_at_once(insert):
+    writer = make_writer(insert, interval_ms=10_000, max_batch=100)
+
+    message: MessageResponseItem = await asyncio.wait_for(
+        writer.add_message(author_id=7, chat_id=1, text="direct"),
+        timeout=1.0,
+    )
+
+    assert message.text == "direct"
+    assert insert.batches == [[{"text": "direct", "author_id": 7, "chat_id": 1}]]
+    assert writer.flushes == 0
@@ -0,0 +1,63 @@
+import pytest
+from crud import ChatCRUD, MessageCRUD
+from db.db import MyDatabase
+from enums import ReadStatusModes
+from schemas import CreateMessageRequestSchema
+from settings import SETTINGS
+from sqlalchemy.exc import OperationalError
+
+
+pytestmark = pytest.mark.anyio
+
+READER_ID: int = 1_600_000_000
+AUTHOR_ID: int = 1_600_000_001
+
+
+@pytest.fixture(params=list(ReadStatusModes), ids=lambda mode: mode.value)
+async def db(request, monkeypatch):
+    """Сессия с откатом всех изменений; без доступной базы тесты пропускаются."""
+    monkeypatch.setattr(SETTINGS, "CHAT_READ_STATUS_MODE", request.param)
+    try:
+        async with MyDatabase.rollback_session() as db:
+            yield db
+    except (OSError, OperationalError) as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    finally:
+        await MyDatabase.finish()
+
+
+async def send(db, chat_id: int, text: str) -> int:
+    message = await MessageCRUD.add_message_to_chat(
+        db=db,
+        author_id=AUTHOR_ID,
+        chat_id=chat_id,
+        message=CreateMessageRequestSchema(chat_id=chat_id, text=text),
+    )
+    return message.id
+
+
+async def test_read_up_to_message_of_chat(db):
+    chat = await ChatCRUD.create_chat(db=db, participant_ids=[READER_ID, AUTHOR_ID], is_private=False)
+    first: int = await send(db, chat.id, "first")
+    await send(db, chat.id, "second")
+
+    assert await MessageCRUD.mark_messages_read(db=db, chat_id=chat.id, participant_id=READER_ID,
+                                                message_id=first) == 1
+    assert await MessageCRUD.mark_messages_read(db=db, chat_id=chat.id, participant_id=READER_ID) == 0
+
+
+@pytest.mark.parametrize("foreign", [True, False], ids=["foreign", "nonexistent"])
+async def test_unknown_message_id_does_not_move_watermark(db, foreign: bool):
+    chat = await ChatCRUD.create_chat(db=db, participant_ids=[READER_ID, AUTHOR_ID], is_private=False)
+    other_chat = await ChatCRUD.create_chat(db=db, participant_ids=[READER_ID, AUTHOR_ID], is_private=False)
+    await send(db, chat.id, "first")
+    await send(db, chat.id, "second")
+    # id сообщения другого чата больше id всех сообщений этого чата
+    message_id: int = await send(db, other_chat.id, "other") if foreign else 2 ** 31 - 1
+
+    assert await MessageCRUD.mark_messages_read(db=db, chat_id=chat.id, participant_id=READER_ID,
+                                                message_id=message_id) == 2
+    # новые сообщения чата по-прежнему считаются непрочитанными
+    await send(db, chat.id, "third")
+    assert await MessageCRUD.mark_messages_read(db=db, chat_id=chat.id, participant_id=READER_ID,
+                                                message_id=message_id) == 3
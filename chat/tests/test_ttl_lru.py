@@ -0,0 +1,108 @@
+import pytest
+from cache import TTLLRUCache
+
+
+class Clock:
+    """Подменяет модуль time в cache.ttl_lru: время двигается только вручную."""
+
+    def __init__(self):
+        self.now: float = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr("cache.ttl_lru.time", clock)
+    return clock
+
+
+def test_get_returns_value_until_ttl_expires(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    cache.set(1, "members")
+
+    clock.now += 4.9
+    assert cache.get(1) == "members"
+    clock.now += 0.2
+    assert cache.get(1) is None
+    assert len(cache) == 0
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_least_recently_used_is_evicted(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=2, ttl=5.0)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    # чтение делает запись 1 самой свежей
+    assert cache.get(1) == "a"
+    cache.set(3, "c")
+
+    assert cache.get(2) is None
+    assert cache.get(1) == "a"
+    assert cache.get(3) == "c"
+    assert cache.stats.evictions == 1
+
+
+def test_set_overwrites_and_refreshes_ttl(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    cache.set(1, "old")
+    clock.now += 4.0
+    cache.set(1, "new")
+    clock.now += 4.0
+
+    assert cache.get(1) == "new"
+    assert len(cache) == 1
+
+
+def test_invalidate_drops_key(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    cache.set(1, "a")
+    cache.set(2, "b")
+    cache.invalidate(1)
+
+    assert cache.get(1) is None
+    assert cache.get(2) == "b"
+    assert cache.stats.invalidations == 1
+
+
+def test_value_loaded_before_invalidation_is_not_stored(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    generation: int = cache.generation
+    # пока значение загружалось из базы, состав другого чата изменился
+    cache.invalidate(2)
+    cache.set(1, "stale", generation)
+    assert cache.get(1) is None
+
+    cache.set(1, "fresh", cache.generation)
+    assert cache.get(1) == "fresh"
+
+
+def test_clear_drops_everything_and_bumps_generation(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    generation: int = cache.generation
+    cache.set(1, "a")
+    cache.clear()
+
+    assert len(cache) == 0
+    cache.set(1, "stale", generation)
+    assert cache.get(1) is None
+
+
+def test_metrics(clock):
+    cache: TTLLRUCache[str] = TTLLRUCache(maxsize=10, ttl=5.0)
+    cache.set(1, "a")
+    cache.get(1)
+    cache.get(2)
+
+    assert cache.metrics() == {
+        "size": 1,
+        "maxsize": 10,
+        "ttl": 5.0,
+        "hits": 1,
+        "misses": 1,
+        "hit_ratio": 0.5,
+        "evictions": 0,
+        "invalidations": 0,
+    }
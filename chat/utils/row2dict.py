@@ -1,6 +1,13 @@
+import sqlalchemy as sa
+
+
 def row2dict(row):
     d = {}
+    # отложенные (deferred) и еще не загруженные колонки пропускаем
+    unloaded: set[str] = sa.inspect(row).unloaded
     for column in row.__table__.columns:
+        if column.key in unloaded:
+            continue
         val = getattr(row, column.name)
         d[column.name] = None if val is None else str(val)
     return d